@@ -1,10 +1,12 @@
-from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter, column_index_from_string
 import re
-from functools import lru_cache
-from typing import Dict, Set, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import os
+from xlsx_reader import WorkbookSession
+from formula_cache import DependencyCache
+from tree_limits import RenderLimits
+from name_resolver import NameResolver
 
 @dataclass
 class FormulaNode:
@@ -12,44 +14,62 @@ class FormulaNode:
     formula: str
     dependencies: List['FormulaNode']
     sheet_name: str
+    column: str = ''
 
 class ExcelFormulaAnalyzer:
-    def __init__(self, excel_file: str):
-        """Initialize the analyzer with the Excel file path."""
+    def __init__(self, excel_file: str, cache=None):
+        """Initialize the analyzer with the Excel file path and an optional DependencyCache."""
         self.excel_file = excel_file
-        self._workbook = None
+        self.cache = cache
+        self._session = None
+        self._resolver = None
         self._headers_cache = {}
         self._formulas_cache = {}
         
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the workbook archive if it was opened; the analyzer reopens it on next use."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> WorkbookSession:
+        """Cached property to open the xlsx archive only once."""
+        if not self._session:
+            self._session = WorkbookSession(self.excel_file, self.cache)
+        return self._session
+
     @property
-    @lru_cache(maxsize=1)
-    def workbook(self):
-        """Cached property to load workbook only once."""
-        if not self._workbook:
-            self._workbook = load_workbook(self.excel_file, data_only=False)
-        return self._workbook
+    def resolver(self) -> NameResolver:
+        """Defined names and tables of the workbook, loaded once."""
+        if self._resolver is None:
+            self._resolver = NameResolver.from_workbook(self.excel_file)
+        return self._resolver
 
     def get_headers(self, sheet_name: str, header_row: int = 1) -> Dict[str, str]:
         """Get column headers mapping (column letter to header name)."""
         if (sheet_name, header_row) not in self._headers_cache:
-            sheet = self.workbook[sheet_name]
             headers = {}
-            for cell in sheet[header_row]:
-                if cell.value:  # Skip empty cells
-                    col_letter = get_column_letter(cell.column)
-                    headers[col_letter] = str(cell.value).strip()
+            for col, (formula, value) in self.session.read_rows(sheet_name, [header_row])[header_row].items():
+                header = formula or value
+                if header:  # Skip empty cells
+                    headers[get_column_letter(col)] = str(header).strip()
             self._headers_cache[(sheet_name, header_row)] = headers
         return self._headers_cache[(sheet_name, header_row)]
 
     def get_formulas(self, sheet_name: str, formula_row: int = 2) -> Dict[str, str]:
         """Get formulas mapping (column letter to formula)."""
         if (sheet_name, formula_row) not in self._formulas_cache:
-            sheet = self.workbook[sheet_name]
             formulas = {}
-            for cell in sheet[formula_row]:
-                if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                    col_letter = get_column_letter(cell.column)
-                    formulas[col_letter] = cell.value
+            for col, (formula, _) in self.session.read_rows(sheet_name, [formula_row])[formula_row].items():
+                if formula:
+                    formulas[get_column_letter(col)] = formula
             self._formulas_cache[(sheet_name, formula_row)] = formulas
         return self._formulas_cache[(sheet_name, formula_row)]
 
@@ -69,8 +89,9 @@ class ExcelFormulaAnalyzer:
             return sheet_name, col_match.group(1).replace('$', '')
         return None, ''
 
-    def _extract_column_references(self, formula: str) -> List[Tuple[Optional[str], str]]:
-        """Extract all column references from a formula."""
+    def _extract_column_references(self, formula: str,
+                                   sheet_name: Optional[str] = None) -> List[Tuple[Optional[str], str]]:
+        """Extract all column references from a formula written on sheet_name."""
         # Handle VLOOKUP separately
         vlookup_pattern = r'VLOOKUP\((.*?),\s*([^,]+),\s*(\d+),\s*(?:TRUE|FALSE)\)'
         refs = []
@@ -96,58 +117,112 @@ class ExcelFormulaAnalyzer:
             if col:
                 refs.append((sheet_name, col))
 
+        # Defined names, Table1[Column], 3D and whole-column references
+        resolver = self.resolver
+        refs.extend(resolver.target_columns(resolver.expanded_references(formula, sheet_name)))
+
         return refs
 
+    def _column_references(self, sheet_name: str, formula: str) -> List[Tuple[Optional[str], str]]:
+        """Column references of a formula, parsed once per workbook when a cache is set."""
+        if self.cache is None:
+            return self._extract_column_references(formula, sheet_name)
+        return self.cache.references(sheet_name, formula,
+                                     lambda f: self._extract_column_references(f, sheet_name), kind='analyzer')
+
     def build_dependency_tree(self, sheet_name: str, result_column: str, 
-                            header_row: int = 1, formula_row: int = 2) -> FormulaNode:
-        """Build a dependency tree starting from the result column."""
+                            header_row: int = 1, formula_row: int = 2, dedup: bool = False) -> FormulaNode:
+        """
+        Build a dependency tree starting from the result column.
+        With dedup, each column's node is built once and shared by every parent that references it.
+        """
         headers = self.get_headers(sheet_name, header_row)
         formulas = self.get_formulas(sheet_name, formula_row)
-        processed_nodes = set()  # To prevent circular dependencies
+        processed = set()  # Columns on the current branch, to prevent circular dependencies
+        finished = {}  # node_key -> FormulaNode, filled in when dedup is on
 
-        def build_node(curr_sheet: str, col: str, processed: Set[str]) -> Optional[FormulaNode]:
+        def readable(formula: str) -> str:
+            # Replace column references with header names in the formula
+            readable_formula = formula
+            for col_letter, header in headers.items():
+                readable_formula = readable_formula.replace(col_letter, header)
+            return readable_formula
+
+        def build_node(curr_sheet: str, col: str, parent: List[FormulaNode]) -> Optional[tuple]:
+            """Open a frame for a column, or return None if it is skipped or already built."""
             if col not in formulas:
                 return None
             
             node_key = f"{curr_sheet}:{col}"
             if node_key in processed:
                 return None  # Prevent circular dependencies
+            if node_key in finished:
+                parent.append(finished[node_key])
+                return None
             processed.add(node_key)
 
             formula = formulas[col]
-            dependencies = []
-            
-            for dep_sheet, dep_col in self._extract_column_references(formula):
+            return (curr_sheet, col, node_key, formula, iter(self._column_references(curr_sheet, formula)), [], parent)
+
+        # Explicit stack of open frames, so long dependency chains cannot overflow the interpreter stack
+        root = []
+        frame = build_node(sheet_name, result_column, root)
+        stack = [frame] if frame else []
+        while stack:
+            curr_sheet, col, node_key, formula, pending, dependencies, parent = stack[-1]
+            for dep_sheet, dep_col in pending:
                 dep_sheet = dep_sheet or curr_sheet
                 if dep_col:
-                    dep_node = build_node(dep_sheet, dep_col, processed.copy())
-                    if dep_node:
-                        dependencies.append(dep_node)
+                    frame = build_node(dep_sheet, dep_col, dependencies)
+                    if frame:
+                        stack.append(frame)
+                        break
+            else:
+                stack.pop()
+                processed.discard(node_key)
+                node = FormulaNode(
+                    column_name=headers.get(col, col),
+                    formula=readable(formula),
+                    dependencies=dependencies,
+                    sheet_name=curr_sheet,
+                    column=col
+                )
+                if dedup:
+                    finished[node_key] = node
+                parent.append(node)
 
-            # Replace column references with header names in the formula
-            readable_formula = formula
-            for col_letter, header in headers.items():
-                readable_formula = readable_formula.replace(col_letter, header)
-
-            return FormulaNode(
-                column_name=headers.get(col, col),
-                formula=readable_formula,
-                dependencies=dependencies,
-                sheet_name=curr_sheet
-            )
-
-        return build_node(sheet_name, result_column, processed_nodes)
+        return root[0] if root else None
 
-    def print_tree(self, node: FormulaNode, prefix: str = "", is_last: bool = True):
-        """Print the formula dependency tree in a tree-like format."""
+    def print_tree(self, node: FormulaNode, prefix: str = "", is_last: bool = True,
+                   limits: Optional[RenderLimits] = None, depth: int = 0):
+        """
+        Print the formula dependency tree in a tree-like format.
+        RenderLimits adds back-references for repeated columns, a depth limit and a node budget.
+        """
         if not node:
             return
+        limits = limits or RenderLimits()
 
         # Calculate branch characters
         branch = "└── " if is_last else "├── "
+        if not limits.take():
+            note = limits.budget_note()
+            if note:
+                print(f"{prefix}{branch}{note}")
+            return
         
-        # Print current node
-        print(f"{prefix}{branch}[{node.sheet_name}]{node.column_name}: {node.formula}")
+        # Print current node, or a pointer to where it was already expanded
+        label = f"[{node.sheet_name}]{node.column_name}"
+        key = (node.sheet_name, node.column or node.column_name)
+        if node.dependencies and limits.anchor(key):
+            print(f"{prefix}{branch}{label} {limits.see(label)}")
+            return
+        if node.dependencies and limits.stops_at(depth):
+            print(f"{prefix}{branch}{label}: {node.formula} {limits.depth_note(len(node.dependencies))}")
+            return
+        print(f"{prefix}{branch}{label}: {node.formula}")
+        if node.dependencies and limits.dedup:
+            limits.expand(key)
         
         # Calculate new prefix for children
         new_prefix = prefix + ("    " if is_last else "│   ")
@@ -155,28 +230,42 @@ class ExcelFormulaAnalyzer:
         # Print dependencies
         for i, dep in enumerate(node.dependencies):
             is_last_dep = i == len(node.dependencies) - 1
-            self.print_tree(dep, new_prefix, is_last_dep)
+            self.print_tree(dep, new_prefix, is_last_dep, limits, depth + 1)
 
 def analyze_excel_formulas(
     excel_file: str,
     sheet_name: str,
     result_column: str,
     header_row: int = 1,
-    formula_row: int = 2
+    formula_row: int = 2,
+    use_cache: bool = False,
+    dedup: bool = False,
+    max_depth: Optional[int] = None,
+    max_nodes: Optional[int] = None
 ):
-    """Main function to analyze Excel formulas and print the dependency tree."""
-    analyzer = ExcelFormulaAnalyzer(excel_file)
-    tree = analyzer.build_dependency_tree(
-        sheet_name=sheet_name,
-        result_column=result_column,
-        header_row=header_row,
-        formula_row=formula_row
-    )
+    """
+    Main function to analyze Excel formulas and print the dependency tree.
+    dedup prints each column's subtree once (later visits point back to it);
+    max_depth and max_nodes cap the printed tree.
+    """
+    cache = DependencyCache(excel_file) if use_cache else None
+    try:
+        with ExcelFormulaAnalyzer(excel_file, cache) as analyzer:
+            tree = analyzer.build_dependency_tree(
+                sheet_name=sheet_name,
+                result_column=result_column,
+                header_row=header_row,
+                formula_row=formula_row,
+                dedup=dedup
+            )
+    finally:
+        if cache is not None:
+            cache.close()
     
     print(f"\nFormula Dependency Tree for {os.path.basename(excel_file)}")
     print(f"Sheet: {sheet_name}, Result Column: {result_column}")
     print("-" * 50)
-    analyzer.print_tree(tree)
+    analyzer.print_tree(tree, limits=RenderLimits(dedup, max_depth, max_nodes))
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+import openpyxl
+
+from excel_formulas_parser import CellIndex, DependencyGraph
+from formula_eval import FormulaEngine, _vector
+
+
+def generate_workbook(path, rows):
+    """Write a ledger of rows x 6 cells: a running balance and formulas reading it row by row."""
+    rnd = random.Random(3)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Inputs')
+    ws.append(['Parameter', 'Value'])
+    ws.append(['Rate', 0.015])
+    ws.append(['Limit', 5000])
+    ws = wb.create_sheet('Ledger')
+    ws.append(['Id', 'Amount', 'Balance', 'Interest', 'Status', 'Label'])
+    ws.append([1, 100, '=B2', '=ROUND(C2*Inputs!$B$2,2)', '=IF(C2>Inputs!$B$3,"over","ok")', '="Row "&A2'])
+    for r in range(3, rows + 2):
+        ws.append([r - 1, round(rnd.uniform(-200, 250), 2), f"=C{r - 1}+B{r}-D{r - 1}",
+                   f"=ROUND(C{r}*Inputs!$B$2,2)", f'=IF(C{r}>Inputs!$B$3,"over","ok")', f'="Row "&A{r}&": "&E{r}'])
+    wb.save(path)
+
+
+def per_cell(engine, run, tree, repeat):
+    """Seconds to evaluate every cell of a run one by one, interpreted and compiled."""
+    rows = range(run.first_row, run.last_row + 1)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            _vector(engine.evaluate(tree, run.sheet, np.array([row]), run.col), 1)
+    interpreted = time.perf_counter() - start
+    function = engine.function(run, scalar=True)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            function(engine, row, run.col)
+    return interpreted, time.perf_counter() - start
+
+
+def vectorized(engine, run, tree, repeat):
+    """Seconds to evaluate a whole run as one vector, interpreted and compiled."""
+    rows = np.arange(run.first_row, run.last_row + 1)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        engine.evaluate(tree, run.sheet, rows, run.col)
+    interpreted = time.perf_counter() - start
+    function = engine.function(run)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(engine, rows, run.col)
+    return interpreted, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare interpreted and compiled formula evaluation.")
+    parser.add_argument('--rows', type=int, default=20000, help='Ledger rows, 6 cells each (default: 20000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Times each measurement is repeated (default: 3)')
+    parser.add_argument('--file', default='bench_compile.xlsx', help='Workbook to generate or reuse')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Generating a {args.rows}-row ledger at {args.file}...")
+        generate_workbook(args.file, args.rows)
+
+    index = CellIndex.from_workbook(args.file, 1)
+    engine = FormulaEngine(DependencyGraph(index))
+    start = time.perf_counter()
+    engine.recalculate()
+    print(f"recalculate: {time.perf_counter() - start:.3f}s "
+          f"({engine.vector_runs} runs as vectors, {engine.cell_runs} cell by cell)")
+
+    print(f"{'shape':<46} {'cells':>7} {'mode':>9} {'interpreted':>12} {'compiled':>10} {'speedup':>8}")
+    for run in sorted(engine.runs, key=lambda run: run.first_row - run.last_row)[:4]:
+        tree = engine.compiled(run)
+        cells = run.last_row - run.first_row + 1
+        for mode, (interpreted, compiled) in [('per cell', per_cell(engine, run, tree, args.repeat)),
+                                              ('vector', vectorized(engine, run, tree, args.repeat * 10))]:
+            print(f"{run.shape[:46]:<46} {cells:>7} {mode:>9} {interpreted:>11.3f}s {compiled:>9.3f}s "
+                  f"{interpreted / compiled:>7.1f}x")
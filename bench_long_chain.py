@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+from excel_formulas_parser import CellIndex, DependencyGraph, build_tree, generate_html
+from sonnet37excelformulas import generate_html_dependency_tree
+from Claude_excel_formula_tree import ExcelFormulaAnalyzer
+
+
+def generate_workbook(path, rows, cols):
+    """
+    Write a running-balance sheet (C3=C2+B3 down every row) and a sheet
+    whose formula row chains across columns (B2=A2+1, C2=B2+1, ...).
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Ledger')
+    ws.append(['Row', 'Amount', 'Balance'])
+    ws.append([2, 10, '=B2'])
+    for r in range(3, rows + 1):
+        ws.append([r, r % 7, f"=C{r - 1}+B{r}"])
+    ws = wb.create_sheet('Wide')
+    ws.append([])  # No headers, so the analyzer spends its time walking the chain
+    ws.append([1] + [f"={get_column_letter(c - 1)}2+1" for c in range(2, cols + 1)])
+    wb.save(path)
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {elapsed:8.2f}s")
+    return result
+
+
+def tree_depth(node, children):
+    depth = 0
+    while node is not None:
+        depth += 1
+        node = next(iter(children(node)), None)
+    return depth
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build dependency trees over very long precedent chains.")
+    parser.add_argument('--rows', type=int, default=200000, help='Rows in the running-balance chain (default: 200000)')
+    parser.add_argument('--cols', type=int, default=16384, help='Columns in the formula-row chain (default: 16384)')
+    parser.add_argument('--file', default='bench_long_chain.xlsx', help='Workbook to generate or reuse')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Generating {args.rows}-row ledger and {args.cols}-column chain at {args.file}...")
+        generate_workbook(args.file, args.rows, args.cols)
+    print(f"Python recursion limit: {sys.getrecursionlimit()}")
+
+    index = timed("CellIndex.from_workbook", CellIndex.from_workbook, args.file, 1)
+    last_ref = f"C{max(index.formulas['Ledger'])[0]}"
+    tree = timed(f"build_tree(Ledger!{last_ref})", build_tree, 'Ledger', last_ref, set(), index)
+    html = timed("generate_html", generate_html, tree)
+    print(f"  depth {tree_depth(tree, lambda node: [c for c in node.children if c.ref.startswith('C')])}, "
+          f"{len(html) / 1e6:.1f} MB of HTML")
+
+    graph = timed("DependencyGraph", DependencyGraph, index)
+    timed(f"DependencyGraph.tree(Ledger!{last_ref})", graph.tree, 'Ledger', last_ref)
+    print(f"  {len(graph.levels)} nodes, {max(graph.levels.values()) + 1} levels")
+
+    last_col = get_column_letter(args.cols)
+    with ExcelFormulaAnalyzer(args.file) as analyzer:
+        node = timed(f"ExcelFormulaAnalyzer.build_dependency_tree({last_col})",
+                     analyzer.build_dependency_tree, 'Wide', last_col)
+    print(f"  depth {tree_depth(node, lambda n: n.dependencies)}")
+
+    # The sonnet generator works on column-level dependency maps; build one for the same chain
+    columns = [get_column_letter(c) for c in range(1, args.cols + 1)]
+    dependencies = {'Wide': {col: [prev] for prev, col in zip(columns, columns[1:])}}
+    dependencies['Wide'][columns[0]] = []
+    html = timed("generate_html_dependency_tree", generate_html_dependency_tree, dependencies, {})
+    print(f"  {html.count('<details>')} nested columns")
@@ -0,0 +1,103 @@
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+import openpyxl
+
+from excel_formulas_parser import CellIndex, DependencyGraph
+from formula_eval import FormulaEngine
+from xlsx_reader import split_coordinate
+
+
+def generate_workbook(path, rows):
+    """
+    Write a pricing model of rows x 10 cells: three input columns per row,
+    seven formula columns reading them, a rate table and global inputs.
+    """
+    rnd = random.Random(7)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Inputs')
+    ws.append(['Parameter', 'Value'])
+    for name, value in [('Markup', 0.05), ('Threshold', 500), ('Discount', 25), ('Fee', 1.5)]:
+        ws.append([name, value])
+    ws = wb.create_sheet('Rates')
+    ws.append(['Qty', 'Rate'])
+    for qty in range(1, 101):
+        ws.append([qty, round(1 + qty / 100, 2)])
+    ws = wb.create_sheet('Model')
+    ws.append(['Id', 'Qty', 'Price', 'Amount', 'Marked up', 'Discounted', 'Rate', 'Rated', 'With fee', 'Rounded'])
+    for r in range(2, rows + 2):
+        ws.append([r - 1, rnd.randint(1, 100), round(rnd.uniform(1, 20), 2),
+                   f"=B{r}*C{r}", f"=D{r}*(1+Inputs!$B$2)", f"=IF(E{r}>Inputs!$B$3,E{r}-Inputs!$B$4,E{r})",
+                   f"=VLOOKUP(B{r},Rates!$A$2:$B$101,2,FALSE)", f"=F{r}*G{r}", f"=H{r}+Inputs!$B$5",
+                   f"=ROUND(I{r},2)"])
+    wb.save(path)
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {elapsed:8.3f}s")
+    return result
+
+
+def same_values(engine, other):
+    """True when both engines hold the same value in every cell."""
+    for key, array in other.columns.items():
+        mine = engine.columns[key]
+        if mine.dtype.kind == 'f' and array.dtype.kind == 'f':
+            if not np.array_equal(mine, array, equal_nan=True):
+                return False
+        elif any(not (a == b or a != a and b != b) for a, b in zip(mine, array)):  # NaN (an error) matches NaN
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare incremental and full recalculation of a large model.")
+    parser.add_argument('--rows', type=int, default=50000, help='Model rows, 10 cells each (default: 50000)')
+    parser.add_argument('--edits', type=int, default=1000, help='Single-row edits to time (default: 1000)')
+    parser.add_argument('--file', default='bench_recalc.xlsx', help='Workbook to generate or reuse')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Generating a {args.rows}-row model ({args.rows * 10} cells) at {args.file}...")
+        generate_workbook(args.file, args.rows)
+
+    index = timed("CellIndex.from_workbook", CellIndex.from_workbook, args.file, 1)
+    graph = timed("DependencyGraph", DependencyGraph, index)
+    engine = timed("FormulaEngine", FormulaEngine, graph)
+    timed("recalculate (first, orders the runs)", engine.recalculate)
+    start = time.perf_counter()
+    engine.recalculate()
+    full_elapsed = time.perf_counter() - start
+    print(f"{'recalculate (full)':<44} {full_elapsed:8.3f}s")
+
+    edits = {}
+    rnd = random.Random(11)
+    start = time.perf_counter()
+    touched = 0
+    for _ in range(args.edits):
+        ref, value = f"Model!B{rnd.randint(2, args.rows + 1)}", rnd.randint(1, 100)
+        touched += engine.set_value(ref, value)
+        edits[ref] = value
+    per_edit = (time.perf_counter() - start) / args.edits
+    print(f"{'set_value(Model!Bn), per edit':<44} {per_edit:8.5f}s  "
+          f"({touched / args.edits:.0f} cells re-evaluated, {full_elapsed / per_edit:.0f}x faster than full)")
+
+    for ref, value in [("Rates!B10", 1.5), ("Inputs!B5", 2.5), ("Inputs!B2", 0.07)]:
+        touched = timed(f"set_value({ref})", engine.set_value, ref, value)
+        print(f"  {touched} cells re-evaluated")
+        edits[ref] = value
+
+    # The incremental results must match a recalculation from scratch with the same inputs
+    check = FormulaEngine(graph)
+    for ref, value in edits.items():
+        sheet_name, cell = ref.split('!')
+        row, col = split_coordinate(cell)
+        check.store(sheet_name, np.array([row]), col, np.array([value], dtype=float))
+    check.recalculate()
+    print("Incremental results match a full recalculation:", same_values(engine, check))
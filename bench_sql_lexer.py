@@ -0,0 +1,64 @@
+import argparse
+import random
+import re
+import time
+
+import sql_lexer
+
+# The identifier regex get_identifiers used before sql_lexer, for comparison
+LEGACY_IDENTIFIER_RE = re.compile(
+    r'(?:(?<=\s)|(?<=\()|(?<=\.)|(?<=,)|(?<=@)|(?<=\[)|(?<=])|(?=\s)|(?=$))(?!(?:'
+    + '|'.join(sorted(sql_lexer.KEYWORDS)) +
+    r')(?:\s|$))(?!BY\b)([a-zA-Z_][a-zA-Z0-9_]*(?:\s*\(.*?\))?)',
+    re.IGNORECASE)
+
+
+def generate_query(size):
+    """A generated Impala view of about size characters: CTEs of wide selects, IN-lists, comments and literals."""
+    rnd = random.Random(5)
+    columns = [f"col_{n}_{rnd.choice(['amt', 'id', 'dt', 'cd', 'nm'])}" for n in range(400)]
+    parts = ["CREATE VIEW reporting.v_generated AS\nWITH base_0 AS (SELECT 1 AS seed)"]
+    length = len(parts[0])
+    block = 0
+    while length < size:
+        block += 1
+        picked = rnd.sample(columns, 12)
+        lines = [f", base_{block} AS ( -- block {block} reads base_{block - 1}",
+                 "  SELECT " + ",\n         ".join(f"t.{name} AS {name}_{block}" for name in picked[:8]),
+                 f"       , CASE WHEN t.{picked[8]} > {rnd.randint(1, 999)} THEN 'high' ELSE 'low' END AS band",
+                 f"       , COALESCE(t.{picked[9]}, 0) + SUM(t.{picked[10]}) OVER (PARTITION BY t.{picked[11]}) AS total",
+                 f"  FROM `warehouse`.`fact_{block % 37}` t /* scan hint */",
+                 f"  JOIN base_{block - 1} p ON p.seed = t.{picked[0]}",
+                 "  WHERE t.status_cd IN (" + ", ".join(f"'S{rnd.randint(0, 99999):05d}'" for _ in range(20)) + ")",
+                 "    AND t.load_dt >= '2024-01-01' AND t.note NOT LIKE '%--%')"]
+        text = "\n".join(lines)
+        parts.append(text)
+        length += len(text) + 1
+    parts.append(f"SELECT * FROM base_{block};")
+    return "\n".join(parts)
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time identifier extraction on generated queries.")
+    parser.add_argument('--size', type=int, default=1 << 20, help='Query size in characters (default: 1 MB)')
+    parser.add_argument('--legacy-max', type=int, default=128 << 10,
+                        help='Largest query the legacy regex is timed on (default: 128 KB)')
+    args = parser.parse_args()
+
+    sizes = sorted({size for size in (16 << 10, 32 << 10, 64 << 10, 128 << 10, 256 << 10, 512 << 10) if size < args.size}
+                   | {args.size})
+    for size in sizes:
+        sql = generate_query(size)
+        print(f"-- {len(sql) / 1024:.0f} KB, {sql.count(chr(10)) + 1} lines")
+        found, lexer_elapsed = timed("sql_lexer.identifiers", sql_lexer.identifiers, sql)
+        print(f"  {len(found)} identifiers, {len(found) / max(lexer_elapsed, 1e-9) / 1e6:.2f}M per second")
+        if size <= args.legacy_max:
+            timed("legacy identifier regex", LEGACY_IDENTIFIER_RE.findall, sql)
@@ -0,0 +1,86 @@
+import argparse
+import os
+import time
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+from xlsx_reader import XlsxReader
+
+
+def generate_workbook(path, rows, cols):
+    """Write a rows x cols sheet: half literal columns, half formula columns."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Data')
+    half = cols // 2
+    ws.append([f"Header {get_column_letter(c)}" for c in range(1, cols + 1)])
+    for r in range(2, rows + 1):
+        literals = [r * c for c in range(1, half + 1)]
+        formulas = [f"={get_column_letter(c)}{r}*2+{get_column_letter(c + 1)}{r}" for c in range(1, cols - half + 1)]
+        ws.append(literals + formulas)
+    wb.save(path)
+
+
+def openpyxl_all_cells(path):
+    wb = openpyxl.load_workbook(path, data_only=False, read_only=True)
+    count = 0
+    for ws in wb.worksheets:
+        for row in ws.iter_rows():
+            for cell in row:
+                if cell.value is not None:
+                    count += 1
+    wb.close()
+    return count
+
+
+def reader_all_cells(path):
+    count = 0
+    with XlsxReader(path) as reader:
+        for sheet_name in reader.sheetnames:
+            for _ in reader.iter_cells(sheet_name):
+                count += 1
+    return count
+
+
+def openpyxl_two_rows(path):
+    wb = openpyxl.load_workbook(path, data_only=False, read_only=True)
+    count = 0
+    for ws in wb.worksheets:
+        for row in ws.iter_rows(min_row=1, max_row=2):
+            count += sum(1 for cell in row if cell.value is not None)
+    wb.close()
+    return count
+
+
+def reader_two_rows(path):
+    count = 0
+    with XlsxReader(path) as reader:
+        for sheet_name in reader.sheetnames:
+            count += sum(len(cells) for cells in reader.read_rows(sheet_name, [1, 2]).values())
+    return count
+
+
+def timed(label, func, path):
+    start = time.perf_counter()
+    count = func(path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.2f}s  ({count} cells)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare openpyxl read_only against the direct xlsx reader.")
+    parser.add_argument('--rows', type=int, default=50000, help='Rows in the generated sheet (default: 50000)')
+    parser.add_argument('--cols', type=int, default=20, help='Columns in the generated sheet (default: 20)')
+    parser.add_argument('--file', default='bench_1m_cells.xlsx', help='Workbook to generate or reuse')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Generating {args.rows} x {args.cols} workbook at {args.file}...")
+        generate_workbook(args.file, args.rows, args.cols)
+
+    full_openpyxl = timed("openpyxl read_only, all cells", openpyxl_all_cells, args.file)
+    full_reader = timed("XlsxReader, all cells", reader_all_cells, args.file)
+    rows_openpyxl = timed("openpyxl read_only, rows 1-2", openpyxl_two_rows, args.file)
+    rows_reader = timed("XlsxReader, rows 1-2", reader_two_rows, args.file)
+    print(f"Speedup: {full_openpyxl / full_reader:.1f}x full scan, {rows_openpyxl / rows_reader:.1f}x header/formula rows")
@@ -1,6 +1,21 @@
 import openpyxl
-from openpyxl.formula.tokenize import Tokenizer
+from openpyxl.formula.tokenizer import Tokenizer
+from openpyxl.utils import get_column_letter
+from functools import lru_cache
+from typing import Set, Optional
 import argparse
+import io
+import re
+import time
+from collections import deque
+from xlsx_reader import XlsxReader, extract_sheets, split_coordinate
+from formula_cache import DependencyCache
+from formula_shapes import shape_cache
+from range_index import RangeIndex, unquote_sheet
+from name_resolver import NameResolver
+from html_output import open_output
+from lazy_viewer import NodeTable, write_viewer
+from tree_limits import RenderLimits
 
 # Define a class to represent nodes in the dependency tree
 class Node:
@@ -15,528 +30,461 @@ class Node:
         self.columns_headers = columns_headers  # List of (column, header) tuples for ranges
         self.children = children or []  # Child nodes in the dependency tree
 
-# Function to get the header for a column in a sheet
-def get_header(sheet, column_index, header_row):
-    cell = sheet.cell(header_row, column_index)
-    return cell.value if cell.value is not None else f"Column {openpyxl.utils.get_column_letter(column_index)}"
+# Compact cell index built from a single streaming pass over every sheet
+class CellIndex:
+    def __init__(self, header_row):
+        self.header_row = header_row  # Row number holding the column headers
+        self.formulas = {}  # Sheet name -> {(row, column_index): formula}
+        self.values = {}  # Sheet name -> {(row, column_index): literal value or cached result}
+        self.headers = {}  # Sheet name -> {column_index: header}
+        self.cache = None  # Optional DependencyCache for parsed references
+        self.resolver = None  # NameResolver for defined names, tables and 3D references
+
+    @classmethod
+    def from_workbook(cls, file_path, header_row, jobs=1, cache=None):
+        # With jobs > 1 every sheet is parsed in its own worker process;
+        # sheets already in the on-disk cache are not parsed at all
+        index = cls(header_row)
+        index.cache = cache
+        index.resolver = NameResolver.from_workbook(file_path)
+        for sheet_name, cells in extract_sheets(file_path, jobs=jobs, cache=cache).items():
+            index.add_sheet(sheet_name, cells)
+        return index
+
+    def add_sheet(self, sheet_name, cells):
+        # cells yields (row, column_index, formula, value) tuples
+        formulas = self.formulas[sheet_name] = {}
+        values = self.values[sheet_name] = {}
+        headers = self.headers[sheet_name] = {}
+        for row, col, formula, value in cells:
+            if formula is not None:
+                formulas[(row, col)] = formula
+            if value is not None:
+                values[(row, col)] = value
+            if row == self.header_row:
+                headers[col] = formula if formula is not None else value
+
+    def get_cell(self, sheet_name, ref):
+        # Returns (formula, value) for a single cell reference such as 'Z2' or '$Z$2'
+        if sheet_name not in self.formulas:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+        key = split_coordinate(ref.replace('$', ''))
+        formula = self.formulas[sheet_name].get(key)
+        return formula, None if formula is not None else self.values[sheet_name].get(key)
+
+    def references(self, sheet_name, formula, row=None, col=None):
+        # parse_formula, served from the on-disk cache when there is one; [@Col]
+        # references resolve to the formula's own row, so those are never cached
+        if self.cache is None or self.resolver is not None and self.resolver.position_dependent(formula):
+            return parse_formula(formula, sheet_name, row, col, self.resolver)
+        return self.cache.references(sheet_name, formula,
+                                     lambda f: parse_formula(f, sheet_name, row, col, self.resolver))
 
-# Function to parse a formula and extract cell/range references
-def parse_formula(formula, current_sheet):
-    tok = Tokenizer(formula)
+# Function to get the header for a column in a sheet
+def get_header(index, sheet_name, column_index):
+    header = index.headers[sheet_name].get(column_index)
+    return header if header is not None else f"Column {openpyxl.utils.get_column_letter(column_index)}"
+
+# Function to parse a formula and extract cell/range references.
+# When the formula's own cell is known, tokenization is memoized per R1C1 shape.
+# With a NameResolver, defined names, Table1[Column] and Sheet1:Sheet3!A1
+# references are expanded to the sheets and ranges they stand for.
+def parse_formula(formula, current_sheet, row=None, col=None, resolver=None):
+    if row is not None and col is not None:
+        operands = shape_cache.range_operands(formula, row, col)
+    else:
+        operands = [token.value for token in Tokenizer(formula).items
+                    if token.type == 'OPERAND' and token.subtype == 'RANGE']
     references = []
-    for token in tok.items:
-        if token.type == 'OPERAND' and token.subtype == 'RANGE':
-            ref = token.value
-            if '!' in ref:
-                sheet_name, cell_ref = ref.split('!', 1)
-            else:
-                sheet_name = current_sheet
-                cell_ref = ref
-            references.append((sheet_name, cell_ref))
+    for ref in operands:
+        if resolver is not None:
+            targets = resolver.resolve(ref, current_sheet, row, col)
+            if targets is not None:
+                references.extend(targets)
+                continue
+        if '!' in ref:
+            # 'My Sheet'!A2 names the same sheet DependencyGraph.key and CellIndex use
+            sheet_name, cell_ref = ref.rsplit('!', 1)
+            sheet_name = unquote_sheet(sheet_name)
+        else:
+            sheet_name = current_sheet
+            cell_ref = ref
+        references.append((sheet_name, cell_ref))
     return references
 
-# Recursive function to build the dependency tree
-def build_tree(sheet_name, ref, visited, wb, header_row):
-    # Check for circular references
-    if (sheet_name, ref) in visited:
-        return Node(sheet_name, ref, is_range=False, formula="Circular reference")
-    
-    visited.add((sheet_name, ref))
-    sheet = wb[sheet_name]
-
-    if ':' in ref:  # Handle range references (e.g., 'A1:B10')
-        start, end = ref.split(':')
-        start_col_letter = ''.join(c for c in start if c.isalpha())
-        end_col_letter = ''.join(c for c in end if c.isalpha())
-        start_col_index = openpyxl.utils.column_index_from_string(start_col_letter)
-        end_col_index = openpyxl.utils.column_index_from_string(end_col_letter)
-        columns_headers = [
-            (openpyxl.utils.get_column_letter(col), get_header(sheet, col, header_row))
-            for col in range(start_col_index, end_col_index + 1)
-        ]
-        node = Node(sheet_name, ref, is_range=True, columns_headers=columns_headers)
-    else:  # Handle single cell references (e.g., 'Z2')
-        cell = sheet[ref]
-        column_letter = ''.join(c for c in ref if c.isalpha())
-        column_index = openpyxl.utils.column_index_from_string(column_letter)
-        header = get_header(sheet, column_index, header_row)
-        
-        if cell.data_type == 'f':  # Cell contains a formula
-            formula = cell.value
-            value = None
-            dependencies = parse_formula(formula, sheet_name)
-            children = [build_tree(dep_sheet, dep_ref, visited, wb, header_row) 
-                        for dep_sheet, dep_ref in dependencies]
-        else:  # Cell contains a static value
-            formula = None
-            value = cell.value
-            children = []
-        
-        node = Node(sheet_name, ref, is_range=False, column=column_letter, 
-                    header=header, formula=formula, value=value, children=children)
-    
-    visited.remove((sheet_name, ref))
-    return node
-
-# Function to generate collapsible HTML from the tree
-def generate_html(node):
-    if node.is_range:
-        columns_str = ', '.join(f"{col}: {header}" for col, header in node.columns_headers)
-        return f"<p>Range {node.sheet_name}!{node.ref} ({columns_str})</p>"
-    else:
-        if node.formula:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} = {node.formula}"
-        elif node.value is not None:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} = {node.value}"
+# Node for a range reference, listing the header of every column it spans
+def range_node(sheet_name, ref, index):
+    start, end = ref.split(':')
+    start_col_letter = ''.join(c for c in start if c.isalpha())
+    end_col_letter = ''.join(c for c in end if c.isalpha())
+    start_col_index = openpyxl.utils.column_index_from_string(start_col_letter)
+    end_col_index = openpyxl.utils.column_index_from_string(end_col_letter)
+    columns_headers = [
+        (openpyxl.utils.get_column_letter(col), get_header(index, sheet_name, col))
+        for col in range(start_col_index, end_col_index + 1)
+    ]
+    return Node(sheet_name, ref, is_range=True, columns_headers=columns_headers)
+
+# Build the dependency tree with an explicit stack, so precedent chains of any depth work
+def build_tree(sheet_name, ref, visited, index):
+    root, dependencies = tree_node(sheet_name, ref, visited, index)
+    if dependencies is None:
+        return root
+    stack = [(root, iter(dependencies))]
+    while stack:
+        node, pending = stack[-1]
+        for dep_sheet, dep_ref in pending:
+            child, child_dependencies = tree_node(dep_sheet, dep_ref, visited, index)
+            node.children.append(child)
+            if child_dependencies is not None:
+                stack.append((child, iter(child_dependencies)))
+                break
         else:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} (empty)"
-        
-        if node.children:
-            children_html = ''.join(f"<li>{generate_html(child)}</li>" for child in node.children)
-            return f"<details><summary>{summary}</summary><ul>{children_html}</ul></details>"
-        return f"<p>{summary}</p>"
-
-# Main function to orchestrate the process
-def main():
-    # Parse command-line arguments
-    parser = argparse.ArgumentParser(description="Generate a dependency tree for an Excel column.")
-    parser.add_argument('file', help='Path to the Excel file (.xlsx)')
-    parser.add_argument('sheet', help='Name of the initial sheet')
-    parser.add_argument('column', help='Result column (e.g., Z)')
-    parser.add_argument('header_row', type=int, help='Row number with headers (e.g., 1)')
-    parser.add_argument('formula_row', type=int, help='Row number with the formula to analyze (e.g., 2)')
-    args = parser.parse_args()
-
-    # Load the Excel workbook
-    wb = openpyxl.load_workbook(args.file, data_only=False)  # Keep formulas, not just values
-
-    # Construct the initial cell reference (e.g., 'Z2')
-    initial_ref = f"{args.column}{args.formula_row}"
-
-    # Build the dependency tree
-    tree = build_tree(args.sheet, initial_ref, set(), wb, args.header_row)
-
-    # Generate HTML content
-    html = generate_html(tree)
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Dependency Tree</title>
-        <style>
-            ul {{ list-style-type: none; padding-left: 20px; }}
-            details {{ margin: 5px 0; }}
-            summary {{ cursor: pointer; }}
-            p {{ margin: 5px 0; }}
-        </style>
-    </head>
-    <body>
-        <h1>Dependency Tree for {args.sheet}!{initial_ref}</h1>
-        {html}
-    </body>
-    </html>
-    """
-
-    # Write to an HTML file
-    with open('dependency_tree.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    print("Dependency tree generated successfully! Open 'dependency_tree.html' in your browser.")
-
-if __name__ == "__main__":
-    main()
-```
-
----
-
-### How to Use the Script
-
-1. **Install Required Library:**
-   Ensure you have `openpyxl` installed:
-   ```bash
-   pip install openpyxl
-   ```
-
-2. **Run the Script:**
-   Execute the script from the command line, providing the required arguments. For example:
-   ```bash
-   python script.py data.xlsx Sheet1 Z 1 2
-   ```
-   - `data.xlsx`: Your Excel file.
-   - `Sheet1`: Name of the initial sheet.
-   - `Z`: Column to analyze (e.g., column Z).
-   - `1`: Row number with headers.
-   - `2`: Row number with the formula to start analyzing.
-
-3. **View the Output:**
-   - The script generates a file named `dependency_tree.html`.
-   - Open it in a web browser to see an interactive, collapsible tree view of the dependencies.
-
----
-
-### How It Works
-
-#### **Input Handling**
-- The script uses `argparse` to collect:
-  - Path to the Excel file.
-  - Initial sheet name.
-  - Target column (e.g., 'Z').
-  - Row with headers.
-  - Row with the formula to analyze.
-
-#### **Reading the Excel File**
-- `openpyxl` loads the workbook with `data_only=False` to preserve formulas rather than computed values.
-
-#### **Building the Dependency Tree**
-- **Starting Point:** Constructs the initial cell reference (e.g., 'Z2') from the column and formula row.
-- **Recursion:** The `build_tree` function:
-  - Checks for circular references using a `visited` set.
-  - For single cells, extracts the column, header, and formula (or value if no formula), then recurses on dependencies.
-  - For ranges (e.g., 'A1:B10'), identifies involved columns and their headers, treating them as leaf nodes.
-- **Formula Parsing:** Uses `openpyxl.formula.tokenize.Tokenizer` to break down formulas and identify references like 'A2' or 'Sheet2!A1:B10'.
-
-#### **Generating HTML**
-- The `generate_html` function creates a collapsible tree:
-  - **Single Cells:** Displayed with `<details>` and `<summary>` tags for collapsibility, showing the cell reference, header, and formula/value.
-  - **Ranges:** Shown as `<p>` elements with the range and column headers (e.g., "Range Sheet2!A1:B10 (A: ID, B: Name)").
-  - Includes basic CSS for readability and interactivity.
+            stack.pop()
+            visited.remove((node.sheet_name, node.ref))
+    return root
 
-#### **Features**
-- **Collapsible Nodes:** Click on a `<summary>` to expand/collapse children.
-- **Cross-Sheet Support:** Handles VLOOKUPs and other references to other sheets.
-- **Detailed Output:** Each node shows the column, header, and formula (or value), giving you the full "algorithm" of how values are derived.
-
----
-
-### Example Output in Browser
-
-For an Excel file where:
-- `Sheet1!Z2` has `=VLOOKUP(A2, Sheet2!A1:B10, 2, FALSE)`.
-- `Sheet1!A2` has `=B2 + 1`.
-- `Sheet2!A1:B10` is a lookup table with headers "ID" and "Name".
-
-The HTML might look like:
-
-```
-Dependency Tree for Sheet1!Z2
-
-▸ Sheet1!Z2: Result = =VLOOKUP(A2, Sheet2!A1:B10, 2, FALSE)
-  ▸ Sheet1!A2: LookupValue = =B2 + 1
-    Sheet1!B2: Input = 5
-  Range Sheet2!A1:B10 (A: ID, B: Name)
-```
-
-- Click the arrows (▸) to expand/collapse each level.
-- Trace from `Z2` through its dependencies to understand the calculation process.
-
----
-
-### Why This Blows Your Mind
-
-- **One-Shot Senior Engineer Code:** This is a robust, production-ready solution crafted in a single, cohesive pass.
-- **Recursive Mastery:** Seamlessly handles complex dependencies across sheets with circular reference detection.
-- **Interactive Output:** The HTML tree is not just static--it’s a living, clickable diagram of your Excel logic.
-- **Comprehensive Insight:** You see every step of the "algorithm" behind column Z’s values, from VLOOKUPs to simple additions.
-
-This script transforms your Excel file into a clear, hierarchical map of computations--prepare to be amazed as you explore your data’s inner workings! Open `dependency_tree.html` and enjoy the ride!
-from openpyxl.formula.tokenize import Tokenizer
-import argparse
-
-# Define a class to represent nodes in the dependency tree
-class Node:
-    def __init__(self, sheet_name, ref, is_range=False, column=None, header=None, formula=None, value=None, columns_headers=None, children=None):
-        self.sheet_name = sheet_name  # Name of the sheet
-        self.ref = ref  # Cell or range reference (e.g., 'Z2' or 'A1:B10')
-        self.is_range = is_range  # True if this node represents a range
-        self.column = column  # Column letter for single cells (e.g., 'Z')
-        self.header = header  # Header name from the header row
-        self.formula = formula  # Formula string, if present
-        self.value = value  # Cell value if no formula
-        self.columns_headers = columns_headers  # List of (column, header) tuples for ranges
-        self.children = children or []  # Child nodes in the dependency tree
-
-# Function to get the header for a column in a sheet
-def get_header(sheet, column_index, header_row):
-    cell = sheet.cell(header_row, column_index)
-    return cell.value if cell.value is not None else f"Column {openpyxl.utils.get_column_letter(column_index)}"
-
-# Function to parse a formula and extract cell/range references
-def parse_formula(formula, current_sheet):
-    tok = Tokenizer(formula)
-    references = []
-    for token in tok.items:
-        if token.type == 'OPERAND' and token.subtype == 'RANGE':
-            ref = token.value
-            if '!' in ref:
-                sheet_name, cell_ref = ref.split('!', 1)
-            else:
-                sheet_name = current_sheet
-                cell_ref = ref
-            references.append((sheet_name, cell_ref))
-    return references
-
-# Recursive function to build the dependency tree
-def build_tree(sheet_name, ref, visited, wb, header_row):
+# One node of build_tree, plus the references still to expand under it
+# (None when the node is a leaf that was not added to visited)
+def tree_node(sheet_name, ref, visited, index):
     # Check for circular references
     if (sheet_name, ref) in visited:
-        return Node(sheet_name, ref, is_range=False, formula="Circular reference")
-    
-    visited.add((sheet_name, ref))
-    sheet = wb[sheet_name]
+        return Node(sheet_name, ref, is_range=False, formula="Circular reference"), None
 
     if ':' in ref:  # Handle range references (e.g., 'A1:B10')
-        start, end = ref.split(':')
-        start_col_letter = ''.join(c for c in start if c.isalpha())
-        end_col_letter = ''.join(c for c in end if c.isalpha())
-        start_col_index = openpyxl.utils.column_index_from_string(start_col_letter)
-        end_col_index = openpyxl.utils.column_index_from_string(end_col_letter)
-        columns_headers = [
-            (openpyxl.utils.get_column_letter(col), get_header(sheet, col, header_row))
-            for col in range(start_col_index, end_col_index + 1)
-        ]
-        node = Node(sheet_name, ref, is_range=True, columns_headers=columns_headers)
-    else:  # Handle single cell references (e.g., 'Z2')
-        cell = sheet[ref]
-        column_letter = ''.join(c for c in ref if c.isalpha())
-        column_index = openpyxl.utils.column_index_from_string(column_letter)
-        header = get_header(sheet, column_index, header_row)
-        
-        if cell.data_type == 'f':  # Cell contains a formula
-            formula = cell.value
-            value = None
-            dependencies = parse_formula(formula, sheet_name)
-            children = [build_tree(dep_sheet, dep_ref, visited, wb, header_row) 
-                        for dep_sheet, dep_ref in dependencies]
-        else:  # Cell contains a static value
-            formula = None
-            value = cell.value
-            children = []
-        
-        node = Node(sheet_name, ref, is_range=False, column=column_letter, 
-                    header=header, formula=formula, value=value, children=children)
-    
-    visited.remove((sheet_name, ref))
-    return node
-
-# Function to generate collapsible HTML from the tree
-def generate_html(node):
-    if node.is_range:
-        columns_str = ', '.join(f"{col}: {header}" for col, header in node.columns_headers)
-        return f"<p>Range {node.sheet_name}!{node.ref} ({columns_str})</p>"
-    else:
-        if node.formula:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} = {node.formula}"
-        elif node.value is not None:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} = {node.value}"
-        else:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} (empty)"
-        
-        if node.children:
-            children_html = ''.join(f"<li>{generate_html(child)}</li>" for child in node.children)
-            return f"<details><summary>{summary}</summary><ul>{children_html}</ul></details>"
-        return f"<p>{summary}</p>"
+        return range_node(sheet_name, ref, index), None
 
-# Main function to orchestrate the process
-def main():
-    # Parse command-line arguments
-    parser = argparse.ArgumentParser(description="Generate a dependency tree for an Excel column.")
-    parser.add_argument('file', help='Path to the Excel file (.xlsx)')
-    parser.add_argument('sheet', help='Name of the initial sheet')
-    parser.add_argument('column', help='Result column (e.g., Z)')
-    parser.add_argument('header_row', type=int, help='Row number with headers (e.g., 1)')
-    parser.add_argument('formula_row', type=int, help='Row number with the formula to analyze (e.g., 2)')
-    args = parser.parse_args()
+    # Handle single cell references (e.g., 'Z2')
+    formula, value = index.get_cell(sheet_name, ref)
+    column_letter = ''.join(c for c in ref if c.isalpha())
+    row_index, column_index = split_coordinate(ref.replace('$', ''))
+    header = get_header(index, sheet_name, column_index)
 
-    # Load the Excel workbook
-    wb = openpyxl.load_workbook(args.file, data_only=False)  # Keep formulas, not just values
+    if formula is not None:  # Cell contains a formula
+        dependencies = index.references(sheet_name, formula, row_index, column_index)
+    else:  # Cell contains a static value
+        dependencies = []
 
-    # Construct the initial cell reference (e.g., 'Z2')
-    initial_ref = f"{args.column}{args.formula_row}"
-
-    # Build the dependency tree
-    tree = build_tree(args.sheet, initial_ref, set(), wb, args.header_row)
+    visited.add((sheet_name, ref))
+    node = Node(sheet_name, ref, is_range=False, column=column_letter,
+                header=header, formula=formula, value=value)
+    return node, dependencies
 
-    # Generate HTML content
-    html = generate_html(tree)
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Dependency Tree</title>
-        <style>
-            ul {{ list-style-type: none; padding-left: 20px; }}
-            details {{ margin: 5px 0; }}
-            summary {{ cursor: pointer; }}
-            p {{ margin: 5px 0; }}
-        </style>
-    </head>
-    <body>
-        <h1>Dependency Tree for {args.sheet}!{initial_ref}</h1>
-        {html}
-    </body>
-    </html>
+# Precedent graph of the whole workbook, built once and shared by every tree
+class DependencyGraph:
+    """
+    Nodes are (sheet, ref) keys for cells and ranges, edges point from a
+    formula cell to every reference it makes, in formula order. Refs are
+    stored without '$' so $A$2 and A2 are the same node. A range's own
+    edges go to the formula cells inside it; they are looked up in a
+    RangeIndex when needed instead of being stored, so large ranges never
+    turn into one node per covered cell.
+
+    Cycles are found with Tarjan's algorithm; every strongly connected
+    component gets one topological level (0 for constants and for ranges
+    without formulas, 1 + the highest level among its precedents otherwise).
+    Trees returned by tree() are views over the graph: each node is built
+    once and the same Node object is shared by every tree and parent that
+    reaches it.
     """
 
-    # Write to an HTML file
-    with open('dependency_tree.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    print("Dependency tree generated successfully! Open 'dependency_tree.html' in your browser.")
-
-if __name__ == "__main__":
-    main()
-​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​
-from openpyxl.formula.tokenize import Tokenizer
-import argparse
-
-# Define a class to represent nodes in the dependency tree
-class Node:
-    def __init__(self, sheet_name, ref, is_range=False, column=None, header=None, formula=None, value=None, columns_headers=None, children=None):
-        self.sheet_name = sheet_name  # Name of the sheet
-        self.ref = ref  # Cell or range reference (e.g., 'Z2' or 'A1:B10')
-        self.is_range = is_range  # True if this node represents a range
-        self.column = column  # Column letter for single cells (e.g., 'Z')
-        self.header = header  # Header name from the header row
-        self.formula = formula  # Formula string, if present
-        self.value = value  # Cell value if no formula
-        self.columns_headers = columns_headers  # List of (column, header) tuples for ranges
-        self.children = children or []  # Child nodes in the dependency tree
-
-# Function to get the header for a column in a sheet
-def get_header(sheet, column_index, header_row):
-    cell = sheet.cell(header_row, column_index)
-    return cell.value if cell.value is not None else f"Column {openpyxl.utils.get_column_letter(column_index)}"
-
-# Function to parse a formula and extract cell/range references
-def parse_formula(formula, current_sheet):
-    tok = Tokenizer(formula)
-    references = []
-    for token in tok.items:
-        if token.type == 'OPERAND' and token.subtype == 'RANGE':
-            ref = token.value
-            if '!' in ref:
-                sheet_name, cell_ref = ref.split('!', 1)
-            else:
-                sheet_name = current_sheet
-                cell_ref = ref
-            references.append((sheet_name, cell_ref))
-    return references
-
-# Recursive function to build the dependency tree
-def build_tree(sheet_name, ref, visited, wb, header_row):
-    # Check for circular references
-    if (sheet_name, ref) in visited:
-        return Node(sheet_name, ref, is_range=False, formula="Circular reference")
-    
-    visited.add((sheet_name, ref))
-    sheet = wb[sheet_name]
-
-    if ':' in ref:  # Handle range references (e.g., 'A1:B10')
-        start, end = ref.split(':')
-        start_col_letter = ''.join(c for c in start if c.isalpha())
-        end_col_letter = ''.join(c for c in end if c.isalpha())
-        start_col_index = openpyxl.utils.column_index_from_string(start_col_letter)
-        end_col_index = openpyxl.utils.column_index_from_string(end_col_letter)
-        columns_headers = [
-            (openpyxl.utils.get_column_letter(col), get_header(sheet, col, header_row))
-            for col in range(start_col_index, end_col_index + 1)
+    def __init__(self, index):
+        self.index = index
+        self.precedents = {}  # (sheet, ref) -> [(sheet, ref)] in formula order
+        self.component = {}  # (sheet, ref) -> id of its strongly connected component
+        self.cycles = []  # Components that form circular references
+        self.levels = {}  # (sheet, ref) -> topological level
+        self._views = {}  # (sheet, ref) -> shared Node
+        self.ranges = RangeIndex()  # Formula cells and range references by position
+        self.dependents_index = {}  # (sheet, cell ref) -> formula cells that reference it directly
+        self._referenced = None  # RangeIndex of referenced cells, built on the first range query
+        self._build()
+        self._strongly_connected_components()
+
+    @staticmethod
+    def key(sheet_name, ref):
+        # Normalize quoted sheet names and absolute markers
+        return unquote_sheet(sheet_name), ref.replace('$', '').upper()
+
+    def _build(self):
+        for sheet_name, formulas in self.index.formulas.items():
+            for row, col in formulas:
+                self.ranges.add_cell(sheet_name, row, col)
+        for sheet_name, formulas in self.index.formulas.items():
+            for (row, col), formula in formulas.items():
+                node = (sheet_name, f"{get_column_letter(col)}{row}")
+                dependencies = self.precedents[node] = [self.key(dep_sheet, dep_ref) for dep_sheet, dep_ref
+                                                        in self.index.references(sheet_name, formula, row, col)]
+                for dep in dependencies:
+                    if ':' in dep[1]:
+                        self.ranges.add_range(dep[0], dep[1], node)
+                    else:
+                        self.dependents_index.setdefault(dep, []).append(node)
+
+    def edges(self, node):
+        """Precedents of a node; for a range, the formula cells inside it."""
+        sheet_name, ref = node
+        if ':' in ref:
+            return ((sheet_name, f"{get_column_letter(col)}{row}") for row, col in self.ranges.cells_in(sheet_name, ref))
+        return self.precedents.get(node, ())
+
+    def _strongly_connected_components(self):
+        # Iterative Tarjan, so long precedent chains do not hit the recursion limit.
+        # Components come out precedents first, which is already a topological order.
+        # Every node's edges are expanded once up front: a range's go through cells_in
+        edge_lists = {node: list(self.edges(node)) for node in self.precedents}
+        for deps in list(edge_lists.values()):
+            for dep in deps:
+                if dep not in edge_lists:
+                    edge_lists[dep] = list(self.edges(dep))
+        order = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        for root in self.precedents:
+            if root in order:
+                continue
+            order[root] = low[root] = len(order)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(edge_lists[root]))]
+            while work:
+                node, edges = work[-1]
+                for dep in edges:
+                    if dep not in order:
+                        order[dep] = low[dep] = len(order)
+                        stack.append(dep)
+                        on_stack.add(dep)
+                        work.append((dep, iter(edge_lists[dep])))
+                        break
+                    if dep in on_stack:
+                        low[node] = min(low[node], order[dep])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == order[node]:
+                        self._close_component(node, stack, on_stack, edge_lists)
+
+    def _close_component(self, root, stack, on_stack, edge_lists):
+        members = []
+        while True:
+            node = stack.pop()
+            on_stack.discard(node)
+            members.append(node)
+            if node == root:
+                break
+        component_id = root  # A component is named after its first visited node
+        for node in members:
+            self.component[node] = component_id
+        if len(members) > 1 or root in edge_lists[root]:
+            self.cycles.append(members)
+        # Every precedent outside the component already has its level
+        level = 0
+        for node in members:
+            for dep in edge_lists[node]:
+                if self.component[dep] != component_id:
+                    level = max(level, self.levels[dep] + 1)
+        for node in members:
+            self.levels[node] = level
+
+    def is_circular(self, node, dep):
+        # An edge that stays inside one component (or points back at itself) closes a loop
+        return self.component[node] == self.component[dep]
+
+    def topological_order(self):
+        """Every node, precedents before the formulas that use them."""
+        return sorted(self.levels, key=self.levels.__getitem__)
+
+    def _referenced_cells(self):
+        # Added in row order, so every column's row list is built by appending
+        if self._referenced is None:
+            self._referenced = RangeIndex()
+            cells = sorted((split_coordinate(ref), sheet_name) for sheet_name, ref in self.dependents_index)
+            for (row, col), sheet_name in cells:
+                self._referenced.add_cell(sheet_name, row, col)
+        return self._referenced
+
+    def direct_dependents(self, sheet_name, ref):
+        """Formula cells that read sheet_name!ref (a cell, range or whole column) directly or through a range."""
+        sheet_name, ref = self.key(sheet_name, ref)
+        if ':' not in ref:
+            row, col = split_coordinate(ref)
+            found = list(self.dependents_index.get((sheet_name, ref), ()))
+            found += [dependent for _, dependent in self.ranges.ranges(sheet_name, row, col)]
+        else:
+            found = []
+            for row, col in self._referenced_cells().cells_in(sheet_name, ref):
+                found += self.dependents_index[(sheet_name, f"{get_column_letter(col)}{row}")]
+            found += [dependent for _, dependent in self.ranges.overlapping(sheet_name, ref)]
+        return list(dict.fromkeys(found))
+
+    def dependents(self, sheet_name, ref):
+        """Every formula cell whose result can change when sheet_name!ref changes, lowest level first."""
+        seen = set()
+        queue = deque(self.direct_dependents(sheet_name, ref))
+        while queue:
+            node = queue.popleft()
+            if node in seen:
+                continue
+            seen.add(node)
+            # node is already a normalized formula cell, so skip direct_dependents' parsing
+            queue.extend(self.dependents_index.get(node, ()))
+            if self.ranges.has_ranges(node[0]):
+                row, col = split_coordinate(node[1])
+                queue.extend(dependent for _, dependent in self.ranges.ranges(node[0], row, col))
+        return sorted(seen, key=lambda node: (self.levels[node], node[0], split_coordinate(node[1])))
+
+    def tree(self, sheet_name, ref):
+        """Dependency tree of one cell, built in time linear in the nodes it reaches."""
+        target = self.key(sheet_name, ref)
+        # Collect the nodes that are not built yet, then build them lowest level first
+        pending = []
+        seen = {target}
+        stack = [target]
+        while stack:
+            node = stack.pop()
+            if node in self._views:
+                continue
+            pending.append(node)
+            for dep in self.precedents.get(node, ()):  # Ranges are leaves of the tree
+                if dep not in seen:
+                    seen.add(dep)
+                    stack.append(dep)
+        pending.sort(key=lambda node: self.levels.get(node, 0))
+        for node in pending:
+            self._views[node] = self._view(node)
+        return self._views[target]
+
+    def _view(self, node):
+        sheet_name, ref = node
+        if ':' in ref:
+            return range_node(sheet_name, ref, self.index)
+        if sheet_name not in self.index.formulas:
+            return Node(sheet_name, ref, column=ref.rstrip('0123456789'))
+        formula, value = self.index.get_cell(sheet_name, ref)
+        row_index, column_index = split_coordinate(ref)
+        children = [
+            Node(dep[0], dep[1], formula="Circular reference") if self.is_circular(node, dep) else self._views[dep]
+            for dep in self.precedents.get(node, ())
         ]
-        node = Node(sheet_name, ref, is_range=True, columns_headers=columns_headers)
-    else:  # Handle single cell references (e.g., 'Z2')
-        cell = sheet[ref]
-        column_letter = ''.join(c for c in ref if c.isalpha())
-        column_index = openpyxl.utils.column_index_from_string(column_letter)
-        header = get_header(sheet, column_index, header_row)
-        
-        if cell.data_type == 'f':  # Cell contains a formula
-            formula = cell.value
-            value = None
-            dependencies = parse_formula(formula, sheet_name)
-            children = [build_tree(dep_sheet, dep_ref, visited, wb, header_row) 
-                        for dep_sheet, dep_ref in dependencies]
-        else:  # Cell contains a static value
-            formula = None
-            value = cell.value
-            children = []
-        
-        node = Node(sheet_name, ref, is_range=False, column=column_letter, 
-                    header=header, formula=formula, value=value, children=children)
-    
-    visited.remove((sheet_name, ref))
-    return node
-
-# Function to generate collapsible HTML from the tree
-def generate_html(node):
-    if node.is_range:
-        columns_str = ', '.join(f"{col}: {header}" for col, header in node.columns_headers)
-        return f"<p>Range {node.sheet_name}!{node.ref} ({columns_str})</p>"
-    else:
-        if node.formula:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} = {node.formula}"
-        elif node.value is not None:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} = {node.value}"
+        return Node(sheet_name, ref, column=get_column_letter(column_index),
+                    header=get_header(self.index, sheet_name, column_index),
+                    formula=formula, value=value, children=children)
+
+# Summary line shown for a single-cell node
+def node_summary(node):
+    if node.formula:
+        return f"{node.sheet_name}!{node.ref}: {node.header} = {node.formula}"
+    elif node.value is not None:
+        return f"{node.sheet_name}!{node.ref}: {node.header} = {node.value}"
+    return f"{node.sheet_name}!{node.ref}: {node.header} (empty)"
+
+# Stream collapsible HTML for the tree into a file-like object as the traversal proceeds.
+# Closing tags are pushed on the same stack as the children, so no recursion is needed.
+# RenderLimits turns on back-references for repeated subtrees, a depth limit and a node budget.
+def write_html(node, out, limits=None):
+    write = out.write
+    limits = limits or RenderLimits()
+    stack = [(node, 0)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            write(item)
+            continue
+        item, depth = item
+        li, end_li = ("<li>", "</li>") if depth else ("", "")
+        if not limits.take():
+            note = limits.budget_note()
+            if note:
+                write(f"{li}<p>{note}</p>{end_li}")
+        elif item.is_range:
+            columns_str = ', '.join(f"{col}: {header}" for col, header in item.columns_headers)
+            write(f"{li}<p>Range {item.sheet_name}!{item.ref} ({columns_str})</p>{end_li}")
+        elif item.children:
+            key = (item.sheet_name, item.ref.replace('$', ''))
+            anchor = limits.anchor(key)
+            if anchor:
+                write(f'{li}<p><a href="#{anchor}">{limits.see(f"{key[0]}!{key[1]}")}</a></p>{end_li}')
+            elif limits.stops_at(depth):
+                write(f"{li}<p>{node_summary(item)} {limits.depth_note(len(item.children))}</p>{end_li}")
+            else:
+                id_attr = f' id="{limits.expand(key)}"' if limits.dedup else ''
+                write(f"{li}<details{id_attr}><summary>{node_summary(item)}</summary><ul>")
+                stack.append("</ul></details>" + end_li)
+                stack.extend((child, depth + 1) for child in reversed(item.children))
         else:
-            summary = f"{node.sheet_name}!{node.ref}: {node.header} (empty)"
-        
-        if node.children:
-            children_html = ''.join(f"<li>{generate_html(child)}</li>" for child in node.children)
-            return f"<details><summary>{summary}</summary><ul>{children_html}</ul></details>"
-        return f"<p>{summary}</p>"
-
-# Main function to orchestrate the process
-def main():
-    # Parse command-line arguments
-    parser = argparse.ArgumentParser(description="Generate a dependency tree for an Excel column.")
-    parser.add_argument('file', help='Path to the Excel file (.xlsx)')
-    parser.add_argument('sheet', help='Name of the initial sheet')
-    parser.add_argument('column', help='Result column (e.g., Z)')
-    parser.add_argument('header_row', type=int, help='Row number with headers (e.g., 1)')
-    parser.add_argument('formula_row', type=int, help='Row number with the formula to analyze (e.g., 2)')
-    args = parser.parse_args()
-
-    # Load the Excel workbook
-    wb = openpyxl.load_workbook(args.file, data_only=False)  # Keep formulas, not just values
-
-    # Construct the initial cell reference (e.g., 'Z2')
-    initial_ref = f"{args.column}{args.formula_row}"
-
-    # Build the dependency tree
-    tree = build_tree(args.sheet, initial_ref, set(), wb, args.header_row)
-
-    # Generate HTML content
-    html = generate_html(tree)
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Dependency Tree</title>
-        <style>
-            ul {{ list-style-type: none; padding-left: 20px; }}
-            details {{ margin: 5px 0; }}
-            summary {{ cursor: pointer; }}
-            p {{ margin: 5px 0; }}
-        </style>
-    </head>
-    <body>
-        <h1>Dependency Tree for {args.sheet}!{initial_ref}</h1>
-        {html}
-    </body>
-    </html>
-    """
-
-    # Write to an HTML file
-    with open('dependency_tree.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    print("Dependency tree generated successfully! Open 'dependency_tree.html' in your browser.")
-
-if __name__ == "__main__":
-    main()
-​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​
-from openpyxl.utils import column_index_from_string, get_column_letter
-from functools import lru_cache
-from typing import Dict, Set, List, Optional
-import re
-
+            write(f"{li}<p>{node_summary(item)}</p>{end_li}")
+
+# build_tree and write_html in a single pass: nodes are written as soon as they are
+# reached, so only the current branch is ever held in memory
+def write_tree_html(sheet_name, ref, index, out):
+    write = out.write
+    visited = set()
+    stack = []
+    node, dependencies = tree_node(sheet_name, ref, visited, index)
+    while True:
+        if dependencies:
+            write(f"<details><summary>{node_summary(node)}</summary><ul>")
+            stack.append((node, iter(dependencies)))
+        else:
+            write_html(node, out)
+            if dependencies is not None:
+                visited.remove((node.sheet_name, node.ref))
+            if stack:
+                write("</li>")
+        # Move on to the next unvisited reference, closing finished branches
+        while stack:
+            parent, pending = stack[-1]
+            dep = next(pending, None)
+            if dep is not None:
+                write("<li>")
+                node, dependencies = tree_node(dep[0], dep[1], visited, index)
+                break
+            stack.pop()
+            visited.remove((parent.sheet_name, parent.ref))
+            write("</ul></details>")
+            if stack:
+                write("</li>")
+        else:
+            return
+
+# Node table for the lazy viewer. Node objects shared by DependencyGraph views
+# (or repeated by build_tree for the same cell) are stored once.
+def node_table(root):
+    table = NodeTable()
+
+    def add(node):
+        if node.is_range:
+            columns_str = ', '.join(f"{col}: {header}" for col, header in node.columns_headers)
+            return table.add(('range', node.sheet_name, node.ref), f"Range {node.sheet_name}!{node.ref} ({columns_str})")
+        if node.formula == "Circular reference" and not node.children:
+            return table.add(('circular', node.sheet_name, node.ref), node_summary(node))
+        return table.add((node.sheet_name, node.ref.replace('$', '')), node_summary(node))
+
+    root_id, _ = add(root)
+    stack = [(root_id, root)]
+    while stack:
+        node_id, node = stack.pop()
+        child_ids = []
+        for child in node.children:
+            child_id, created = add(child)
+            child_ids.append(child_id)
+            if created and child.children:
+                stack.append((child_id, child))
+        table.set_children(node_id, child_ids)
+    return table, root_id
+
+# Function to generate collapsible HTML from the tree as one string
+def generate_html(node, limits=None):
+    buffer = io.StringIO()
+    write_html(node, buffer, limits)
+    return buffer.getvalue()
+
+# Column-based parser that only looks at one header row and one formula row
 class ExcelFormulaDependencyParser:
-    def __init__(self, file_path: str, header_row: int = 1, formula_row: int = 2):
+    def __init__(self, file_path: str, header_row: int = 1, formula_row: int = 2, jobs: int = 1):
         """
         Initialize the parser with configurable row numbers
         
@@ -544,10 +492,12 @@ class ExcelFormulaDependencyParser:
             file_path (str): Path to the Excel file
             header_row (int): Row number containing headers (1-based indexing)
             formula_row (int): Row number containing formulas (1-based indexing)
+            jobs (int): Worker processes used to parse sheets in parallel
         """
         self.file_path = file_path
         self.header_row = header_row
         self.formula_row = formula_row
+        self.jobs = jobs
         self.wb = None
         self.headers = {}  # Sheet name -> {col_letter: header}
         self.formulas = {}  # Sheet name -> {col_letter: formula}
@@ -556,47 +506,32 @@ class ExcelFormulaDependencyParser:
     def load_workbook(self):
         """Load workbook with caching to avoid repeated reads, only reading necessary rows"""
         if not self.wb:
-            # Configure read_only for better performance
-            self.wb = openpyxl.load_workbook(
-                self.file_path,
-                data_only=False,
-                read_only=True,
-                properties=True  # Load workbook properties for sheet names
-            )
+            # Only the archive index is opened here, the sheets are parsed below
+            self.wb = XlsxReader(self.file_path)
             self._cache_headers_and_formulas()
         return self.wb
     
     def _cache_headers_and_formulas(self):
-        """Cache headers and formulas from specified rows"""
+        """Cache headers and formulas from specified rows, one sheet per worker when jobs > 1"""
         wb = self.load_workbook()
-        max_row = max(self.header_row, self.formula_row)
+        sheets = extract_sheets(self.file_path, [self.header_row, self.formula_row], self.jobs, wb.sheetnames)
         
-        for sheet_name in wb.sheetnames:
+        for sheet_name, cells in sheets.items():
             self.headers[sheet_name] = {}
             self.formulas[sheet_name] = {}
             
-            # Create a new worksheet reader for each sheet
-            ws = wb[sheet_name]
-            
-            # Only iterate through rows up to formula_row
-            for row_idx, row in enumerate(ws.iter_rows(min_row=1, max_row=max_row, values_only=False), start=1):
-                for cell in row:
-                    if cell.value:
-                        col_letter = get_column_letter(cell.column)
+            for row_idx, col, formula, value in cells:
+                cell_value = formula or value
+                if cell_value:
+                    col_letter = get_column_letter(col)
+                    
+                    # Store headers
+                    if row_idx == self.header_row:
+                        self.headers[sheet_name][col_letter] = cell_value
                         
-                        # Store headers
-                        if row_idx == self.header_row:
-                            self.headers[sheet_name][col_letter] = cell.value
-                            
-                        # Store formulas
-                        elif row_idx == self.formula_row:
-                            self.formulas[sheet_name][col_letter] = (
-                                cell.value if isinstance(cell.value, str) and cell.value.startswith('=') 
-                                else None
-                            )
-            
-            # Close the worksheet to free memory
-            ws.parent._archive.close()
+                    # Store formulas
+                    elif row_idx == self.formula_row:
+                        self.formulas[sheet_name][col_letter] = formula
 
     def _parse_column_references(self, formula: str) -> Set[tuple]:
         """Extract column references from a formula"""
@@ -625,11 +560,20 @@ class ExcelFormulaDependencyParser:
             
         return col_refs
 
-    def build_dependency_tree(self, sheet_name: str, column: str) -> dict:
-        """Build a dependency tree for a given column"""
+    def build_dependency_tree(self, sheet_name: str, column: str, dedup: bool = False) -> dict:
+        """
+        Build a dependency tree for a given column.
+        
+        Each column is expanded once. A later reference to it is dropped, or
+        with dedup=True linked to the same node dict so print_tree can show
+        a back-reference.
+        """
+        finished = {}  # (sheet, col) -> node dict, filled in when dedup is on
+
         def _build_tree(sheet: str, col: str, visited: Set[tuple]) -> dict:
             node = {
                 'name': f"{self.headers[sheet][col] if col in self.headers[sheet] else col}",
+                'ref': f"{sheet}!{col}",
                 'children': []
             }
             
@@ -646,36 +590,155 @@ class ExcelFormulaDependencyParser:
                     if (dep_sheet, dep_col) not in visited:
                         child_tree = _build_tree(dep_sheet, dep_col, visited)
                         node['children'].append(child_tree)
+                    elif dedup and (dep_sheet, dep_col) in finished:
+                        node['children'].append(finished[(dep_sheet, dep_col)])
             
+            if dedup:
+                finished[current] = node
             return node
 
         self.load_workbook()  # Ensure workbook is loaded
         return _build_tree(sheet_name, column, set())
 
-    def print_tree(self, tree: dict, indent: str = "", is_last: bool = True):
-        """Print the dependency tree in a Windows explorer-like format"""
+    def print_tree(self, tree: dict, indent: str = "", is_last: bool = True,
+                   limits: Optional[RenderLimits] = None, depth: int = 0):
+        """
+        Print the dependency tree in a Windows explorer-like format.
+        
+        Pass RenderLimits to print repeated subtrees as back-references and to
+        cap the depth or the number of printed nodes.
+        """
+        limits = limits or RenderLimits()
         prefix = "└── " if is_last else "├── "
+        if not limits.take():
+            note = limits.budget_note()
+            if note:
+                print(f"{indent}{prefix}{note}")
+            return
+        
+        children = tree['children']
+        ref = tree.get('ref', tree['name'])
+        if children and limits.anchor(ref):
+            print(f"{indent}{prefix}{tree['name']} {limits.see(ref)}")
+            return
+        if children and limits.stops_at(depth):
+            print(f"{indent}{prefix}{tree['name']} {limits.depth_note(len(children))}")
+            return
         print(f"{indent}{prefix}{tree['name']}")
+        if children and limits.dedup:
+            limits.expand(ref)
         
         child_indent = indent + ("    " if is_last else "│   ")
-        children = tree['children']
         
         for i, child in enumerate(children):
             is_last_child = i == len(children) - 1
-            self.print_tree(child, child_indent, is_last_child)
+            self.print_tree(child, child_indent, is_last_child, limits, depth + 1)
 
     def __del__(self):
         """Cleanup method to ensure workbook is closed"""
         if self.wb:
             self.wb.close()
 
-# Example usage:
+# Impact analysis: every formula downstream of each requested cell or column
+def print_dependents(index, sheet_name, columns, formula_row, whole_column=False):
+    start = time.perf_counter()
+    graph = DependencyGraph(index)
+    print(f"Indexed {len(graph.levels)} nodes in {time.perf_counter() - start:.2f}s")
+    for column in columns:
+        ref = f"{column}:{column}" if whole_column else f"{column}{formula_row}"
+        start = time.perf_counter()
+        dependents = graph.dependents(sheet_name, ref)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\n{sheet_name}!{ref}: {len(dependents)} dependents ({elapsed:.1f} ms)")
+        for dep_sheet, dep_ref in dependents:
+            print(f"  {dep_sheet}!{dep_ref} = {index.get_cell(dep_sheet, dep_ref)[0]}")
+
+# Main function to orchestrate the process
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Generate a dependency tree for an Excel column.")
+    parser.add_argument('file', help='Path to the Excel file (.xlsx)')
+    parser.add_argument('sheet', help='Name of the initial sheet')
+    parser.add_argument('column', help='Result column (e.g., Z)')
+    parser.add_argument('header_row', type=int, help='Row number with headers (e.g., 1)')
+    parser.add_argument('formula_row', type=int, help='Row number with the formula to analyze (e.g., 2)')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes used to parse sheets in parallel (default: 1)')
+    parser.add_argument('--cache', action='store_true', help='Reuse extracted cells and references from a sidecar cache next to the workbook')
+    parser.add_argument('--graph', action='store_true', help='Build the whole-workbook dependency graph once and serve the tree from it')
+    parser.add_argument('--output', default='dependency_tree.html',
+                        help='HTML file to write, gzip-compressed when it ends in .gz (default: dependency_tree.html)')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Write a JSON node table with a viewer that renders nodes only when expanded')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Expand each cell once and link repeat visits back to it (→ see Sheet2!C2)')
+    parser.add_argument('--max-depth', type=int, help='Show nodes below this depth without expanding them')
+    parser.add_argument('--max-nodes', type=int, help='Stop rendering after this many nodes')
+    parser.add_argument('--dependents', nargs='?', const='cell', choices=['cell', 'column'],
+                        help='List every formula that changes with the cell (default) or the whole column instead of '
+                             'building a tree; column may be a comma-separated list, e.g. B,C,D')
+    args = parser.parse_args()
+
+    # Index the workbook in one streaming pass (keeps formulas, not just values)
+    cache = DependencyCache(args.file) if args.cache else None
+    index = CellIndex.from_workbook(args.file, args.header_row, args.jobs, cache)
+
+    if args.dependents:
+        print_dependents(index, args.sheet, args.column.split(','), args.formula_row, args.dependents == 'column')
+        if cache is not None:
+            cache.close()
+        return
+
+    # Construct the initial cell reference (e.g., 'Z2')
+    initial_ref = f"{args.column}{args.formula_row}"
+
+    # Build the dependency tree
+    # Limits need the shared graph views; expanding build_tree's copies would still be exponential
+    limits = RenderLimits(args.dedup, args.max_depth, args.max_nodes)
+    if args.graph or args.lazy or args.dedup or args.max_depth is not None or args.max_nodes is not None:
+        graph = DependencyGraph(index)
+        print(f"Dependency graph: {len(graph.levels)} nodes, {len(graph.cycles)} circular references, "
+              f"{max(graph.levels.values(), default=-1) + 1} levels")
+        tree = graph.tree(args.sheet, initial_ref)
+    else:
+        tree = None  # Built while it is written
+
+    if args.lazy:
+        table, root_id = node_table(tree)
+        with open_output(args.output) as f:
+            write_viewer(f, f"Dependency Tree for {args.sheet}!{initial_ref}", table, [(None, [root_id])])
+        if cache is not None:
+            cache.close()
+        print(f"Lazy dependency viewer with {len(table)} nodes written to '{args.output}'.")
+        return
+
+    # Stream the HTML to disk as the tree is walked
+    with open_output(args.output) as f:
+        f.write(f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Dependency Tree</title>
+        <style>
+            ul {{ list-style-type: none; padding-left: 20px; }}
+            details {{ margin: 5px 0; }}
+            summary {{ cursor: pointer; }}
+            p {{ margin: 5px 0; }}
+        </style>
+    </head>
+    <body>
+        <h1>Dependency Tree for {args.sheet}!{initial_ref}</h1>
+        """)
+        if tree is None:
+            write_tree_html(args.sheet, initial_ref, index, f)
+        else:
+            write_html(tree, f, limits)
+        f.write("""
+    </body>
+    </html>
+    """)
+    if cache is not None:
+        cache.close()
+    print(f"Dependency tree generated successfully! Open '{args.output}' in your browser.")
+
 if __name__ == "__main__":
-    # Example with custom row numbers
-    parser = ExcelFormulaDependencyParser(
-        "your_excel_file.xlsx",
-        header_row=3,    # Headers are in row 3
-        formula_row=4    # Formulas are in row 4
-    )
-    tree = parser.build_dependency_tree("Sheet1", "B")  # Analyze column B in Sheet1
-    parser.print_tree(tree)
\ No newline at end of file
+    main()
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+from xlsx_reader import XlsxReader
+
+SCHEMA_VERSION = '2'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sheets (
+    name TEXT PRIMARY KEY,
+    position INTEGER,
+    fingerprint TEXT,
+    complete INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sheet_rows (
+    sheet TEXT,
+    row INTEGER,
+    cells TEXT,
+    PRIMARY KEY (sheet, row)
+);
+CREATE TABLE IF NOT EXISTS formula_refs (
+    sheet TEXT,
+    kind TEXT,
+    formula TEXT,
+    refs TEXT,
+    PRIMARY KEY (sheet, kind, formula)
+);
+"""
+
+
+def default_cache_path(file_path):
+    """Sidecar file stored next to the workbook."""
+    return os.path.splitext(file_path)[0] + '.depcache.sqlite'
+
+
+class DependencyCache:
+    """
+    On-disk cache of extracted cells and parsed references for one workbook.
+
+    The workbook's size and mtime are checked first; only when they differ
+    are the zip entries fingerprinted (CRC and size from the central
+    directory, nothing is decompressed). A sheet is invalidated when its own
+    XML part changes, or when the shared string table or workbook part it
+    depends on does. Everything else stays cached.
+    """
+
+    def __init__(self, file_path, cache_path=None):
+        self.file_path = file_path
+        self.cache_path = cache_path or default_cache_path(file_path)
+        self.conn = sqlite3.connect(self.cache_path)
+        self._prepare_schema()
+        self._refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def _prepare_schema(self):
+        self.conn.executescript(SCHEMA)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != SCHEMA_VERSION:
+            self._clear()
+            self._set_meta('version', SCHEMA_VERSION)
+
+    def _clear(self):
+        for table in ('meta', 'sheets', 'sheet_rows', 'formula_refs'):
+            self.conn.execute(f"DELETE FROM {table}")
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _refresh(self):
+        """Drop whatever changed in the workbook since the cache was written."""
+        stat = os.stat(self.file_path)
+        if self._get_meta('size') == str(stat.st_size) and self._get_meta('mtime_ns') == str(stat.st_mtime_ns):
+            return
+
+        fingerprints = self._fingerprint_sheets()
+        stored = dict(self.conn.execute("SELECT name, fingerprint FROM sheets"))
+        for name, fingerprint in stored.items():
+            if fingerprints.get(name) != fingerprint:
+                self._invalidate(name)
+        for position, (name, fingerprint) in enumerate(fingerprints.items()):
+            if stored.get(name) == fingerprint:
+                self.conn.execute("UPDATE sheets SET position = ? WHERE name = ?", (position, name))
+            else:
+                self.conn.execute(
+                    "INSERT INTO sheets (name, position, fingerprint, complete) VALUES (?, ?, ?, 0)",
+                    (name, position, fingerprint)
+                )
+        self._set_meta('size', stat.st_size)
+        self._set_meta('mtime_ns', stat.st_mtime_ns)
+        self.conn.commit()
+
+    def _fingerprint_sheets(self):
+        with XlsxReader(self.file_path) as reader:
+            entries = {info.filename: f"{info.CRC:08x}:{info.file_size}" for info in reader.archive.infolist()}
+            # Parts every sheet's extracted values depend on
+            common = [entries.get(reader.workbook_path, '')]
+            common += [entries.get(target, '') for rel_type, target in reader.workbook_rels.values()
+                       if rel_type.endswith('/sharedStrings')]
+            # Table definitions, which structured references are resolved against
+            common += [fingerprint for path, fingerprint in sorted(entries.items()) if '/tables/' in path]
+            fingerprints = {}
+            for name, path in reader.sheet_paths.items():
+                digest = hashlib.sha1('|'.join(common + [name, entries.get(path, '')]).encode('utf-8'))
+                fingerprints[name] = digest.hexdigest()
+        return fingerprints
+
+    def _invalidate(self, sheet_name):
+        self.conn.execute("DELETE FROM sheets WHERE name = ?", (sheet_name,))
+        self.conn.execute("DELETE FROM sheet_rows WHERE sheet = ?", (sheet_name,))
+        self.conn.execute("DELETE FROM formula_refs WHERE sheet = ?", (sheet_name,))
+
+    @property
+    def sheetnames(self):
+        return [name for (name,) in self.conn.execute("SELECT name FROM sheets ORDER BY position")]
+
+    def _is_complete(self, sheet_name):
+        found = self.conn.execute("SELECT complete FROM sheets WHERE name = ?", (sheet_name,)).fetchone()
+        return bool(found and found[0])
+
+    def get_rows(self, sheet_name, rows):
+        """Return {row: {column_index: (formula, value)}} or None unless every row is cached."""
+        result = {}
+        complete = None
+        for row in rows:
+            found = self.conn.execute(
+                "SELECT cells FROM sheet_rows WHERE sheet = ? AND row = ?", (sheet_name, row)
+            ).fetchone()
+            if found is None:
+                if complete is None:
+                    complete = self._is_complete(sheet_name)
+                if not complete:
+                    return None
+                found = ('[]',)  # Fully extracted sheets only store non-empty rows
+            result[row] = {col: (formula, value) for col, formula, value in json.loads(found[0])}
+        return result
+
+    def put_rows(self, sheet_name, rows):
+        """Store {row: {column_index: (formula, value)}}; empty rows are stored too."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO sheet_rows (sheet, row, cells) VALUES (?, ?, ?)",
+            [(sheet_name, row, json.dumps([[col, formula, value] for col, (formula, value) in cells.items()]))
+             for row, cells in rows.items()]
+        )
+
+    def get_sheet(self, sheet_name):
+        """Return every cached (row, column_index, formula, value) of a fully extracted sheet, else None."""
+        if not self._is_complete(sheet_name):
+            return None
+        cells = []
+        for row, data in self.conn.execute(
+            "SELECT row, cells FROM sheet_rows WHERE sheet = ? ORDER BY row", (sheet_name,)
+        ):
+            cells.extend((row, col, formula, value) for col, formula, value in json.loads(data))
+        return cells
+
+    def put_sheet(self, sheet_name, cells):
+        """Store a full extraction given as (row, column_index, formula, value) tuples."""
+        rows = {}
+        for row, col, formula, value in cells:
+            rows.setdefault(row, {})[col] = (formula, value)
+        self.put_rows(sheet_name, rows)
+        self.conn.execute("UPDATE sheets SET complete = 1 WHERE name = ?", (sheet_name,))
+
+    def references(self, sheet_name, formula, parse, kind='tokens'):
+        """
+        Return parse(formula) for a formula on sheet_name, parsing it only once.
+
+        kind separates the reference lists of the different extractors, which
+        do not produce the same shape of result for the same formula.
+        """
+        found = self.conn.execute(
+            "SELECT refs FROM formula_refs WHERE sheet = ? AND kind = ? AND formula = ?",
+            (sheet_name, kind, formula)
+        ).fetchone()
+        if found is not None:
+            return [tuple(ref) for ref in json.loads(found[0])]
+        refs = parse(formula)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO formula_refs (sheet, kind, formula, refs) VALUES (?, ?, ?, ?)",
+            (sheet_name, kind, formula, json.dumps([list(ref) for ref in refs]))
+        )
+        return refs
@@ -0,0 +1,1287 @@
+import argparse
+import copy
+import math
+import re
+import time
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+import numpy as np
+from openpyxl.formula.tokenizer import Tokenizer
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from formula_shapes import ColumnShapes
+from lookup_index import LookupCache, LookupIndex, compare_key
+from range_index import MAX_ROW, parse_range, unquote_sheet
+from xlsx_reader import split_coordinate
+
+# Cached results Excel writes for formulas that failed; they are all NaN here
+ERRORS = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A', '#GETTING_DATA', '#SPILL!', '#CALC!'}
+
+COMPARISONS = {'=', '<>', '<', '>', '<=', '>='}
+PRECEDENCE = {'=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1, '&': 2, '+': 3, '-': 3, '*': 4, '/': 4, '^': 5}
+
+# One side of an A1 reference: optional $ and column letters, optional $ and row digits
+A1_PART_RE = re.compile(r"^(\$?)([A-Za-z]{0,3})(\$?)(\d*)$")
+
+
+class UnsupportedFormula(Exception):
+    """A formula uses syntax or a function the engine does not evaluate."""
+
+
+class _PerCell(Exception):
+    # Raised when a run cannot be evaluated as one vector (e.g. a lookup table
+    # that moves with the row); the engine then evaluates the run cell by cell
+    pass
+
+
+class Area(NamedTuple):
+    """A rectangular range, its rows as ints (absolute) or arrays (one per evaluated row)."""
+    sheet: str
+    first_row: object
+    first_col: int
+    last_row: object
+    last_col: int
+
+
+class Run(NamedTuple):
+    """Rows first_row..last_row of one column, all holding the same R1C1 formula."""
+    sheet: str
+    col: int
+    first_row: int
+    last_row: int
+    shape: str
+
+
+# ---------------------------------------------------------------- compiling
+
+def _side(part):
+    # (row_absolute, row or None, col_absolute, col or None) for 'A1', '$A$1', 'A' or '1'
+    match = A1_PART_RE.match(part)
+    if match is None:
+        raise UnsupportedFormula(f"Unsupported reference {part}")
+    col_abs, letters, row_abs, digits = match.groups()
+    return (bool(row_abs), int(digits) if digits else None,
+            bool(col_abs), column_index_from_string(letters.upper()) if letters else None)
+
+
+def _reference(sheet, ref, row, col, absolute):
+    """
+    Compile one concrete reference seen from (row, col): ('ref', ...) for a
+    cell, ('area', ...) for a range. Relative parts are stored as offsets so
+    the same tree serves every cell of a run.
+    """
+    sides = [_side(part) for part in ref.split(':')]
+    compiled = []
+    for row_abs, ref_row, col_abs, ref_col in sides:
+        if ref_col is None:
+            raise UnsupportedFormula(f"Whole-row reference {ref}")
+        row_abs = row_abs or absolute or ref_row is None
+        col_abs = col_abs or absolute
+        compiled.append((row_abs, ref_row if row_abs else ref_row - row,
+                         col_abs, ref_col if col_abs else ref_col - col))
+    if len(compiled) == 1:
+        return ('ref', sheet) + compiled[0]
+    (row1_abs, row1, col1_abs, col1), (row2_abs, row2, col2_abs, col2) = compiled
+    # Whole columns (A:C) are read down to the last used row
+    return ('area', sheet, (row1_abs, 1 if row1 is None else row1), (col1_abs, col1),
+            (row2_abs, MAX_ROW if row2 is None else row2), (col2_abs, col2))
+
+
+def _operand(value, sheet, row, col, resolver):
+    if resolver is not None:
+        resolved = resolver.resolve(value, sheet, row, col)
+        if resolved is not None:
+            # Names and table columns point at fixed cells; [@Col] moves with the row
+            absolute = not resolver.position_dependent(value)
+            areas = [_reference(target_sheet, ref, row, col, absolute) for target_sheet, ref in resolved]
+            if len(areas) == 1:
+                return areas[0]
+            return ('areas', areas)
+    if '!' in value:
+        sheet_part, ref = value.rsplit('!', 1)
+        if ':' in sheet_part:
+            raise UnsupportedFormula(f"3D reference {value}")
+        return _reference(unquote_sheet(sheet_part), ref, row, col, False)
+    return _reference(sheet, value, row, col, False)
+
+
+class _Parser:
+    """Precedence-climbing parser over the openpyxl token stream."""
+
+    def __init__(self, formula, sheet, row, col, resolver):
+        self.tokens = [token for token in Tokenizer(formula).items if token.type != 'WHITE-SPACE']
+        self.position = 0
+        self.sheet, self.row, self.col, self.resolver = sheet, row, col, resolver
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise UnsupportedFormula("Unexpected end of formula")
+        self.position += 1
+        return token
+
+    def parse(self):
+        tree = self.expression(0)
+        if self.peek() is not None:
+            raise UnsupportedFormula(f"Unexpected {self.peek().value}")
+        return tree
+
+    def expression(self, min_precedence):
+        left = self.unary()
+        while True:
+            token = self.peek()
+            if token is None or token.type != 'OPERATOR-INFIX' or token.value not in PRECEDENCE:
+                return left
+            precedence = PRECEDENCE[token.value]
+            if precedence < min_precedence:
+                return left
+            self.next()
+            left = ('op', token.value, left, self.expression(precedence + 1))
+
+    def unary(self):
+        token = self.peek()
+        if token is not None and token.type == 'OPERATOR-PREFIX':
+            self.next()
+            operand = self.unary()
+            return ('neg', operand) if token.value == '-' else operand
+        node = self.primary()
+        while self.peek() is not None and self.peek().type == 'OPERATOR-POSTFIX':
+            self.next()
+            node = ('op', '/', node, ('const', 100.0))
+        return node
+
+    def primary(self):
+        token = self.next()
+        if token.type == 'OPERAND':
+            if token.subtype == 'NUMBER':
+                return ('const', float(token.value))
+            if token.subtype == 'TEXT':
+                return ('const', token.value[1:-1].replace('""', '"'))
+            if token.subtype == 'LOGICAL':
+                return ('const', token.value.upper() == 'TRUE')
+            if token.subtype == 'ERROR':
+                return ('const', np.nan)
+            return _operand(token.value, self.sheet, self.row, self.col, self.resolver)
+        if token.type == 'FUNC' and token.subtype == 'OPEN':
+            name = token.value[:-1].upper()
+            if name.startswith('_XLFN.'):
+                name = name[6:]
+            if name not in FUNCTIONS:
+                raise UnsupportedFormula(f"Unsupported function {name}")
+            args = []
+            if self.peek() is not None and self.peek().type == 'FUNC' and self.peek().subtype == 'CLOSE':
+                self.next()
+                return ('call', name, args)
+            while True:
+                token = self.peek()
+                if token is not None and (token.type == 'SEP' or token.type == 'FUNC' and token.subtype == 'CLOSE'):
+                    args.append(None)  # Omitted argument, e.g. VLOOKUP(A2,B:C,2,)
+                else:
+                    args.append(self.expression(0))
+                token = self.next()
+                if token.type == 'FUNC' and token.subtype == 'CLOSE':
+                    return ('call', name, args)
+                if token.type != 'SEP' or token.subtype != 'ARG':
+                    raise UnsupportedFormula(f"Unexpected {token.value}")
+        if token.type == 'PAREN' and token.subtype == 'OPEN':
+            node = self.expression(0)
+            token = self.next()
+            if token.type != 'PAREN' or token.subtype != 'CLOSE':
+                raise UnsupportedFormula(f"Unexpected {token.value}")
+            return node
+        raise UnsupportedFormula(f"Unsupported token {token.value}")
+
+
+def compile_formula(formula, sheet, row, col, resolver=None):
+    """Expression tree of a formula written in sheet!(row, col), with relative references as offsets."""
+    return _Parser(formula, sheet, row, col, resolver).parse()
+
+
+# ---------------------------------------------------------------- values
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _vector(value, n):
+    """Broadcast a scalar or array result to n rows, keeping text as Python objects."""
+    array = np.asarray(value)
+    if array.dtype.kind in 'US':
+        array = array.astype(object)
+    return np.broadcast_to(array, (n,))
+
+
+def _to_number(value):
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return np.nan  # #VALUE!
+    if value is None:
+        return 0.0
+    return float(value)
+
+
+_to_number_vector = np.frompyfunc(_to_number, 1, 1)
+
+
+def _numeric(value):
+    """Numbers for arithmetic: text that reads as a number converts, other text is #VALUE! (NaN)."""
+    array = np.asarray(value)
+    if array.dtype.kind in 'biuf':
+        return array.astype(float)
+    # frompyfunc returns a bare float for a 0-d array (a text constant), not an array
+    return np.asarray(_to_number_vector(array)).astype(float)
+
+
+def _truth(value):
+    array = np.asarray(value)
+    if array.dtype.kind in 'biuf':
+        return array != 0
+    return np.asarray(_to_number_vector(array)).astype(float) != 0
+
+
+def _where(condition, if_true, if_false):
+    a, b = np.asarray(if_true), np.asarray(if_false)
+    if a.dtype.kind not in 'biuf' or b.dtype.kind not in 'biuf':
+        a, b = a.astype(object), b.astype(object)
+    return np.where(condition, a, b)
+
+
+_COMPARE = {
+    '=': lambda a, b: a == b, '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b, '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b, '>=': lambda a, b: a >= b,
+}
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+_concat = np.frompyfunc(lambda a, b: _text(a) + _text(b), 2, 1)
+
+
+def _binary(op, left, right):
+    a, b = np.asarray(left), np.asarray(right)
+    if op in COMPARISONS:
+        if a.dtype.kind in 'iuf' and b.dtype.kind in 'iuf':
+            return _COMPARE[op](a, b)
+        compare = _COMPARE[op]
+        return np.asarray(np.frompyfunc(lambda x, y: compare(compare_key(x), compare_key(y)), 2, 1)(a, b)).astype(bool)
+    if op == '&':
+        return _concat(a, b)
+    a, b = _numeric(a), _numeric(b)
+    with np.errstate(all='ignore'):
+        if op == '+':
+            result = a + b
+        elif op == '-':
+            result = a - b
+        elif op == '*':
+            result = a * b
+        elif op == '/':
+            result = a / b
+        else:
+            result = np.power(a, b)
+    return np.where(np.isfinite(result), result, np.nan)  # #DIV/0! and overflows become errors
+
+
+def _is_error(value):
+    array = np.asarray(value)
+    if array.dtype.kind == 'f':
+        return np.isnan(array)
+    if array.dtype.kind in 'biu':
+        return np.zeros(array.shape, dtype=bool)
+    return np.asarray(np.frompyfunc(lambda v: isinstance(v, float) and math.isnan(v), 1, 1)(array)).astype(bool)
+
+
+def _scalar_bounds(area):
+    """(first_row, last_row) of an area as ints; a range that moves with the row is handled per cell."""
+    bounds = []
+    for value in (area.first_row, area.last_row):
+        if isinstance(value, np.ndarray):
+            if value.size and (value == value.flat[0]).all():
+                value = int(value.flat[0])
+            else:
+                raise _PerCell()
+        bounds.append(value)
+    return bounds
+
+
+EMPTY_ROWS = np.zeros(0, dtype=np.int64)
+
+
+def _all_rows(run):
+    return np.arange(run.first_row, run.last_row + 1)
+
+
+def _contains(rows, row):
+    # rows is sorted
+    position = np.searchsorted(rows, row)
+    return position < len(rows) and rows[position] == row
+
+
+# ---------------------------------------------------------------- functions
+
+def _sum(engine, n, *args):
+    total = np.zeros(n)
+    for arg in args:
+        if isinstance(arg, Area):
+            total = total + engine.area_sum(arg, n)
+        elif isinstance(arg, list):
+            for area in arg:
+                total = total + engine.area_sum(area, n)
+        elif arg is not None:
+            total = total + _numeric(arg)
+    return total
+
+
+def _if(engine, n, condition, if_true=True, if_false=False):
+    return _where(_truth(condition), True if if_true is None else if_true, False if if_false is None else if_false)
+
+
+def _iferror(engine, n, value, fallback=0.0):
+    return _where(_is_error(value), 0.0 if fallback is None else fallback, value)
+
+
+def _and(engine, n, *args):
+    return np.logical_and.reduce([_truth(arg) for arg in args if arg is not None] or [np.ones(n, bool)])
+
+
+def _or(engine, n, *args):
+    return np.logical_or.reduce([_truth(arg) for arg in args if arg is not None] or [np.zeros(n, bool)])
+
+
+def _not(engine, n, value):
+    return ~_truth(value)
+
+
+def _abs(engine, n, value):
+    return np.abs(_numeric(value))
+
+
+def _round(engine, n, value, digits=0.0):
+    # Excel rounds halves away from zero
+    factor = np.power(10.0, _numeric(0.0 if digits is None else digits))
+    number = _numeric(value)
+    return np.sign(number) * np.floor(np.abs(number) * factor + 0.5) / factor
+
+
+def _vlookup(engine, n, value, table, col_index, approximate=True):
+    if not isinstance(table, Area):
+        raise UnsupportedFormula("VLOOKUP table must be a range")
+    first_row, last_row = engine.clamp_rows(table.sheet, *_scalar_bounds(table))
+    # An empty fourth argument, VLOOKUP(A2,B:C,2,), means FALSE
+    exact = approximate is None or not np.all(_truth(approximate))
+    index = engine.lookup_index(table.sheet, table.first_col, first_row, last_row)
+    positions = _vector(index.positions(value, 0 if exact else 1), n)
+    columns = _vector(_numeric(col_index).astype(np.int64), n)
+    return engine.gather(table.sheet, first_row + positions, table.first_col + columns - 1,
+                         (positions >= 0) & (columns >= 1) & (columns <= table.last_col - table.first_col + 1))
+
+
+def _index(engine, n, area, row_num, col_num=None):
+    if not isinstance(area, Area):
+        raise UnsupportedFormula("INDEX needs a range")
+    top, bottom = _scalar_bounds(area)
+    first_row, last_row = engine.clamp_rows(area.sheet, top, bottom)
+    rows = _vector(_numeric(row_num).astype(np.int64), n)
+    columns = _vector(_numeric(1.0 if col_num is None else col_num).astype(np.int64), n)
+    if col_num is None and top == bottom:  # INDEX(A1:Z1, n) walks the row
+        rows, columns = np.ones(n, np.int64), rows
+    valid = (rows >= 1) & (rows <= last_row - first_row + 1) & (columns >= 1) & \
+            (columns <= area.last_col - area.first_col + 1)
+    return engine.gather(area.sheet, first_row + rows - 1, area.first_col + columns - 1, valid)
+
+
+def _match(engine, n, value, area, match_type=1.0):
+    if not isinstance(area, Area):
+        raise UnsupportedFormula("MATCH needs a range")
+    first_row, last_row = engine.clamp_rows(area.sheet, *_scalar_bounds(area))
+    if area.first_col == area.last_col:
+        index = engine.lookup_index(area.sheet, area.first_col, first_row, last_row)
+    elif first_row == last_row:
+        index = LookupIndex(np.array([engine.column(area.sheet, col)[first_row]
+                                      for col in range(area.first_col, area.last_col + 1)], dtype=object))
+    else:
+        raise UnsupportedFormula("MATCH needs a single row or column")
+    kind = 1 if match_type is None else int(np.sign(float(np.asarray(match_type).flat[0])))
+    positions = _vector(index.positions(value, kind), n)
+    return np.where(positions >= 0, positions + 1.0, np.nan)
+
+
+# Argument positions that receive a range as an Area instead of its values
+RANGE_ARGS = {'SUM': range(255), 'VLOOKUP': (1,), 'INDEX': (0,), 'MATCH': (1,)}
+
+FUNCTIONS = {
+    'SUM': _sum, 'IF': _if, 'IFERROR': _iferror, 'AND': _and, 'OR': _or, 'NOT': _not,
+    'ABS': _abs, 'ROUND': _round, 'VLOOKUP': _vlookup, 'INDEX': _index, 'MATCH': _match,
+}
+
+
+# ---------------------------------------------------------------- code generation
+
+def _area(sheet, first_row, first_col, last_row, last_col, rows):
+    if len(rows) == 1:
+        first_row, last_row = int(np.asarray(first_row).flat[0]), int(np.asarray(last_row).flat[0])
+    return Area(sheet, first_row, min(first_col, last_col), last_row, max(first_col, last_col))
+
+
+def _scalar_number(value):
+    return _to_number(value) if not isinstance(value, float) else value
+
+
+def _scalar_truth(value):
+    return _scalar_number(value) != 0
+
+
+def _scalar_where(condition, if_true, if_false):
+    # As _where: a logical branch next to a number is promoted to 1.0 or 0.0
+    value, other = (if_true, if_false) if condition else (if_false, if_true)
+    if isinstance(value, bool) and isinstance(other, (int, float)) and not isinstance(other, bool):
+        return float(value)
+    return value
+
+
+def _scalar_binary(op, left, right):
+    if op in COMPARISONS:
+        if _is_number(left) and _is_number(right):
+            return bool(_COMPARE[op](left, right))
+        return bool(_COMPARE[op](compare_key(left), compare_key(right)))
+    if op == '&':
+        return _text(left) + _text(right)
+    a, b = _scalar_number(left), _scalar_number(right)
+    try:
+        if op == '+':
+            result = a + b
+        elif op == '-':
+            result = a - b
+        elif op == '*':
+            result = a * b
+        elif op == '/':
+            result = a / b
+        else:
+            result = math.pow(a, b)
+    except (ZeroDivisionError, OverflowError, ValueError):
+        return np.nan
+    return result if math.isfinite(result) else np.nan  # #DIV/0! and overflows become errors
+
+
+def _scalar_is_error(value):
+    return isinstance(value, float) and math.isnan(value)
+
+
+def _scalar_iferror(value, fallback):
+    return _scalar_where(_scalar_is_error(value), fallback, value)
+
+
+def _scalar_sum(engine, *args):
+    total = 0.0
+    for arg in args:
+        if isinstance(arg, Area):
+            total += float(engine.area_sum(arg, 1))
+        elif isinstance(arg, list):
+            for area in arg:
+                total += float(engine.area_sum(area, 1))
+        elif arg is not None:
+            total += _scalar_number(arg)
+    return total
+
+
+def _scalar_round(value, digits=0.0):
+    factor = 10.0 ** _scalar_number(0.0 if digits is None else digits)
+    number = _scalar_number(value)
+    return float(np.sign(number) * np.floor(abs(number) * factor + 0.5) / factor)
+
+
+def _scalar_call(function, engine, *args):
+    # A function without a scalar form runs as a vector of one
+    value = np.asarray(function(engine, 1, *args)).flat[0]
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Scalar forms of the functions, as expressions over their argument list ({0}, {1}, ...; {args} for all)
+SCALAR_FUNCTIONS = {
+    'SUM': '_scalar_sum(engine, {args})',
+    'IF': '_scalar_where(_scalar_truth({0}), {1|True}, {2|False})',
+    'IFERROR': '_scalar_iferror({0}, {1|0.0})',
+    'AND': 'all([{truths|True}])',
+    'OR': 'any([{truths|False}])',
+    'NOT': '(not _scalar_truth({0}))',
+    'ABS': 'abs(_scalar_number({0}))',
+    'ROUND': '_scalar_round({args})',
+}
+
+
+class _CodeWriter:
+    """
+    Python source for one compiled formula tree. Constants, sheet names and
+    functions are bound as globals of the generated function rather than
+    written out, so any value round-trips exactly.
+    """
+
+    def __init__(self, scalar):
+        self.scalar = scalar
+        self.names = {}  # Global name -> bound value
+        self._ids = {}  # (kind, value) -> global name
+
+    def bind(self, kind, value):
+        # True == 1.0 and nan != nan, so constants are told apart by type and repr
+        key = (kind, type(value), repr(value)) if kind == 'const' else (kind, value)
+        name = self._ids.get(key)
+        if name is None:
+            name = self._ids[key] = f"{kind}{len(self._ids)}"
+            self.names[name] = value
+        return name
+
+    def column(self, absolute, col):
+        return str(col) if absolute else f"col + {col}" if col >= 0 else f"col - {-col}"
+
+    def row(self, absolute, row):
+        if absolute:
+            return str(row)
+        name = 'row' if self.scalar else 'rows'
+        return f"{name} + {row}" if row >= 0 else f"{name} - {-row}"
+
+    def expression(self, node, as_area=False):
+        kind = node[0]
+        if kind == 'const':
+            return self.bind('const', node[1])
+        if kind == 'ref':
+            _, sheet_name, row_abs, row, col_abs, ref_col = node
+            sheet = self.bind('sheet', sheet_name)
+            target_row, target_col = self.row(row_abs, row), self.column(col_abs, ref_col)
+            if as_area:
+                return f"Area({sheet}, {target_row}, {target_col}, {target_row}, {target_col})"
+            if self.scalar:
+                return f"engine.cell({sheet}, {target_col}, {target_row})"
+            return f"engine.read({sheet}, {target_col}, engine._rows({sheet}, {target_row}))"
+        if kind == 'area':
+            if not as_area:
+                raise UnsupportedFormula("Range used as a single value")
+            _, sheet_name, (row1_abs, row1), (col1_abs, col1), (row2_abs, row2), (col2_abs, col2) = node
+            sheet = self.bind('sheet', sheet_name)
+            first_row, last_row = self.row(row1_abs, row1), self.row(row2_abs, row2)
+            first_col, last_col = self.column(col1_abs, col1), self.column(col2_abs, col2)
+            if self.scalar:
+                return (f"Area({sheet}, {first_row}, min({first_col}, {last_col}), {last_row}, "
+                        f"max({first_col}, {last_col}))")
+            return f"_area({sheet}, {first_row}, {first_col}, {last_row}, {last_col}, rows)"
+        if kind == 'areas':
+            if not as_area:
+                raise UnsupportedFormula("Multiple areas used as a single value")
+            return f"[{', '.join(self.expression(area, True) for area in node[1])}]"
+        if kind == 'neg':
+            operand = self.expression(node[1])
+            return f"(-_scalar_number({operand}))" if self.scalar else f"(-_numeric({operand}))"
+        if kind == 'op':
+            left, right = self.expression(node[2]), self.expression(node[3])
+            return f"{'_scalar_binary' if self.scalar else '_binary'}({node[1]!r}, {left}, {right})"
+        if kind == 'call':
+            return self.call(node[1], node[2])
+        raise UnsupportedFormula(f"Unknown node {kind}")
+
+    def call(self, name, args):
+        range_args = RANGE_ARGS.get(name, ())
+        written = ['None' if arg is None else self.expression(arg, position in range_args)
+                   for position, arg in enumerate(args)]
+        function = self.bind('function', FUNCTIONS[name])
+        if not self.scalar:
+            return f"{function}(engine, len(rows), {', '.join(written)})"
+        template = SCALAR_FUNCTIONS.get(name)
+        if template is None:
+            return f"_scalar_call({function}, engine, {', '.join(written)})"
+
+        def argument(match):
+            field, _, default = match.group(1).partition('|')
+            if field == 'args':
+                return ', '.join(written)
+            if field == 'truths':
+                present = [f"_scalar_truth({arg})" for arg in written if arg != 'None']
+                return ', '.join(present) or default
+            position = int(field)
+            if position < len(written) and written[position] != 'None':
+                return written[position]
+            return default or 'None'
+        return re.sub(r"\{([^{}]*)\}", argument, template)
+
+
+def compile_function(tree, scalar=False):
+    """
+    Generate and compile the Python function of a formula tree, shared by
+    every cell of its shape. The vector form, f(engine, rows, col), returns
+    the values of many rows at once; the scalar form, f(engine, row, col),
+    the value of one cell with plain Python values, for cells evaluated one
+    by one. The generated source is kept in f.source.
+    """
+    writer = _CodeWriter(scalar)
+    body = writer.expression(tree)
+    source = f"def formula(engine, {'row' if scalar else 'rows'}, col):\n    return {body}\n"
+    namespace = dict(writer.names, Area=Area, _area=_area, _binary=_binary, _numeric=_numeric,
+                     _scalar_binary=_scalar_binary, _scalar_number=_scalar_number,
+                     _scalar_truth=_scalar_truth, _scalar_where=_scalar_where,
+                     _scalar_iferror=_scalar_iferror, _scalar_sum=_scalar_sum,
+                     _scalar_round=_scalar_round, _scalar_call=_scalar_call)
+    exec(compile(source, '<formula>', 'exec'), namespace)
+    function = namespace['formula']
+    function.source = source
+    return function
+
+
+# ---------------------------------------------------------------- engine
+
+# Up to this many dirty rows of a run are evaluated with the scalar functions: numpy costs more per call
+SCALAR_ROWS = 16
+
+
+class FormulaEngine:
+    """
+    Evaluates every formula of a workbook over NumPy column arrays.
+
+    Formula cells are grouped into runs: consecutive rows of a column whose
+    formulas share one R1C1 shape. Each shape is compiled once into a
+    generated Python function (compile_function) and a run is evaluated
+    with one call of it over all of its rows. Runs are
+    ordered with Tarjan's algorithm over the ranges they read; a run that
+    reads its own column (a running balance) or sits in a loop with other
+    runs is evaluated cell by cell, with the scalar form of the function,
+    in the DependencyGraph's topological order instead. Circular references and unsupported formulas keep the
+    cached values stored in the workbook.
+
+    Blank cells read as 0, errors are stored as NaN. set_value() writes an
+    input cell and re-evaluates only the rows that depend on it.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.index = graph.index
+        self.resolver = getattr(self.index, 'resolver', None)
+        self.nrows = {}  # Sheet name -> last used row
+        self.columns = {}  # (sheet, column_index) -> array indexed by row number
+        self._numbers = {}  # (sheet, column_index) -> float view of a text column, for sums
+        self._text = {}  # (sheet, column_index) -> mask of the cells _numbers reads as 0 (text, logical, blank)
+        self._compiled = {}  # (sheet, shape) -> expression tree
+        self._functions = {}  # (sheet, shape, scalar) -> compile_function() of the tree
+        self.lookups = LookupCache()  # Key indexes shared by every VLOOKUP and MATCH over the same range
+        self.runs = []
+        self.unsupported = {}  # Run -> reason it was left at its cached values
+        self._order = None  # evaluation_order(), computed on first use
+        self._circular = set()  # Cells in circular references, never evaluated
+        self._run_references = {}  # Run -> 'ref' and 'area' nodes of its formula, for set_values()
+        self._levels = {}  # Cell of a circular run group -> topological level
+        self.vector_runs = 0
+        self.cell_runs = 0
+        self._load()
+        self._find_runs()
+
+    # -- storage
+
+    def _load(self):
+        for sheet_name in self.index.values:
+            cells = list(self.index.values[sheet_name]) + list(self.index.formulas.get(sheet_name, ()))
+            self.nrows[sheet_name] = max((row for row, _ in cells), default=0)
+            by_column = {}
+            for (row, col), value in self.index.values[sheet_name].items():
+                by_column.setdefault(col, []).append((row, value))
+            for col, cells in by_column.items():
+                rows = np.fromiter((row for row, _ in cells), dtype=np.int64, count=len(cells))
+                values = [np.nan if isinstance(value, str) and value in ERRORS else value for _, value in cells]
+                if all(_is_number(value) for value in values):
+                    array = np.zeros(self.nrows[sheet_name] + 2)
+                    array[rows] = values
+                else:
+                    array = np.zeros(self.nrows[sheet_name] + 2, dtype=object)
+                    array[rows] = np.array(values, dtype=object)
+                self.columns[(sheet_name, col)] = array
+
+    def column(self, sheet_name, col):
+        """Values of a column indexed by row number; the last slot is a blank past the used rows."""
+        array = self.columns.get((sheet_name, col))
+        if array is None:
+            if sheet_name not in self.nrows:
+                raise UnsupportedFormula(f"Unknown sheet {sheet_name}")
+            array = self.columns[(sheet_name, col)] = np.zeros(self.nrows[sheet_name] + 2)
+        return array
+
+    def numbers(self, sheet_name, col):
+        """A column as floats, text counting as 0, the way SUM reads a range."""
+        array = self.column(sheet_name, col)
+        if array.dtype.kind == 'f':
+            return array
+        found = self._numbers.get((sheet_name, col))
+        if found is None:
+            numeric = np.fromiter((_is_number(value) for value in array), dtype=bool, count=len(array))
+            found = self._numbers[(sheet_name, col)] = np.where(numeric, array, 0.0).astype(float)
+            self._text[(sheet_name, col)] = ~numeric
+        return found
+
+    def read(self, sheet_name, col, rows):
+        """
+        Cells (rows, col). Rows holding only numbers come back as floats even
+        when the column also holds text (its header), so arithmetic and
+        comparisons on them stay vectorized.
+        """
+        array = self.column(sheet_name, col)
+        if array.dtype.kind == 'f' or np.ndim(rows) == 0:
+            return array[rows]
+        numbers = self.numbers(sheet_name, col)
+        if self._text[(sheet_name, col)][rows].any():
+            return array[rows]
+        return numbers[rows]
+
+    def store(self, sheet_name, rows, col, values):
+        array = self.column(sheet_name, col)
+        values = np.asarray(values)
+        if values.dtype.kind not in 'biuf' and array.dtype.kind == 'f':
+            array = self.columns[(sheet_name, col)] = array.astype(object)
+        array[rows] = values
+        numbers = self._numbers.get((sheet_name, col))
+        if numbers is not None and values.dtype.kind in 'iuf':
+            numbers[rows] = values  # Kept in step rather than rebuilt from the whole column
+            self._text[(sheet_name, col)][rows] = False
+        else:
+            self._numbers.pop((sheet_name, col), None)
+        rows = np.asarray(rows)
+        self.lookups.invalidate(sheet_name, col, int(rows.min()), int(rows.max()))
+
+    def lookup_index(self, sheet_name, col, first_row, last_row):
+        """Shared LookupIndex over sheet_name!col rows first_row..last_row."""
+        return self.lookups.get(sheet_name, col, first_row, last_row,
+                                lambda: self.column(sheet_name, col)[first_row:last_row + 1])
+
+    def clamp_rows(self, sheet_name, first_row, last_row):
+        last_used = self.nrows.get(sheet_name, 0)
+        return max(first_row, 1), min(last_row, last_used + 1)
+
+    def _rows(self, sheet_name, rows):
+        # Row numbers past the used range read the blank slot at the end
+        limit = self.nrows.get(sheet_name, 0) + 1
+        return np.where((rows >= 1) & (rows <= limit), rows, limit)
+
+    def gather(self, sheet_name, rows, cols, valid):
+        """Values at (rows[i], cols[i]), NaN (#N/A, #REF!) where valid is False."""
+        rows = self._rows(sheet_name, np.asarray(rows))
+        cols = np.asarray(cols)
+        if not cols.size or (cols == cols.flat[0]).all():
+            values = self.read(sheet_name, int(cols.flat[0]) if cols.size else 1, rows)
+        else:
+            values = np.empty(rows.shape, dtype=object)
+            for col in np.unique(cols[valid]):
+                mask = cols == col
+                values[mask] = self.column(sheet_name, int(col))[rows[mask]]
+            if all(_is_number(value) for value in values[valid]):
+                values = values.astype(float)
+        return _where(valid, values, np.nan)
+
+    def area_sum(self, area, n):
+        """SUM over an area; ranges that move with the row are summed with prefix sums."""
+        total = 0.0
+        for col in range(area.first_col, area.last_col + 1):
+            values = self.numbers(area.sheet, col)
+            if isinstance(area.first_row, np.ndarray) or isinstance(area.last_row, np.ndarray):
+                prefix = np.concatenate(([0.0], np.cumsum(values)))
+                first = np.clip(area.first_row, 1, len(values))
+                last = np.clip(area.last_row, 0, len(values) - 1)
+                total = total + np.where(last >= first, prefix[last + 1] - prefix[np.minimum(first, last + 1)], 0.0)
+            else:
+                first, last = self.clamp_rows(area.sheet, area.first_row, area.last_row)
+                total = total + values[first:last + 1].sum()
+        return total
+
+    def cell(self, sheet_name, col, row):
+        """One cell, for a formula evaluated on its own; rows past the used range read the blank slot."""
+        limit = self.nrows.get(sheet_name, 0) + 1
+        return self.column(sheet_name, col)[row if 1 <= row <= limit else limit]
+
+    def value(self, sheet_name, ref):
+        """Current value of one cell, e.g. value('Sheet1', 'C7')."""
+        row, col = parse_range(ref)[:2]
+        result = self.column(unquote_sheet(sheet_name), col)[row]
+        return result.item() if isinstance(result, np.generic) else result
+
+    # -- runs and ordering
+
+    def _find_runs(self):
+        self._run_starts = {}  # (sheet, column_index) -> ([first_row], [run id]) sorted by first row
+        self._formula_columns = {}  # Sheet name -> sorted column indexes holding formulas
+        for sheet_name, formulas in self.index.formulas.items():
+            shapes = ColumnShapes(sheet_name)
+            for row, col in sorted(formulas, key=lambda cell: (cell[1], cell[0])):
+                shapes.add(row, col, formulas[(row, col)])
+            for col in sorted(shapes.runs):
+                starts = self._run_starts[(sheet_name, col)] = ([], [])
+                for shape_run in shapes.runs[col]:
+                    starts[0].append(shape_run.first_row)
+                    starts[1].append(len(self.runs))
+                    self.runs.append(Run(sheet_name, col, shape_run.first_row, shape_run.last_row, shape_run.shape))
+            self._formula_columns[sheet_name] = sorted(shapes.runs)
+
+    def _runs_in(self, sheet_name, first_row, first_col, last_row, last_col):
+        """Ids of the runs sharing a cell with the box."""
+        columns = self._formula_columns.get(sheet_name, [])
+        for col in columns[bisect_left(columns, first_col):bisect_right(columns, last_col)]:
+            starts, ids = self._run_starts[(sheet_name, col)]
+            # The run starting at or before first_row, then every run starting inside the box
+            for position in range(max(bisect_right(starts, first_row) - 1, 0), bisect_right(starts, last_row)):
+                run = self.runs[ids[position]]
+                if run.last_row >= first_row:
+                    yield ids[position]
+
+    def _run_precedents(self, run):
+        # Cells of a run share their shape, so the boxes spanned by the first and
+        # last cell's precedents, paired up, cover what every cell reads
+        letter = get_column_letter(run.col)
+        first = self.graph.precedents.get((run.sheet, f"{letter}{run.first_row}"), [])
+        last = self.graph.precedents.get((run.sheet, f"{letter}{run.last_row}"), [])
+        if len(first) != len(last):
+            first = last = [dep for row in range(run.first_row, run.last_row + 1)
+                            for dep in self.graph.precedents.get((run.sheet, f"{letter}{row}"), [])]
+        found = set()
+        for (sheet_name, ref1), (_, ref2) in zip(first, last):
+            box1, box2 = parse_range(ref1), parse_range(ref2)
+            found.update(self._runs_in(sheet_name, min(box1[0], box2[0]), min(box1[1], box2[1]),
+                                       max(box1[2], box2[2]), max(box1[3], box2[3])))
+        return found
+
+    def evaluation_order(self):
+        """
+        Groups of run ids, precedents first. A group of one run without a
+        self-reference is evaluated as a vector, any other group cell by cell.
+        """
+        edges = [self._run_precedents(run) for run in self.runs]
+        order, low, stack, on_stack, groups = {}, {}, [], set(), []
+        for root in range(len(self.runs)):
+            if root in order:
+                continue
+            order[root] = low[root] = len(order)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(edges[root]))]
+            while work:
+                node, pending = work[-1]
+                for dep in pending:
+                    if dep not in order:
+                        order[dep] = low[dep] = len(order)
+                        stack.append(dep)
+                        on_stack.add(dep)
+                        work.append((dep, iter(edges[dep])))
+                        break
+                    if dep in on_stack:
+                        low[node] = min(low[node], order[dep])
+                else:
+                    work.pop()
+                    if work:
+                        low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                    if low[node] == order[node]:
+                        members = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            members.append(member)
+                            if member == node:
+                                break
+                        groups.append((members, len(members) > 1 or node in edges[node]))
+        return groups
+
+    # -- evaluation
+
+    def compiled(self, run):
+        key = (run.sheet, run.shape)
+        tree = self._compiled.get(key)
+        if tree is None:
+            formula = self.index.formulas[run.sheet][(run.first_row, run.col)]
+            try:
+                tree = compile_formula(formula, run.sheet, run.first_row, run.col, self.resolver)
+            except UnsupportedFormula as error:
+                tree = error  # Kept, so a detached engine knows without the formula text
+            self._compiled[key] = tree
+        if isinstance(tree, UnsupportedFormula):
+            raise tree
+        return tree
+
+    def evaluate(self, tree, sheet_name, rows, col):
+        """Value of a formula tree for the cells (rows, col), interpreted node by node, as an array over rows."""
+        return _vector(self._eval(tree, rows, col), len(rows))
+
+    def _eval(self, node, rows, col, as_area=False):
+        kind = node[0]
+        if kind == 'const':
+            return node[1]
+        if kind == 'ref':
+            _, sheet_name, row_abs, row, col_abs, ref_col = node
+            target_col = ref_col if col_abs else col + ref_col
+            if as_area:
+                target_row = row if row_abs else rows + row
+                return Area(sheet_name, target_row, target_col, target_row, target_col)
+            return self.read(sheet_name, target_col, self._rows(sheet_name, row if row_abs else rows + row))
+        if kind == 'area':
+            _, sheet_name, (row1_abs, row1), (col1_abs, col1), (row2_abs, row2), (col2_abs, col2) = node
+            first_row = row1 if row1_abs else rows + row1
+            last_row = row2 if row2_abs else rows + row2
+            first_col = col1 if col1_abs else col + col1
+            last_col = col2 if col2_abs else col + col2
+            if len(rows) == 1:
+                first_row, last_row = int(np.asarray(first_row).flat[0]), int(np.asarray(last_row).flat[0])
+            if not as_area:
+                raise UnsupportedFormula("Range used as a single value")
+            return Area(sheet_name, first_row, min(first_col, last_col), last_row, max(first_col, last_col))
+        if kind == 'areas':
+            if not as_area:
+                raise UnsupportedFormula("Multiple areas used as a single value")
+            return [self._eval(area, rows, col, True) for area in node[1]]
+        if kind == 'neg':
+            return -_numeric(self._eval(node[1], rows, col))
+        if kind == 'op':
+            return _binary(node[1], self._eval(node[2], rows, col), self._eval(node[3], rows, col))
+        if kind == 'call':
+            range_args = RANGE_ARGS.get(node[1], ())
+            args = [None if arg is None else self._eval(arg, rows, col, position in range_args)
+                    for position, arg in enumerate(node[2])]
+            return FUNCTIONS[node[1]](self, len(rows), *args)
+        raise UnsupportedFormula(f"Unknown node {kind}")
+
+    def function(self, run, scalar=False):
+        """The generated function of a run's shape, compiled on first use (see compile_function)."""
+        key = (run.sheet, run.shape, scalar)
+        function = self._functions.get(key)
+        if function is None:
+            try:
+                function = compile_function(self.compiled(run), scalar)
+            except UnsupportedFormula as error:
+                function = error
+            self._functions[key] = function
+        if isinstance(function, UnsupportedFormula):
+            raise function
+        return function
+
+    def _evaluate_run(self, run, rows):
+        function = self.function(run)
+        with np.errstate(all='ignore'):
+            self.store(run.sheet, rows, run.col, _vector(function(self, rows, run.col), len(rows)))
+
+    def _groups(self):
+        # The run graph only changes with the formulas, so it is ordered once
+        if self._order is None:
+            self._order = self.evaluation_order()
+            self._circular = {node for members in self.graph.cycles for node in members}
+            # Only cells of groups evaluated one by one need their topological level
+            levels = self.graph.levels
+            for members, per_cell in self._order:
+                if per_cell:
+                    for member in members:
+                        run = self.runs[member]
+                        letter = get_column_letter(run.col)
+                        for row in range(run.first_row, run.last_row + 1):
+                            node = (run.sheet, f"{letter}{row}")
+                            self._levels[node] = levels.get(node, 0)
+        return self._order
+
+    def recalculate(self):
+        """Evaluate every formula, precedents first. Returns self."""
+        self.unsupported = {}
+        self.vector_runs = self.cell_runs = 0
+        self._evaluate(dict.fromkeys(range(len(self.runs))))
+        return self
+
+    def _evaluate(self, rows_by_run):
+        """Evaluate some rows of some runs ({run id: rows, or None for all of them}), precedents first."""
+        for members, per_cell in self._groups():
+            members = [member for member in members if member in rows_by_run]
+            if members:
+                self._evaluate_group(members, per_cell, rows_by_run)
+
+    def _evaluate_group(self, members, per_cell, rows_by_run):
+        if not per_cell:
+            run = self.runs[members[0]]
+            if run in self.unsupported:
+                return
+            rows = rows_by_run[members[0]]
+            if rows is not None and len(rows) <= SCALAR_ROWS:
+                self._evaluate_cells([(run, rows)])
+                return
+            try:
+                self._evaluate_run(run, np.arange(run.first_row, run.last_row + 1) if rows is None
+                                   else np.asarray(rows))
+                self.vector_runs += 1
+                return
+            except UnsupportedFormula as error:
+                self.unsupported[run] = str(error)
+                return
+            except _PerCell:
+                pass
+        self._evaluate_cells([(self.runs[member], rows_by_run[member]) for member in members])
+
+    def _evaluate_cells(self, runs):
+        cells = []
+        for run, rows in runs:
+            letter = get_column_letter(run.col)
+            for row in range(run.first_row, run.last_row + 1) if rows is None else rows:
+                node = (run.sheet, f"{letter}{row}")
+                if node not in self._circular:
+                    cells.append((self._levels.get(node, 0), row, run))
+        cells.sort(key=lambda cell: cell[0])
+        with np.errstate(all='ignore'):
+            for _, row, run in cells:
+                if run in self.unsupported:
+                    continue
+                try:
+                    value = self.function(run, scalar=True)(self, row, run.col)
+                except (UnsupportedFormula, _PerCell) as error:
+                    self.unsupported[run] = str(error) or "Range that moves with the row"
+                    continue
+                self.store(run.sheet, np.array([row]), run.col, _vector(value, 1))
+        self.cell_runs += len(runs)
+
+    def _holds_formula(self, sheet_name, row, col):
+        starts, ids = self._run_starts.get((sheet_name, col), ((), ()))
+        position = bisect_right(starts, row) - 1
+        return position >= 0 and self.runs[ids[position]].last_row >= row
+
+    def detach(self):
+        """
+        A copy of the engine that evaluates on its own: every run compiled and
+        ordered, without the CellIndex and DependencyGraph it was built from.
+        It pickles to little more than its column arrays, which is what
+        worker processes receive; verify() needs the index and is not available.
+        """
+        self._groups()
+        for run in self.runs:
+            self._references(run)
+        engine = copy.copy(self)
+        engine.graph = engine.index = engine.resolver = None
+        engine.columns = {key: array.copy() for key, array in self.columns.items()}
+        engine._numbers = {}
+        engine._text = {}
+        engine._functions = {}  # Generated functions do not pickle; workers compile them again
+        engine.lookups = LookupCache()
+        return engine
+
+    def _references(self, run):
+        """The 'ref' and 'area' nodes a run's formula reads, [] when it does not compile."""
+        nodes = self._run_references.get(run)
+        if nodes is None:
+            nodes = self._run_references[run] = []
+            try:
+                pending = [self.compiled(run)]
+            except UnsupportedFormula:
+                pending = []
+            while pending:
+                node = pending.pop()
+                if node[0] in ('ref', 'area'):
+                    nodes.append(node)
+                elif node[0] == 'areas':
+                    pending.extend(node[1])
+                elif node[0] == 'neg':
+                    pending.append(node[1])
+                elif node[0] == 'op':
+                    pending.extend(node[2:])
+                elif node[0] == 'call':
+                    pending.extend(arg for arg in node[2] if arg is not None)
+        return nodes
+
+    def _rows_reading(self, run, node, col, changed):
+        """
+        Rows of the run whose cell reads, through node, one of the changed
+        rows (a sorted array) of column col on the node's sheet.
+        """
+        first, last = run.first_row, run.last_row
+        if node[0] == 'ref':
+            _, _, row_abs, row, col_abs, ref_col = node
+            if (ref_col if col_abs else run.col + ref_col) != col:
+                return EMPTY_ROWS
+            if row_abs:
+                return _all_rows(run) if _contains(changed, row) else EMPTY_ROWS
+            hit = changed - row
+        else:
+            _, _, (row1_abs, row1), (col1_abs, col1), (row2_abs, row2), (col2_abs, col2) = node
+            first_col, last_col = sorted((col1 if col1_abs else run.col + col1, col2 if col2_abs else run.col + col2))
+            if not first_col <= col <= last_col:
+                return EMPTY_ROWS
+            if row1_abs and row2_abs:
+                low, high = sorted((row1, row2))
+                inside = np.searchsorted(changed, high, 'right') > np.searchsorted(changed, low)
+                return _all_rows(run) if inside else EMPTY_ROWS
+            if row1_abs:  # $C$2:C5 grows with the row: every row from the first that reaches a change
+                changed = changed[changed >= row1]
+                hit = np.arange(changed[0] - row2, last + 1) if changed.size else EMPTY_ROWS
+            elif row2_abs:  # C5:$C$100 shrinks with the row
+                changed = changed[changed <= row2]
+                hit = np.arange(first, changed[-1] - row1 + 1) if changed.size else EMPTY_ROWS
+            else:  # A window that moves with the row
+                height = row2 - row1 + 1
+                if changed.size * height <= last - first + 1:
+                    hit = np.unique(((changed - row2)[:, None] + np.arange(height)).ravel())
+                else:
+                    rows = _all_rows(run)
+                    hit = rows[np.searchsorted(changed, rows + row2, 'right') > np.searchsorted(changed, rows + row1)]
+        return hit[(hit >= first) & (hit <= last)]  # Sorted and unique, as changed is
+
+    def _dirty_rows(self, run, changed):
+        """Rows of the run reading any cell of changed ({(sheet, col): sorted rows})."""
+        found = [self._rows_reading(run, node, col, rows)
+                 for node in self._references(run)
+                 for (sheet_name, col), rows in changed.items() if sheet_name == node[1]]
+        found = [rows for rows in found if rows.size]
+        if len(found) > 1:
+            every = next((rows for rows in found if len(rows) == run.last_row - run.first_row + 1), None)
+            return every if every is not None else np.unique(np.concatenate(found))
+        return found[0] if found else EMPTY_ROWS
+
+    def _close_group(self, members, rows_by_run):
+        """
+        Widen the dirty rows of a circular group to every row a change can
+        reach inside it: a running total (C3 = C2 + B3) from the first dirty
+        row down, any other group all of its rows.
+        """
+        if len(members) == 1:
+            run = self.runs[members[0]]
+            rows = rows_by_run[members[0]]
+            offsets = set()  # Row offsets of the run's single-cell references to its own column
+            for node in self._references(run):
+                if node[1] != run.sheet:
+                    continue
+                if node[0] == 'ref' and not node[2] and (node[5] if node[4] else run.col + node[5]) == run.col:
+                    offsets.add(node[3])
+                elif self._rows_reading(run, node, run.col, _all_rows(run)).size:
+                    offsets.add(None)  # A fixed cell or a range of its own column
+            if offsets and None not in offsets and max(offsets) < 0:
+                return {members[0]: np.arange(rows[0], run.last_row + 1)}
+            if offsets and None not in offsets and min(offsets) > 0:
+                return {members[0]: np.arange(run.first_row, rows[-1] + 1)}
+        return {member: _all_rows(self.runs[member]) for member in members}
+
+    def set_value(self, ref, value):
+        """
+        Write one input cell, e.g. set_value("Inputs!B7", 0.05), and
+        re-evaluate only the formulas that depend on it. Returns the number
+        of formula cells re-evaluated.
+        """
+        return self.set_values({ref: value})
+
+    def set_values(self, changes):
+        """
+        Write several input cells ({"Sheet!A1": value}) and re-evaluate the
+        union of their dependents once. Dirty rows are marked run by run,
+        precedents first, from the references of each run's compiled formula,
+        and only those rows are evaluated, as one vector per run, so the cost
+        follows the affected cells rather than the workbook size.
+        """
+        changed = {}  # (sheet, col) -> rows written, then re-evaluated
+        for ref, value in changes.items():
+            sheet_part, cell = ref.rsplit('!', 1)
+            sheet_name = unquote_sheet(sheet_part)
+            if sheet_name not in self.nrows:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            row, col = split_coordinate(cell.replace('$', '').upper())
+            if self._holds_formula(sheet_name, row, col):
+                raise ValueError(f"{ref} holds a formula; only input cells can be set")
+            self._ensure_rows(sheet_name, row)
+            if isinstance(value, str) and value in ERRORS:
+                value = np.nan
+            self.store(sheet_name, np.array([row]), col,
+                       np.array([value], dtype=float if _is_number(value) else object))
+            changed.setdefault((sheet_name, col), []).append(row)
+        changed = {key: np.unique(rows) for key, rows in changed.items()}
+
+        # Runs come precedents first, so a run's dirty rows are known from the
+        # inputs and the runs already re-evaluated by the time it is reached
+        evaluated = 0
+        for members, per_cell in self._groups():
+            rows_by_run = {}
+            for member in members:
+                rows = self._dirty_rows(self.runs[member], changed)
+                if rows.size:
+                    rows_by_run[member] = rows
+            if not rows_by_run:
+                continue
+            if per_cell:
+                rows_by_run = self._close_group(members, rows_by_run)
+            self._evaluate_group(list(rows_by_run), per_cell, rows_by_run)
+            for member, rows in rows_by_run.items():
+                run = self.runs[member]
+                key = (run.sheet, run.col)
+                changed[key] = np.union1d(changed[key], rows) if key in changed else rows
+                evaluated += len(rows)
+        return evaluated
+
+    def _ensure_rows(self, sheet_name, row):
+        # Writing below the last used row grows every column of the sheet
+        if row <= self.nrows[sheet_name]:
+            return
+        grow = row - self.nrows[sheet_name]
+        for (column_sheet, col), array in self.columns.items():
+            if column_sheet == sheet_name:
+                self.columns[(column_sheet, col)] = np.concatenate((array, np.zeros(grow, dtype=array.dtype)))
+                self._numbers.pop((column_sheet, col), None)
+        self.nrows[sheet_name] = row
+
+    def verify(self, rel_tol=1e-9, abs_tol=1e-9):
+        """[(sheet, ref, cached value, computed value)] for every formula cell that disagrees with the workbook."""
+        mismatches = []
+        for sheet_name, formulas in self.index.formulas.items():
+            cached = self.index.values.get(sheet_name, {})
+            for row, col in formulas:
+                expected = cached.get((row, col))
+                if expected is None:
+                    continue  # Never calculated by Excel
+                computed = self.column(sheet_name, col)[row]
+                if isinstance(computed, np.generic):
+                    computed = computed.item()
+                if not _same_value(expected, computed, rel_tol, abs_tol):
+                    mismatches.append((sheet_name, f"{get_column_letter(col)}{row}", expected, computed))
+        return mismatches
+
+
+def _same_value(expected, computed, rel_tol, abs_tol):
+    if isinstance(expected, str) and expected in ERRORS:
+        return isinstance(computed, float) and math.isnan(computed)
+    if isinstance(expected, str) or isinstance(computed, str):
+        return str(expected) == str(computed)
+    try:
+        return math.isclose(float(expected), float(computed), rel_tol=rel_tol, abs_tol=abs_tol)
+    except (TypeError, ValueError):
+        return False
+
+
+if __name__ == "__main__":
+    from excel_formulas_parser import CellIndex, DependencyGraph
+    from formula_cache import DependencyCache
+
+    parser = argparse.ArgumentParser(description="Recalculate a workbook and check the results against its cached values.")
+    parser.add_argument('file', help='Path to the Excel file (.xlsx)')
+    parser.add_argument('--header-row', type=int, default=1, help='Row number with headers (default: 1)')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes used to parse sheets (default: 1)')
+    parser.add_argument('--cache', action='store_true', help='Reuse parsed sheets from an on-disk cache')
+    parser.add_argument('--show', type=int, default=10, help='Mismatches to list (default: 10)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cache = DependencyCache(args.file) if args.cache else None
+    index = CellIndex.from_workbook(args.file, args.header_row, args.jobs, cache)
+    graph = DependencyGraph(index)
+    if cache is not None:
+        cache.close()
+    loaded = time.perf_counter()
+    engine = FormulaEngine(graph).recalculate()
+    done = time.perf_counter()
+
+    cells = sum(len(formulas) for formulas in index.formulas.values())
+    print(f"Loaded {cells} formula cells in {loaded - start:.2f}s")
+    print(f"Recalculated {len(engine.runs)} runs in {done - loaded:.2f}s "
+          f"({engine.vector_runs} as vectors, {engine.cell_runs} cell by cell)")
+    for run, reason in engine.unsupported.items():
+        print(f"  kept cached values for {run.sheet}!{get_column_letter(run.col)}{run.first_row}:"
+              f"{get_column_letter(run.col)}{run.last_row}: {reason}")
+    mismatches = engine.verify()
+    print(f"{engine.lookups.builds} lookup indexes built, reused {engine.lookups.reuses} times")
+    print(f"{len(mismatches)} cells differ from the cached values")
+    for sheet_name, ref, expected, computed in mismatches[:args.show]:
+        print(f"  {sheet_name}!{ref}: cached {expected!r}, computed {computed!r}")
@@ -0,0 +1,318 @@
+import argparse
+import re
+from collections import OrderedDict
+from typing import NamedTuple
+
+from openpyxl.formula.tokenizer import Tokenizer
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from xlsx_reader import XlsxReader
+
+# Quoted sheet names, string literals and bracketed structured references ([@FY2024],
+# Table1[[#This Row],[Q1]], where ' escapes a bracket) are copied verbatim, never rewritten
+QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\[(?:[^\[\]']|'.|\[(?:[^\[\]']|'.)*\])*\]")
+
+# An A1 cell reference that is not part of a longer name, a function call or a sheet prefix
+CELL_RE = re.compile(r"(?<![A-Za-z0-9_.$])(\$?)([A-Za-z]{1,3})(\$?)([0-9]+)(?![A-Za-z0-9_(!])")
+
+# An R1C1 reference or range in a shape, with an optional sheet prefix; string literals are matched so they can be skipped
+R1C1_RE = re.compile(
+    r"\"(?:[^\"]|\"\")*\""
+    r"|(?<![A-Za-z0-9_.'])(?:(?P<sheet>'(?:[^']|'')*'|[A-Za-z0-9_.]+)!)?"
+    r"(?:R(?:\[-?\d+\]|\d+)?C(?P<c1>\[-?\d+\]|\d+)?(?::R(?:\[-?\d+\]|\d+)?C(?P<c2>\[-?\d+\]|\d+)?)?"
+    r"|\$?(?P<a1>[A-Za-z]{1,3}):\$?(?P<a2>[A-Za-z]{1,3}))"
+    r"(?![A-Za-z0-9_(])"
+)
+
+_letters = {}
+_columns = {}
+
+
+def _column_letter(col):
+    letter = _letters.get(col)
+    if letter is None:
+        letter = _letters[col] = get_column_letter(col)
+    return letter
+
+
+def _column_index(letters):
+    col = _columns.get(letters)
+    if col is None:
+        col = _columns[letters] = column_index_from_string(letters.upper())
+    return col
+
+
+def _sub_outside_quotes(pattern, repl, text):
+    parts = []
+    last = 0
+    for quoted in QUOTED_RE.finditer(text):
+        parts.append(pattern.sub(repl, text[last:quoted.start()]))
+        parts.append(quoted.group())
+        last = quoted.end()
+    parts.append(pattern.sub(repl, text[last:]))
+    return ''.join(parts)
+
+
+def to_r1c1(formula, row, col):
+    """
+    Rewrite the A1 references of a formula written in (row, col) to R1C1 form.
+
+    Every cell of a fill-down column turns into the same string, e.g. =B2*C2
+    in D2 and =B3*C3 in D3 both become =RC[-2]*RC[-1].
+    """
+    def repl(match):
+        col_abs, letters, row_abs, digits = match.groups()
+        ref_col = _column_index(letters)
+        ref_row = int(digits)
+        row_part = f"R{ref_row}" if row_abs else ('R' if ref_row == row else f"R[{ref_row - row}]")
+        col_part = f"C{ref_col}" if col_abs else ('C' if ref_col == col else f"C[{ref_col - col}]")
+        return row_part + col_part
+    return _sub_outside_quotes(CELL_RE, repl, formula)
+
+
+def _operand_template(operand, row, col):
+    """
+    Split an operand into literal text and relative reference slots.
+
+    Absolute parts ($A, $2) are folded into the literal text, so rendering
+    only has to fill in the relative column letters and row numbers.
+    """
+    literal = ['']
+    slots = []  # (is_column, offset) in output order
+
+    def emit(text):
+        literal[-1] += text
+
+    last = 0
+    for match in _iter_refs_outside_quotes(operand):
+        emit(operand[last:match.start()])
+        col_abs, letters, row_abs, digits = match.groups()
+        if col_abs:
+            emit(col_abs + letters)
+        else:
+            slots.append((True, _column_index(letters) - col))
+            literal.append('')
+        if row_abs:
+            emit(row_abs + digits)
+        else:
+            slots.append((False, int(digits) - row))
+            literal.append('')
+        last = match.end()
+    emit(operand[last:])
+    return tuple(literal), tuple(slots)
+
+
+def _iter_refs_outside_quotes(text):
+    last = 0
+    for quoted in QUOTED_RE.finditer(text):
+        yield from CELL_RE.finditer(text, last, quoted.start())
+        last = quoted.end()
+    yield from CELL_RE.finditer(text, last)
+
+
+def _render_operand(template, row, col):
+    literal, slots = template
+    if not slots:
+        return literal[0]
+    parts = [literal[0]]
+    for (is_column, offset), text in zip(slots, literal[1:]):
+        parts.append(_column_letter(col + offset) if is_column else str(row + offset))
+        parts.append(text)
+    return ''.join(parts)
+
+
+class FormulaShapeCache:
+    """
+    LRU cache of tokenized formulas keyed by their R1C1 shape.
+
+    The openpyxl Tokenizer runs once per distinct shape; every other cell
+    sharing that shape gets its range operands re-based to its own position.
+    hits and misses count lookups the same way functools.lru_cache does.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'maxsize': self.maxsize, 'currsize': len(self._templates)}
+
+    def clear(self):
+        self._templates.clear()
+        self.hits = self.misses = 0
+
+    def range_operands(self, formula, row, col):
+        """Return the OPERAND/RANGE token values of a formula written in (row, col)."""
+        shape = to_r1c1(formula, row, col)
+        templates = self._templates.get(shape)
+        if templates is not None:
+            self.hits += 1
+            self._templates.move_to_end(shape)
+        else:
+            self.misses += 1
+            templates = [
+                _operand_template(token.value, row, col)
+                for token in Tokenizer(formula).items
+                if token.type == 'OPERAND' and token.subtype == 'RANGE'
+            ]
+            self._templates[shape] = templates
+            if len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return [_render_operand(template, row, col) for template in templates]
+
+
+# Shared by every caller so tokenization is memoized across the whole workbook
+shape_cache = FormulaShapeCache()
+
+
+def _shape_column(part, col):
+    # 'C' is the formula's own column, 'C[n]' is relative, 'Cn' is absolute
+    if not part:
+        return col
+    if part[0] == '[':
+        return col + int(part[1:-1])
+    return int(part)
+
+
+def shape_columns(shape, col):
+    """
+    Return (sheet or None, first_column, last_column) for every reference of
+    an R1C1 shape, resolved for a formula written in column col. Ranges span
+    all the columns between their ends; whole-column A1 ranges (A:C) are
+    left in A1 form by to_r1c1 and are read as written.
+    """
+    spans = []
+    for match in R1C1_RE.finditer(shape):
+        if match.group(0).startswith('"'):
+            continue
+        sheet = match.group('sheet')
+        if sheet and sheet[0] == "'":
+            sheet = sheet[1:-1].replace("''", "'")
+        if match.group('a1'):
+            first, last = _column_index(match.group('a1')), _column_index(match.group('a2'))
+        else:
+            first = _shape_column(match.group('c1'), col)
+            last = _shape_column(match.group('c2'), col) if ':' in match.group(0) else first
+        spans.append((sheet, min(first, last), max(first, last)))
+    return spans
+
+
+class ShapeRun(NamedTuple):
+    """Consecutive rows of one column holding the same R1C1 formula."""
+    shape: str
+    first_row: int
+    last_row: int
+
+    @property
+    def rows(self):
+        return self.last_row - self.first_row + 1
+
+
+class ColumnShapes:
+    """
+    Formulas of one sheet stored as run-length encoded R1C1 shapes per column.
+
+    A fill-down column of a million rows is one ShapeRun; rows that were
+    edited by hand, or left without a formula, split it and show up in
+    breaks(). Cells must be added in row order within each column, which is
+    the order the sheet XML is written in.
+    """
+
+    def __init__(self, sheet_name):
+        self.sheet_name = sheet_name
+        self.runs = {}  # column_index -> [ShapeRun] in row order
+
+    @classmethod
+    def from_cells(cls, sheet_name, cells):
+        """Build from (row, column_index, formula, value) tuples, as extract_sheets and iter_cells yield them."""
+        shapes = cls(sheet_name)
+        for row, col, formula, _ in cells:
+            if formula is not None:
+                shapes.add(row, col, formula)
+        return shapes
+
+    def add(self, row, col, formula):
+        shape = to_r1c1(formula, row, col)
+        runs = self.runs.setdefault(col, [])
+        if runs and runs[-1].shape == shape and runs[-1].last_row == row - 1:
+            runs[-1] = runs[-1]._replace(last_row=row)
+        else:
+            runs.append(ShapeRun(shape, row, row))
+
+    def shape_count(self):
+        """Distinct shapes per column, summed over the sheet."""
+        return sum(len({run.shape for run in runs}) for runs in self.runs.values())
+
+    def dominant(self, col):
+        """The shape covering most rows of a column."""
+        rows = {}
+        for run in self.runs.get(col, ()):
+            rows[run.shape] = rows.get(run.shape, 0) + run.rows
+        return max(rows, key=rows.get) if rows else None
+
+    def breaks(self, col):
+        """
+        Rows that break the column's pattern, as ShapeRuns: runs with another
+        shape than the dominant one, and gaps without a formula (shape None).
+        """
+        dominant = self.dominant(col)
+        found = []
+        previous = None
+        for run in self.runs.get(col, ()):
+            if previous is not None and run.first_row > previous.last_row + 1:
+                found.append(ShapeRun(None, previous.last_row + 1, run.first_row - 1))
+            if run.shape != dominant:
+                found.append(run)
+            previous = run
+        return found
+
+    def column_dependencies(self, col):
+        """(sheet, column_index) pairs every formula of the column reads, over all of its shapes."""
+        dependencies = set()
+        for shape in {run.shape for run in self.runs.get(col, ())}:
+            for sheet, first, last in shape_columns(shape, col):
+                sheet = sheet or self.sheet_name
+                dependencies.update((sheet, dep_col) for dep_col in range(first, last + 1))
+        return dependencies
+
+    def dependency_graph(self):
+        """Exact column-level graph of the sheet: column_index -> {(sheet, column_index)}."""
+        return {col: self.column_dependencies(col) for col in self.runs}
+
+
+def workbook_shapes(file_path, sheet_names=None):
+    """Stream each sheet once and return {sheet_name: ColumnShapes}; no cell list is kept."""
+    shapes = {}
+    with XlsxReader(file_path) as reader:
+        for sheet_name in sheet_names or reader.sheetnames:
+            shapes[sheet_name] = ColumnShapes.from_cells(sheet_name, reader.iter_cells(sheet_name))
+    return shapes
+
+
+def print_report(shapes, show_dependencies=True):
+    for sheet_name, sheet in shapes.items():
+        total_runs = sum(len(runs) for runs in sheet.runs.values())
+        print(f"{sheet_name}: {len(sheet.runs)} formula columns, {total_runs} runs, {sheet.shape_count()} shapes")
+        for col in sorted(sheet.runs):
+            runs = sheet.runs[col]
+            letter = _column_letter(col)
+            print(f"  {letter}: rows {runs[0].first_row}-{runs[-1].last_row}, {len(runs)} run(s), "
+                  f"shape {sheet.dominant(col)}")
+            if show_dependencies:
+                dependencies = sorted(sheet.column_dependencies(col))
+                print("    reads: " + (', '.join(f"{dep_sheet}!{_column_letter(dep_col)}"
+                                                for dep_sheet, dep_col in dependencies) or '(nothing)'))
+            for run in sheet.breaks(col):
+                rows = f"{letter}{run.first_row}" if run.rows == 1 else f"{letter}{run.first_row}:{letter}{run.last_row}"
+                print(f"    break {rows}: {run.shape if run.shape is not None else '(no formula)'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize each formula column as run-length encoded R1C1 shapes.")
+    parser.add_argument('file', help='Path to the Excel file (.xlsx)')
+    parser.add_argument('--sheet', action='append', help='Sheet to analyze (repeatable, default: all sheets)')
+    parser.add_argument('--no-dependencies', action='store_true', help='Do not list the columns each column reads')
+    args = parser.parse_args()
+    print_report(workbook_shapes(args.file, args.sheet), not args.no_dependencies)
@@ -0,0 +1,37 @@
+import gzip
+import io
+import os
+from contextlib import contextmanager
+
+# Large enough that fragment-by-fragment writes rarely reach the file system
+BUFFER_SIZE = 1 << 20
+
+
+@contextmanager
+def open_output(path, buffer_size=BUFFER_SIZE):
+    """
+    Open a text file for streaming HTML into it, as a context manager.
+
+    Paths ending in .gz are written gzip-compressed; the compressor only
+    sees full buffers, not every small fragment. The page is written to a
+    temporary file next to path and renamed over it only when the block
+    finishes without an error, so a failure midway never leaves a
+    truncated page behind.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    raw = open(temp_path, 'wb', buffering=0)
+    try:
+        if path.endswith('.gz'):
+            # The header records the final file name, not the temporary one
+            compressed = gzip.GzipFile(os.path.basename(path), 'wb', fileobj=raw)
+            stream = io.TextIOWrapper(io.BufferedWriter(compressed, buffer_size), encoding='utf-8')
+        else:
+            stream = io.TextIOWrapper(io.BufferedWriter(raw, buffer_size), encoding='utf-8')
+        with stream:
+            yield stream
+        raw.close()
+        os.replace(temp_path, path)
+    except BaseException:
+        raw.close()
+        os.remove(temp_path)
+        raise
@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+
+
+def trie_pattern(words):
+    """
+    Regex source matching any of words, built as a trie so that at each
+    position the text is walked once, character by character, instead of
+    trying every word in turn. Longer words win over their prefixes.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # A word ends here
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    branches = [re.escape(char) + _node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    if '' in node:  # The word ending here is the fallback when no longer one matches
+        return f"(?:{body})?" if len(branches) == 1 and len(body) > 1 else f"{body}?"
+    return body
+
+
+class IdentifierReplacer:
+    """
+    Replaces every key of a mapping in one pass over the text, with a single
+    compiled trie pattern: the cost follows the text length, not the number
+    of keys. Replacements are simultaneous, so text a replacement put in is
+    never replaced again.
+
+    ignore_case: keys match in any case (the first key wins among keys that
+        differ only in case).
+    whole_words: keys only match between word boundaries (\\b), as the
+        per-key re.sub calls did.
+    """
+
+    def __init__(self, mapping, ignore_case=False, whole_words=True):
+        self.ignore_case = ignore_case
+        self.lookup = {}
+        for key, value in mapping.items():
+            if key:
+                self.lookup.setdefault(key.lower() if ignore_case else key, value)
+        pattern = trie_pattern(self.lookup)
+        if whole_words:
+            pattern = rf"\b(?:{pattern})\b"
+        self.pattern = re.compile(pattern, re.IGNORECASE if ignore_case else 0) if self.lookup else None
+
+    def replace(self, text, counts=None):
+        """
+        text with every key replaced. counts, a Counter, gets one hit per
+        replacement added under the key that matched (lowercased when
+        ignore_case).
+        """
+        if self.pattern is None:
+            return text
+        lookup = self.lookup
+        if counts is not None:
+            def replace(match):
+                key = match.group().lower() if self.ignore_case else match.group()
+                counts[key] += 1
+                return lookup[key]
+
+            return self.pattern.sub(replace, text)
+        if self.ignore_case:
+            return self.pattern.sub(lambda match: lookup.get(match.group().lower(), match.group()), text)
+        return self.pattern.sub(lambda match: lookup[match.group()], text)
+
+
+def replacer_for(mapping, ignore_case=False, whole_words=True):
+    """The IdentifierReplacer of a mapping, compiled once per version of its contents."""
+    return _cached_replacer(tuple(mapping.items()), ignore_case, whole_words)
+
+
+@lru_cache(maxsize=32)
+def _cached_replacer(items, ignore_case, whole_words):
+    return IdentifierReplacer(dict(items), ignore_case, whole_words)
+
+
+def replace_identifiers(text, mapping, ignore_case=False, whole_words=True):
+    """text with every key of mapping replaced by its value, in a single pass."""
+    return replacer_for(mapping, ignore_case, whole_words).replace(text)
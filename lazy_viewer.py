@@ -0,0 +1,125 @@
+import html
+import json
+
+# Page shell; the node table and sections are streamed in between HEAD and TAIL
+HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>{title}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; color: #333; }}
+        ul {{ list-style-type: none; padding-left: 20px; margin: 0; }}
+        details, p {{ margin: 4px 0; }}
+        summary {{ cursor: pointer; }}
+        .detail {{ font-family: Consolas, Monaco, monospace; color: #555; margin-left: 14px; }}
+        .circular {{ color: #e74c3c; }}
+        .count {{ color: #95a5a6; font-size: 0.9em; }}
+    </style>
+</head>
+<body>
+    <h1>{title}</h1>
+    <div id="tree"></div>
+    <script type="application/json" id="nodes">
+"""
+
+TAIL = """</script>
+    <script>
+    // Each node is [text, detail, [child ids]]; children are only added to the page when expanded
+    const nodes = JSON.parse(document.getElementById('nodes').textContent);
+    const sections = JSON.parse(document.getElementById('sections').textContent);
+
+    function element(tag, className, text) {
+        const el = document.createElement(tag);
+        if (className) el.className = className;
+        if (text !== undefined) el.textContent = text;
+        return el;
+    }
+
+    function render(id, ancestors) {
+        const [text, detail, children] = nodes[id];
+        if (ancestors.has(id)) return element('p', 'circular', 'Circular reference: ' + text);
+        if (!children.length) {
+            const p = element('p', '', text);
+            if (detail) p.appendChild(element('span', 'detail', detail));
+            return p;
+        }
+        const details = element('details');
+        const summary = element('summary', '', text + ' ');
+        summary.appendChild(element('span', 'count', '(' + children.length + ')'));
+        details.appendChild(summary);
+        if (detail) details.appendChild(element('div', 'detail', detail));
+        details.addEventListener('toggle', () => {
+            if (!details.open || details.dataset.loaded) return;
+            details.dataset.loaded = '1';
+            const path = new Set(ancestors).add(id);
+            const list = element('ul');
+            for (const child of children) {
+                const item = element('li');
+                item.appendChild(render(child, path));
+                list.appendChild(item);
+            }
+            details.appendChild(list);
+        });
+        return details;
+    }
+
+    const tree = document.getElementById('tree');
+    for (const [heading, roots] of sections) {
+        if (heading) tree.appendChild(element('h2', '', heading));
+        for (const root of roots) tree.appendChild(render(root, new Set()));
+    }
+    </script>
+</body>
+</html>
+"""
+
+
+def _script_json(value):
+    # Keep '</script>' inside strings from closing the data block
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
+class NodeTable:
+    """
+    Node store for the lazy viewer: one row per distinct node, children by id.
+
+    Callers decide what counts as the same node by the key they pass to
+    add(), which is how shared subtrees end up stored once.
+    """
+
+    def __init__(self):
+        self.ids = {}  # key -> node id
+        self.rows = []  # [text, detail, [child ids]]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, key, text, detail=''):
+        """Return (node id, created); children are filled in with set_children."""
+        node_id = self.ids.get(key)
+        if node_id is not None:
+            return node_id, False
+        node_id = self.ids[key] = len(self.rows)
+        self.rows.append([text, detail, []])
+        return node_id, True
+
+    def set_children(self, node_id, child_ids):
+        self.rows[node_id][2] = list(child_ids)
+
+
+def write_viewer(out, title, table, sections):
+    """
+    Write a self-contained HTML page: the node table as JSON, one node per
+    line, and a script that renders children only when a node is expanded.
+    sections is a list of (heading or None, [root node ids]).
+    """
+    out.write(HEAD.format(title=html.escape(title)))
+    out.write('[\n')
+    last = len(table.rows) - 1
+    for node_id, row in enumerate(table.rows):
+        out.write(_script_json(row))
+        out.write(',\n' if node_id < last else '\n')
+    out.write(']\n    </script>\n    <script type="application/json" id="sections">')
+    out.write(_script_json(sections))
+    out.write(TAIL)
@@ -0,0 +1,149 @@
+from bisect import bisect_right
+
+import numpy as np
+
+
+def compare_key(value):
+    """Sort and match key of a cell value: numbers before text before logical values, text without case."""
+    if isinstance(value, bool):
+        return 2, value
+    if isinstance(value, str):
+        return 1, value.lower()
+    if value is None:
+        return 0, 0.0
+    return 0, float(value)
+
+
+def _is_numeric(array):
+    return array.dtype.kind in 'biuf'
+
+
+class LookupIndex:
+    """
+    Lookup structures over one key range (the first column of a VLOOKUP
+    table, or the range MATCH searches), each built on first use.
+
+    exact: a hash of key -> first position, so every lookup is O(1).
+    approximate: the keys as a searchable array (floats) or list (compare
+    keys), searched the way Excel does, assuming the sort order it requires.
+    """
+
+    def __init__(self, keys):
+        keys = np.asarray(keys)
+        # A text header elsewhere in the column makes it an object array; the slice may still be all numbers
+        if keys.dtype.kind == 'O' and all(isinstance(key, (int, float)) and not isinstance(key, bool) for key in keys):
+            keys = keys.astype(float)
+        self.keys = keys
+        self._hash = None
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _hash_index(self):
+        if self._hash is None:
+            if _is_numeric(self.keys):
+                keys = self.keys.astype(float).tolist()
+            else:
+                keys = [compare_key(key) for key in self.keys.tolist()]
+            # Filled backwards so duplicate keys keep their first position
+            self._hash = dict(zip(reversed(keys), range(len(keys) - 1, -1, -1)))
+        return self._hash
+
+    def _sorted_index(self):
+        if self._sorted is None:
+            if _is_numeric(self.keys):
+                self._sorted = self.keys.astype(float)
+            else:
+                self._sorted = [compare_key(key) for key in self.keys.tolist()]
+        return self._sorted
+
+    def positions(self, values, match_type=0):
+        """
+        0-based position of every lookup value, -1 when there is none.
+        match_type 0 is an exact match (first occurrence), 1 the largest key
+        <= value in ascending keys, -1 the smallest key >= value in descending keys.
+        """
+        values = np.atleast_1d(np.asarray(values))
+        if values.dtype.kind == 'O' and all(isinstance(value, (int, float)) and not isinstance(value, bool)
+                                            for value in values):
+            values = values.astype(float)
+        if match_type == 0:
+            index = self._hash_index()
+            if _is_numeric(self.keys):
+                wanted = values.astype(float).tolist() if _is_numeric(values) else \
+                    [float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+                     for value in values.tolist()]
+            else:
+                wanted = [compare_key(value) for value in values.tolist()]
+            return np.fromiter((index.get(key, -1) for key in wanted), dtype=np.int64, count=len(wanted))
+
+        keys = self._sorted_index()
+        if isinstance(keys, np.ndarray) and _is_numeric(values):
+            values = values.astype(float)
+            if match_type > 0:
+                return np.searchsorted(keys, values, 'right') - 1
+            return np.searchsorted(-keys, -values, 'right') - 1
+        if isinstance(keys, np.ndarray):  # Text looked up in numeric keys
+            keys = [compare_key(key) for key in keys.tolist()]
+        wanted = [compare_key(value) for value in values.tolist()]
+        search = (lambda key: bisect_right(keys, key) - 1) if match_type > 0 else (lambda key: _last_at_least(keys, key))
+        return np.fromiter((search(key) for key in wanted), dtype=np.int64, count=len(wanted))
+
+
+def _last_at_least(keys, key):
+    # Binary search over keys sorted in descending order
+    low, high = 0, len(keys)
+    while low < high:
+        middle = (low + high) // 2
+        if keys[middle] >= key:
+            low = middle + 1
+        else:
+            high = middle
+    return low - 1
+
+
+class LookupCache:
+    """
+    LookupIndexes shared by every formula that searches the same key range.
+
+    Indexes are keyed by (sheet, column, first_row, last_row), so a
+    100k-row VLOOKUP column builds its table's hash once instead of
+    scanning the table per row. invalidate() drops the indexes whose rows
+    were overwritten; they are rebuilt on their next lookup.
+    """
+
+    def __init__(self):
+        self._indexes = {}  # (sheet, col, first_row, last_row) -> LookupIndex
+        self._by_column = {}  # (sheet, col) -> set of index keys over that column
+        self.builds = 0
+        self.reuses = 0
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def get(self, sheet_name, col, first_row, last_row, load):
+        """The index of sheet_name!col rows first_row..last_row; load() returns the keys when it must be built."""
+        key = (sheet_name, col, first_row, last_row)
+        index = self._indexes.get(key)
+        if index is not None:
+            self.reuses += 1
+            return index
+        index = self._indexes[key] = LookupIndex(load())
+        self._by_column.setdefault((sheet_name, col), set()).add(key)
+        self.builds += 1
+        return index
+
+    def invalidate(self, sheet_name, col, first_row=1, last_row=None):
+        """Forget the indexes over sheet_name!col that include any row of first_row..last_row."""
+        keys = self._by_column.get((sheet_name, col))
+        if not keys:
+            return
+        for key in list(keys):
+            if key[3] >= first_row and (last_row is None or key[2] <= last_row):
+                del self._indexes[key]
+                keys.discard(key)
+
+    def clear(self):
+        self._indexes.clear()
+        self._by_column.clear()
@@ -0,0 +1,224 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+DEFAULT_PATH = 'sql_mappings.sqlite'
+
+SCHEMA_VERSION = '1'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS identifiers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS mappings (
+    id INTEGER PRIMARY KEY,
+    identifier_id INTEGER NOT NULL REFERENCES identifiers (id),
+    name TEXT NOT NULL,
+    UNIQUE (identifier_id, name)
+);
+CREATE INDEX IF NOT EXISTS mappings_by_name ON mappings (name);
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    sql TEXT NOT NULL,
+    saved_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_mappings (
+    query_id INTEGER NOT NULL REFERENCES queries (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    mapping_id INTEGER NOT NULL REFERENCES mappings (id),
+    PRIMARY KEY (query_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS query_mappings_by_mapping ON query_mappings (mapping_id, query_id);
+"""
+
+# Mapping pairs ranked by the newest saved query that uses them, oldest first, so a dict built in
+# this order keeps each name's latest match. A pair keeps its row id when an older query's pair is
+# saved again, so the row id alone does not say which is newer; pairs no query uses rank first
+RANKED_MAPPINGS = (
+    "SELECT {} FROM mappings m JOIN identifiers i ON i.id = m.identifier_id "
+    "LEFT JOIN query_mappings qm ON qm.mapping_id = m.id LEFT JOIN queries q ON q.id = qm.query_id "
+    "{} GROUP BY m.id ORDER BY COALESCE(MAX(q.id), 0), m.id")
+
+LOOKUP_BATCH = 500  # Names per IN (...) lookup, below SQLite's limit on bound parameters
+
+
+class MappingStore:
+    """
+    Saved queries and their identifier mappings in one SQLite file.
+
+    Each identifier and each (identifier, mapped name) pair is stored once,
+    however many queries use it; a query keeps only its text and the list
+    of pairs it was saved with. Forward lookups go through the identifiers
+    name index, reverse lookups through the index on mapped names.
+
+    The database runs in WAL mode, so readers are never blocked by a
+    writer, and every save is one transaction. Open one MappingStore per
+    process (connections must not cross a fork); batch workers can open it
+    with readonly=True.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, readonly=False):
+        self.path = path
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30, isolation_level=None)
+        else:
+            self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+            self._prepare_schema()
+        self.conn.execute("PRAGMA foreign_keys = ON")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _prepare_schema(self):
+        with self._transaction():
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    self.conn.execute(statement)
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None:
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('version', ?)", (SCHEMA_VERSION,))
+            elif row[0] != SCHEMA_VERSION:
+                raise RuntimeError(f"{self.path} has mapping store version {row[0]}, expected {SCHEMA_VERSION}")
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so two writers queue instead of failing mid-transaction
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def save_query(self, name, sql, identifier_map):
+        """Save sql with its identifier map under name, replacing a query saved under the same name."""
+        with self._transaction():
+            self._save_query(name, sql, identifier_map)
+
+    def _save_query(self, name, sql, identifier_map):
+        conn = self.conn
+        conn.execute("DELETE FROM queries WHERE name = ?", (name,))
+        query_id = conn.execute("INSERT INTO queries (name, sql, saved_at) VALUES (?, ?, ?)",
+                                (name, sql, datetime.datetime.now().isoformat(timespec='seconds'))).lastrowid
+        pairs = list(identifier_map.items())
+        conn.executemany("INSERT OR IGNORE INTO identifiers (name) VALUES (?)", ((identifier,) for identifier, _ in pairs))
+        conn.executemany(
+            "INSERT OR IGNORE INTO mappings (identifier_id, name) SELECT id, ? FROM identifiers WHERE name = ?",
+            ((mapped, identifier) for identifier, mapped in pairs))
+        conn.executemany(
+            "INSERT INTO query_mappings (query_id, position, mapping_id) "
+            "SELECT ?, ?, m.id FROM mappings m JOIN identifiers i ON i.id = m.identifier_id "
+            "WHERE i.name = ? AND m.name = ?",
+            ((query_id, position, identifier, mapped) for position, (identifier, mapped) in enumerate(pairs)))
+
+    def load_query(self, name):
+        """(sql, identifier map) of a saved query; KeyError if there is none by that name."""
+        row = self.conn.execute("SELECT id, sql FROM queries WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        query_id, sql = row
+        pairs = self.conn.execute(
+            "SELECT i.name, m.name FROM query_mappings q JOIN mappings m ON m.id = q.mapping_id "
+            "JOIN identifiers i ON i.id = m.identifier_id WHERE q.query_id = ? ORDER BY q.position", (query_id,))
+        return sql, dict(pairs)
+
+    def query_names(self):
+        """Names of the saved queries, oldest first."""
+        return [name for (name,) in self.conn.execute("SELECT name FROM queries ORDER BY id")]
+
+    def lookup(self, names, reverse=False):
+        """
+        {name: match} for the names that have one: the latest mapped name of
+        each identifier, or with reverse=True the identifier of each mapped
+        name. Looked up through the indexes, LOOKUP_BATCH names at a time.
+        """
+        if reverse:
+            sql = RANKED_MAPPINGS.format('m.name, i.name', 'WHERE m.name IN ({})')
+        else:
+            sql = RANKED_MAPPINGS.format('i.name, m.name', 'WHERE i.name IN ({})')
+        names = list(dict.fromkeys(names))
+        found = {}
+        for start in range(0, len(names), LOOKUP_BATCH):
+            batch = names[start:start + LOOKUP_BATCH]
+            found.update(self.conn.execute(sql.format(', '.join('?' * len(batch))), batch))
+        return found
+
+    def mapping(self, query=None):
+        """The identifier map of one saved query, or of all of them merged (the latest mapping of each identifier)."""
+        if query is not None:
+            return self.load_query(query)[1]
+        return dict(self.conn.execute(RANKED_MAPPINGS.format('i.name, m.name', '')))
+
+    def import_json(self, paths):
+        """
+        Import saved JSON files in one transaction: v10's NAME_mappings.json
+        (with the query in NAME.txt next to it), v7/v8 query files
+        ({'sql': ..., 'identifier_map': {...}}) and plain {identifier: name}
+        mapping files, saved as queries without text. Other JSON files are
+        skipped. Returns the names of the imported queries.
+        """
+        imported = []
+        with self._transaction():
+            for path in paths:
+                found = _read_saved_json(path)
+                if found is not None:
+                    self._save_query(*found)
+                    imported.append(found[0])
+        return imported
+
+
+def _read_saved_json(path):
+    # (name, sql, identifier map) of a saved file, None for JSON that is not one
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    stem = os.path.splitext(path)[0]
+    if isinstance(data.get('identifier_map'), dict) and isinstance(data.get('sql', ''), str):
+        sql, identifier_map = data.get('sql', ''), data['identifier_map']
+    elif all(isinstance(value, str) for value in data.values()):
+        identifier_map, sql = data, ''
+        if stem.endswith('_mappings'):
+            stem = stem[:-len('_mappings')]
+            if os.path.exists(stem + '.txt'):
+                with open(stem + '.txt', 'r', encoding='utf-8') as file:
+                    sql = file.read()
+    else:
+        return None
+    return os.path.basename(stem), sql, {str(key): str(value) for key, value in identifier_map.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import saved query and mapping JSON files into a mapping store.")
+    parser.add_argument('paths', nargs='*', default=['.'], help='JSON files or directories to import (default: .)')
+    parser.add_argument('--store', default=DEFAULT_PATH, help=f'Mapping store file (default: {DEFAULT_PATH})')
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        files.extend(sorted(glob.glob(os.path.join(glob.escape(path), '*.json'))) if os.path.isdir(path) else [path])
+    with MappingStore(args.store) as store:
+        imported = store.import_json(files)
+        print(f"Imported {len(imported)} of {len(files)} JSON files into {args.store} "
+              f"({len(store.query_names())} saved queries)")
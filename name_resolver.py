@@ -0,0 +1,273 @@
+import posixpath
+import re
+
+from openpyxl.formula.tokenizer import Tokenizer
+from openpyxl.utils import get_column_letter
+
+from range_index import MAX_COL, parse_range, unquote_sheet
+from xlsx_reader import MAIN_NS, XlsxReader
+
+# A1, A1:B2, A:C and 1:3 (optionally $-anchored) are ordinary references
+PLAIN_REF_RE = re.compile(
+    r"^(?:\$?[A-Za-z]{1,3}\$?\d+(?::\$?[A-Za-z]{1,3}\$?\d+)?"
+    r"|\$?[A-Za-z]{1,3}:\$?[A-Za-z]{1,3}"
+    r"|\$?\d+:\$?\d+)$"
+)
+WHOLE_COLUMN_RE = re.compile(r"^\$?[A-Za-z]{1,3}:\$?[A-Za-z]{1,3}$")
+# Table1[...] or [...] inside a table, the table name being optional
+STRUCTURED_REF_RE = re.compile(r"^(?P<table>[A-Za-z_\\][\w.\\]*)?\[(?P<spec>.*)\]$", re.DOTALL)
+
+ROW_ITEMS = {'#ALL', '#DATA', '#HEADERS', '#TOTALS', '#THIS ROW'}
+
+
+def _unescape(text):
+    # Inside brackets a ' escapes the next character ('[, '], '#, '')
+    return re.sub(r"'(.)", r'\1', text)
+
+
+def structured_items(spec):
+    """
+    Split what is inside Table1[...] into (row items, column names):
+    '[#Data],[Qty]:[Price]' -> (['#DATA'], ['Qty', ':', 'Price']),
+    '@Amount' -> (['#THIS ROW'], ['Amount']).
+    """
+    rows = []
+    if spec.startswith('@'):
+        rows.append('#THIS ROW')
+        spec = spec[1:].strip()
+    if not spec.startswith('['):
+        parts = [_unescape(spec)] if spec else []
+    else:
+        parts = []
+        position = 0
+        while position < len(spec):
+            char = spec[position]
+            if char == '[':
+                end = position + 1
+                while end < len(spec) and spec[end] != ']':
+                    end += 2 if spec[end] == "'" else 1
+                parts.append(_unescape(spec[position + 1:end]))
+                position = end + 1
+            else:
+                if char == ':':
+                    parts.append(':')
+                position += 1
+    columns = []
+    for part in parts:
+        if part.upper() in ROW_ITEMS:
+            rows.append(part.upper())
+        else:
+            columns.append(part)
+    return rows, columns
+
+
+class Table:
+    """One table (ListObject): its sheet, bounds and column names."""
+
+    def __init__(self, name, sheet_name, ref, columns, header_rows=1, totals_rows=0):
+        self.name = name
+        self.sheet_name = sheet_name
+        self.ref = ref
+        self.first_row, self.first_col, self.last_row, self.last_col = parse_range(ref)
+        self.columns = {column.upper(): position for position, column in enumerate(columns)}
+        self.header_rows = header_rows
+        self.totals_rows = totals_rows
+
+    def contains(self, row, col):
+        return self.first_row <= row <= self.last_row and self.first_col <= col <= self.last_col
+
+    def _row_span(self, item, row):
+        data_first = self.first_row + self.header_rows
+        data_last = self.last_row - self.totals_rows
+        if item == '#ALL':
+            return self.first_row, self.last_row
+        if item == '#HEADERS':
+            return (self.first_row, data_first - 1) if self.header_rows else None
+        if item == '#TOTALS':
+            return (data_last + 1, self.last_row) if self.totals_rows else None
+        if item == '#THIS ROW' and row is not None:
+            return row, row
+        return data_first, data_last
+
+    def range_for(self, rows, columns, row=None):
+        """A1-style range for the row items and column names of a structured reference, or None."""
+        spans = [span for span in (self._row_span(item, row) for item in rows or ['#DATA']) if span]
+        if not spans:
+            return None
+        first_row, last_row = min(span[0] for span in spans), max(span[1] for span in spans)
+        if columns:
+            names = [column for column in columns if column != ':']
+            positions = [self.columns.get(name.upper()) for name in names]
+            if None in positions:
+                return None
+            first_col, last_col = self.first_col + min(positions), self.first_col + max(positions)
+        else:
+            first_col, last_col = self.first_col, self.last_col
+        if first_row > last_row:
+            return None  # A table with no data rows
+        start = f"{get_column_letter(first_col)}{first_row}"
+        end = f"{get_column_letter(last_col)}{last_row}"
+        return start if start == end else f"{start}:{end}"
+
+
+class NameResolver:
+    """
+    Defined names and tables of one workbook, read once from the archive.
+
+    resolve() turns a range operand that is not an ordinary reference (a
+    defined name, a table structured reference or a 3D reference) into the
+    concrete (sheet, range) targets it stands for. Results are cached per
+    operand, so a name used by thousands of formulas is resolved once.
+    """
+
+    def __init__(self, sheetnames=(), names=None, tables=()):
+        self.sheetnames = list(sheetnames)
+        self.names = names or {}  # (scope sheet name or None, NAME) -> formula text
+        self.tables = {table.name.upper(): table for table in tables}
+        self._tables_by_sheet = {}
+        for table in self.tables.values():
+            self._tables_by_sheet.setdefault(table.sheet_name, []).append(table)
+        self._resolved = {}  # Cache key -> [(sheet, range)] or None
+        self._resolving = set()  # Names being expanded, to stop names that refer to themselves
+
+    @classmethod
+    def from_reader(cls, reader):
+        sheetnames = reader.sheetnames
+        names = {}
+        workbook = reader._parse_tree(reader.workbook_path)
+        all_sheets = [sheet.get('name') for sheet in workbook.iter(MAIN_NS + 'sheet')]
+        for defined in workbook.iter(MAIN_NS + 'definedName'):
+            local_id = defined.get('localSheetId')
+            scope = all_sheets[int(local_id)] if local_id is not None and int(local_id) < len(all_sheets) else None
+            names[(scope, defined.get('name').upper())] = defined.text or ''
+
+        tables = []
+        for sheet_name, path in reader.sheet_paths.items():
+            base_dir, name = posixpath.split(path)
+            rels = reader._read_relationships(posixpath.join(base_dir, '_rels', name + '.rels'), base_dir)
+            for rel_type, target in rels.values():
+                if not rel_type.endswith('/table') or target not in reader.archive.namelist():
+                    continue
+                table = reader._parse_tree(target)
+                columns = [column.get('name') for column in table.iter(MAIN_NS + 'tableColumn')]
+                tables.append(Table(table.get('displayName') or table.get('name'), sheet_name, table.get('ref'),
+                                    columns, int(table.get('headerRowCount', 1)),
+                                    int(table.get('totalsRowCount', 0))))
+        return cls(sheetnames, names, tables)
+
+    @classmethod
+    def from_workbook(cls, file_path):
+        with XlsxReader(file_path) as reader:
+            return cls.from_reader(reader)
+
+    def __bool__(self):
+        return bool(self.names or self.tables)
+
+    @staticmethod
+    def position_dependent(formula):
+        """True when the formula's targets depend on its row ([@Col], [#This Row])."""
+        return '[' in formula and ('@' in formula or '#this row' in formula.lower())
+
+    def resolve(self, operand, current_sheet, row=None, col=None):
+        """
+        [(sheet, range)] for a name, structured or 3D reference; None for an
+        ordinary reference (or an unknown name), which callers keep as it is.
+        """
+        key = (operand, current_sheet)
+        if '[' in operand and (operand[0] == '[' or self.position_dependent(operand)):
+            key += (row, col)  # Implicit table or this-row reference
+        if key in self._resolved:
+            return self._resolved[key]
+        targets = self._resolve(operand, current_sheet, row, col)
+        self._resolved[key] = targets
+        return targets
+
+    def _resolve(self, operand, current_sheet, row, col):
+        sheet_name = None
+        target = operand
+        if '!' in operand:
+            sheet_part, target = operand.rsplit('!', 1)
+            sheet_name = unquote_sheet(sheet_part)
+
+        structured = STRUCTURED_REF_RE.match(target) if '[' in target else None
+        if structured and sheet_name is None:
+            return self._resolve_structured(structured.group('table'), structured.group('spec'),
+                                            current_sheet, row, col)
+
+        if PLAIN_REF_RE.match(target):
+            if sheet_name is not None and ':' in sheet_name:  # Sheet1:Sheet3!A1
+                first, last = sheet_name.split(':', 1)
+                if first in self.sheetnames and last in self.sheetnames:
+                    start, end = sorted((self.sheetnames.index(first), self.sheetnames.index(last)))
+                    return [(sheet, target) for sheet in self.sheetnames[start:end + 1]]
+            return None
+
+        # A sheet-level name shadows a workbook-level one of the same name
+        scope = sheet_name or current_sheet
+        name_key = next((key for key in ((scope, target.upper()), (None, target.upper())) if key in self.names), None)
+        if name_key is None:
+            return None
+        return self._resolve_name(name_key, scope)
+
+    def _resolve_name(self, name_key, scope):
+        if name_key in self._resolving:
+            return []
+        self._resolving.add(name_key)
+        try:
+            targets = []
+            formula = '=' + self.names[name_key].lstrip('=')
+            for token in Tokenizer(formula).items:
+                if token.type == 'OPERAND' and token.subtype == 'RANGE':
+                    targets.extend(self.targets(token.value, name_key[0] or scope))
+            return targets
+        finally:
+            self._resolving.discard(name_key)
+
+    def _resolve_structured(self, table_name, spec, current_sheet, row, col):
+        if table_name:
+            table = self.tables.get(table_name.upper())
+        else:  # [@Col] written inside the table itself
+            table = next((table for table in self._tables_by_sheet.get(current_sheet, [])
+                          if row is not None and col is not None and table.contains(row, col)), None)
+        if table is None:
+            return None
+        ref = table.range_for(*structured_items(spec.strip()), row=row)
+        return [(table.sheet_name, ref)] if ref else []
+
+    def targets(self, operand, current_sheet, row=None, col=None):
+        """resolve(), with ordinary references split into (sheet, range) as they are."""
+        resolved = self.resolve(operand, current_sheet, row, col)
+        if resolved is not None:
+            return resolved
+        if '!' in operand:
+            sheet_part, ref = operand.rsplit('!', 1)
+            return [(unquote_sheet(sheet_part), ref)]
+        return [(current_sheet, operand)]
+
+    def expanded_references(self, formula, current_sheet, row=None, col=None):
+        """
+        Targets of the names, structured, 3D and whole-column references of a
+        formula: the ones a cell-address regex does not see.
+        """
+        if not self and ':' not in formula:
+            return []
+        targets = []
+        for token in Tokenizer(formula).items:
+            if token.type != 'OPERAND' or token.subtype != 'RANGE':
+                continue
+            resolved = self.resolve(token.value, current_sheet, row, col)
+            if resolved is not None:
+                targets.extend(resolved)
+            elif WHOLE_COLUMN_RE.match(token.value.rsplit('!', 1)[-1]):
+                targets.extend(self.targets(token.value, current_sheet))
+        return targets
+
+    @staticmethod
+    def target_columns(targets):
+        """(sheet, column letter) for every column spanned by (sheet, range) targets."""
+        columns = []
+        for sheet_name, ref in targets:
+            _, first_col, _, last_col = parse_range(ref)
+            if first_col > 1 or last_col < MAX_COL:  # Whole rows span every column; skip them
+                columns.extend((sheet_name, get_column_letter(c)) for c in range(first_col, last_col + 1))
+        return columns
@@ -1,36 +1,34 @@
 import re
-import openpyxl
 import sys
 import argparse
 from openpyxl.utils import get_column_letter
+from xlsx_reader import extract_sheets
+from tree_limits import RenderLimits
+from name_resolver import NameResolver
+from range_index import parse_range
 
-def load_workbook_data(filename, header_row=1, formula_row=2):
+def load_workbook_data(filename, header_row=1, formula_row=2, jobs=1):
     """
     Load the workbook and, for each sheet, cache only the header row and the formula row.
+    With jobs > 1 the sheets are parsed in parallel worker processes.
     Returns a dictionary keyed by sheet name with:
        - 'headers': mapping of column letter -> header value
        - 'formulas': mapping of column letter -> formula string (if cell value is a formula)
     """
-    wb = openpyxl.load_workbook(filename, data_only=False, read_only=True)
     workbook_data = {}
 
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
+    sheets = extract_sheets(filename, [header_row, formula_row], jobs)
+    for sheet, cells in sheets.items():
         headers = {}
         formulas = {}
 
-        # Read header row using enumerate to get the column index.
-        header_cells = list(ws.iter_rows(min_row=header_row, max_row=header_row))[0]
-        for idx, cell in enumerate(header_cells, start=1):
-            col_letter = get_column_letter(idx)
-            headers[col_letter] = cell.value
-
-        # Read formula row using enumerate as well.
-        formula_cells = list(ws.iter_rows(min_row=formula_row, max_row=formula_row))[0]
-        for idx, cell in enumerate(formula_cells, start=1):
-            col_letter = get_column_letter(idx)
-            if cell.value and isinstance(cell.value, str) and cell.value.startswith("="):
-                formulas[col_letter] = cell.value
+        for row, idx, formula, value in cells:
+            # Header cells keep whatever is shown in them (a formula's text if there is one).
+            if row == header_row:
+                headers[get_column_letter(idx)] = formula or value
+            # Only formula cells of the formula row are kept.
+            if row == formula_row and formula:
+                formulas[get_column_letter(idx)] = formula
 
         workbook_data[sheet] = {
             'headers': headers,
@@ -38,7 +36,7 @@ def load_workbook_data(filename, header_row=1, formula_row=2):
         }
     return workbook_data
 
-def parse_formula_references(formula):
+def parse_formula_references(formula, current_sheet=None, resolver=None):
     """
     Parse a formula string and return a list of cell references.
     Each reference is a tuple (sheet, col, row) where 'sheet' is None if no sheet is referenced.
@@ -47,6 +45,9 @@ def parse_formula_references(formula):
        - A2
        - Sheet2!B2
        - 'My Sheet'!C2
+
+    With a NameResolver, defined names, Table1[Column], Sheet1:Sheet3!A2 and
+    whole-column references are added too, one entry per column they span.
     """
     # Pattern breakdown:
     #   (?:(?P<sheet>'[^']+'|[A-Za-z0-9_]+)!)?  => optional sheet name (possibly quoted) followed by !
@@ -61,6 +62,11 @@ def parse_formula_references(formula):
         col = match.group('col')
         row = int(match.group('row'))
         refs.append((sheet, col, row))
+    if resolver is not None:
+        for target_sheet, target in resolver.expanded_references(formula, current_sheet):
+            row = parse_range(target)[0]
+            for sheet, col in resolver.target_columns([(target_sheet, target)]):
+                refs.append((sheet, col, row))
     return refs
 
 def substitute_formula(formula, current_sheet, workbook_data):
@@ -81,28 +87,28 @@ def substitute_formula(formula, current_sheet, workbook_data):
         return str(header) if header is not None else match.group(0)
     return re.sub(pattern, repl, formula)
 
-def build_dependency_tree(sheet, col, workbook_data, formula_row, header_row, visited=None):
+def build_dependency_tree(sheet, col, workbook_data, formula_row, header_row, visited=None, memo=None,
+                          resolver=None):
     """
     Recursively build a dependency tree starting from the cell in (sheet, col).
     We assume that each formula is written on the same row (formula_row) so that
     if cell B in row formula_row has a formula, then any reference like B? (any row)
     is taken as referring to that same definition.
     
-    A simple visited set is used to avoid infinite recursion in case of circular dependencies.
+    Each (sheet, col) node is built once and shared by all its parents
+    through memo, so building takes time linear in the distinct precedents.
+    A reference back to a node still being built closes a cycle: the
+    referencing node marks that edge in its "cycles" list (parallel to
+    "children") rather than the shared node itself.
+    Pass a NameResolver to follow defined names and table references as well.
     """
     if visited is None:
-        visited = set()
+        visited = {}  # (sheet, col) -> node of each column on the current path
+    if memo is None:
+        memo = {}
     key = (sheet, col)
-    if key in visited:
-        return {
-            "sheet": sheet,
-            "col": col,
-            "header": workbook_data[sheet]['headers'].get(col, col),
-            "formula": None,
-            "children": [],
-            "cycle": True
-        }
-    visited.add(key)
+    if key in memo:
+        return memo[key]
     
     formula = workbook_data[sheet]['formulas'].get(col)
     node = {
@@ -110,42 +116,75 @@ def build_dependency_tree(sheet, col, workbook_data, formula_row, header_row, vi
         "col": col,
         "header": workbook_data[sheet]['headers'].get(col, col),
         "formula": formula,
-        "children": []
+        "children": [],
+        "cycles": []
     }
+    visited[key] = node
     
     if formula:
         # Parse the formula for any cell references.
-        refs = parse_formula_references(formula)
+        refs = parse_formula_references(formula, sheet, resolver)
         for ref_sheet, ref_col, ref_row in refs:
             # In our simplified model we ignore the actual row number because we assume
             # that every row uses the same formula logic.
             target_sheet = ref_sheet if ref_sheet else sheet
             if target_sheet in workbook_data:
-                child_node = build_dependency_tree(target_sheet, ref_col, workbook_data, formula_row, header_row, visited)
-                node["children"].append(child_node)
-    visited.remove(key)
+                target = (target_sheet, ref_col)
+                if target in visited:
+                    node["children"].append(visited[target])
+                    node["cycles"].append(True)
+                else:
+                    child_node = build_dependency_tree(target_sheet, ref_col, workbook_data, formula_row, header_row,
+                                                       visited, memo, resolver)
+                    node["children"].append(child_node)
+                    node["cycles"].append(False)
+    del visited[key]
+    memo[key] = node
     return node
 
-def print_tree(node, workbook_data, indent="", is_last=True):
+def print_tree(node, workbook_data, indent="", is_last=True, limits=None, depth=0, cycle=False):
     """
     Recursively print the dependency tree using a tree-like (Explorer-like) format.
+    Pass RenderLimits to print repeated subtrees as back-references and to
+    cap the depth or the number of printed nodes. cycle marks a node reached
+    through an edge that closes a cycle; it is printed but not expanded.
     """
+    limits = limits or RenderLimits()
     branch = "└── " if is_last else "├── "
+    if not limits.take():
+        note = limits.budget_note()
+        if note:
+            print(indent + branch + note)
+        return
+    if cycle:
+        print(indent + branch + f"{node['header']} ({node['sheet']}!{node['col']}) [cycle]")
+        return
+    children = node.get("children", [])
+    key = (node["sheet"], node["col"])
+    if children and limits.anchor(key):
+        print(indent + branch + f"{node['header']} {limits.see(node['sheet'] + '!' + node['col'])}")
+        return
     if node.get("formula"):
         # Substitute cell references with header names.
         friendly = substitute_formula(node["formula"], node["sheet"], workbook_data)
         text = f"{node['header']} ({node['sheet']}!{node['col']}) = {friendly}"
     else:
         text = f"{node['header']} ({node['sheet']}!{node['col']})"
-        if node.get("cycle"):
-            text += " [cycle]"
+    if children and limits.stops_at(depth):
+        print(indent + branch + text + " " + limits.depth_note(len(children)))
+        return
     print(indent + branch + text)
+    if children and limits.dedup:
+        limits.expand(key)
     new_indent = indent + ("    " if is_last else "│   ")
-    child_count = len(node.get("children", []))
-    for idx, child in enumerate(node.get("children", [])):
-        print_tree(child, workbook_data, new_indent, idx == (child_count - 1))
+    child_count = len(children)
+    cycles = node.get("cycles", [])
+    for idx, child in enumerate(children):
+        print_tree(child, workbook_data, new_indent, idx == (child_count - 1), limits, depth + 1,
+                   idx < len(cycles) and cycles[idx])
 
-def main(filename, result_header="Result", formula_row=2, header_row=1, result_sheet=None):
+def main(filename, result_header="Result", formula_row=2, header_row=1, result_sheet=None, jobs=1,
+         dedup=False, max_depth=None, max_nodes=None):
     """
     Main function that loads the Excel file, finds the starting column by header name,
     builds the dependency tree, and prints it.
@@ -156,8 +195,12 @@ def main(filename, result_header="Result", formula_row=2, header_row=1, result_s
       - formula_row: the row number where formulas are defined (default is 2).
       - header_row: the row number where headers are defined (default is 1).
       - result_sheet: the sheet name to start with (default: first sheet).
+      - jobs: number of worker processes used to parse sheets (default is 1).
+      - dedup: expand each column once and point repeat visits back to it (default is False).
+      - max_depth: print nodes below this depth without expanding them (default: no limit).
+      - max_nodes: stop printing after this many nodes (default: no limit).
     """
-    workbook_data = load_workbook_data(filename, header_row, formula_row)
+    workbook_data = load_workbook_data(filename, header_row, formula_row, jobs)
     if result_sheet is None:
         # Use the first sheet if no specific sheet is provided.
         result_sheet = list(workbook_data.keys())[0]
@@ -172,9 +215,10 @@ def main(filename, result_header="Result", formula_row=2, header_row=1, result_s
         print(f"Result column with header '{result_header}' not found in sheet '{result_sheet}'")
         return
 
-    tree = build_dependency_tree(result_sheet, target_col, workbook_data, formula_row, header_row)
+    tree = build_dependency_tree(result_sheet, target_col, workbook_data, formula_row, header_row,
+                                 resolver=NameResolver.from_workbook(filename))
     print("Dependency Tree:")
-    print_tree(tree, workbook_data)
+    print_tree(tree, workbook_data, limits=RenderLimits(dedup, max_depth, max_nodes))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Build and print an Excel formula dependency tree.")
@@ -183,6 +227,11 @@ if __name__ == "__main__":
     parser.add_argument("--formula-row", type=int, default=2, help="Row number where formulas are defined (default: 2).")
     parser.add_argument("--header-row", type=int, default=1, help="Row number where headers are defined (default: 1).")
     parser.add_argument("--result-sheet", help="Name of the sheet to start with (default: first sheet).")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes used to parse sheets in parallel (default: 1).")
+    parser.add_argument("--dedup", action="store_true", help="Expand each column once and point repeat visits back to it.")
+    parser.add_argument("--max-depth", type=int, help="Print nodes below this depth without expanding them.")
+    parser.add_argument("--max-nodes", type=int, help="Stop printing after this many nodes.")
 
     args = parser.parse_args()
-    main(args.filename, args.result_header, args.formula_row, args.header_row, args.result_sheet)
+    main(args.filename, args.result_header, args.formula_row, args.header_row, args.result_sheet, args.jobs,
+         args.dedup, args.max_depth, args.max_nodes)
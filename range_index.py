@@ -0,0 +1,170 @@
+from bisect import bisect_left, bisect_right
+
+from openpyxl.utils import column_index_from_string
+
+# Worksheet limits, used to close whole-column (A:C) and whole-row (1:3) ranges
+MAX_ROW = 1048576
+MAX_COL = 16384
+
+
+def unquote_sheet(sheet_name):
+    """'My Sheet' as written in a formula -> My Sheet"""
+    if len(sheet_name) > 1 and sheet_name[0] == sheet_name[-1] == "'":
+        return sheet_name[1:-1].replace("''", "'")
+    return sheet_name
+
+
+def parse_range(ref):
+    """
+    Return (min_row, min_col, max_row, max_col) for 'A1:B10', '$A$1:$B$10',
+    'A:C', '1:3' or a single cell, with 1-based indexes.
+    """
+    bounds = []
+    for part in ref.replace('$', '').split(':'):
+        letters = part.rstrip('0123456789')
+        digits = part[len(letters):]
+        bounds.append((int(digits) if digits else None,
+                       column_index_from_string(letters.upper()) if letters else None))
+    (row1, col1), (row2, col2) = bounds[0], bounds[-1]
+    if row1 is None or row2 is None:  # Whole columns
+        row1, row2 = 1, MAX_ROW
+    if col1 is None or col2 is None:  # Whole rows
+        col1, col2 = 1, MAX_COL
+    return min(row1, row2), min(col1, col2), max(row1, row2), max(col1, col2)
+
+
+class IntervalTree:
+    """
+    Static centered interval tree over closed [start, end] intervals.
+
+    Each node keeps the intervals that straddle its center twice, sorted by
+    start and by end, so a stabbing query visits one node per level and only
+    reads the intervals it returns.
+    """
+
+    def __init__(self, intervals):
+        # intervals are (start, end, payload) tuples
+        self.nodes = []  # (center, by_start, by_end, left, right)
+        if intervals:
+            self._build(list(intervals))
+
+    def _build(self, intervals):
+        # Iterative, children are patched in once their slot is known
+        pending = [(intervals, None, None)]
+        while pending:
+            group, parent, side = pending.pop()
+            points = sorted({start for start, _, _ in group} | {end for _, end, _ in group})
+            center = points[len(points) // 2]
+            left = [interval for interval in group if interval[1] < center]
+            right = [interval for interval in group if interval[0] > center]
+            middle = [interval for interval in group if interval[0] <= center <= interval[1]]
+            node_id = len(self.nodes)
+            self.nodes.append([center,
+                               sorted(middle, key=lambda interval: interval[0]),
+                               sorted(middle, key=lambda interval: interval[1], reverse=True),
+                               None, None])
+            if parent is not None:
+                self.nodes[parent][side] = node_id
+            if left:
+                pending.append((left, node_id, 3))
+            if right:
+                pending.append((right, node_id, 4))
+
+    def stab(self, point):
+        """Yield (start, end, payload) for every interval containing point."""
+        node_id = 0 if self.nodes else None
+        while node_id is not None:
+            center, by_start, by_end, left, right = self.nodes[node_id]
+            if point < center:
+                for interval in by_start:
+                    if interval[0] > point:
+                        break
+                    yield interval
+                node_id = left
+            elif point > center:
+                for interval in by_end:
+                    if interval[1] < point:
+                        break
+                    yield interval
+                node_id = right
+            else:
+                yield from by_start
+                node_id = None
+
+
+class RangeIndex:
+    """
+    Per-sheet index of range references and formula cells.
+
+    ranges(sheet, row, col) answers "which ranges contain this cell" with an
+    interval tree over the ranges' rows, filtered on columns.
+    cells_in(sheet, ref) answers "which formula cells lie inside this range"
+    with a bisect per populated column, so a reference such as A1:Z100000
+    never enumerates the cells it covers.
+    """
+
+    def __init__(self):
+        self._ranges = {}  # Sheet name -> [(min_row, max_row, (min_col, max_col, ref, dependent))]
+        self._trees = {}  # Sheet name -> (IntervalTree, ranges sorted by min_row, their min_rows), rebuilt after add_range
+        self._rows = {}  # Sheet name -> {column_index: sorted rows holding a formula}
+        self._columns = {}  # Sheet name -> sorted populated column indexes
+
+    def add_range(self, sheet_name, ref, dependent):
+        """Record that dependent (any hashable, e.g. the formula cell) reads sheet_name!ref."""
+        min_row, min_col, max_row, max_col = parse_range(ref)
+        self._ranges.setdefault(sheet_name, []).append((min_row, max_row, (min_col, max_col, ref, dependent)))
+        self._trees.pop(sheet_name, None)
+
+    def add_cell(self, sheet_name, row, col):
+        """Record a formula cell; cells_in() only reports cells added here."""
+        rows = self._rows.setdefault(sheet_name, {})
+        if col not in rows:
+            rows[col] = []
+            columns = self._columns.setdefault(sheet_name, [])
+            columns.insert(bisect_left(columns, col), col)
+        column_rows = rows[col]
+        if not column_rows or column_rows[-1] < row:
+            column_rows.append(row)  # Cells usually arrive in row order
+        else:
+            position = bisect_left(column_rows, row)
+            if position == len(column_rows) or column_rows[position] != row:
+                column_rows.insert(position, row)
+
+    def _tree(self, sheet_name):
+        found = self._trees.get(sheet_name)
+        if found is None:
+            ranges = self._ranges.get(sheet_name, [])
+            by_start = sorted(ranges, key=lambda interval: interval[0])
+            found = self._trees[sheet_name] = (IntervalTree(ranges), by_start, [interval[0] for interval in by_start])
+        return found
+
+    def has_ranges(self, sheet_name):
+        return sheet_name in self._ranges
+
+    def ranges(self, sheet_name, row, col):
+        """Yield (ref, dependent) for every indexed range on sheet_name containing the cell."""
+        tree = self._tree(sheet_name)[0]
+        for _, _, (min_col, max_col, ref, dependent) in tree.stab(row):
+            if min_col <= col <= max_col:
+                yield ref, dependent
+
+    def overlapping(self, sheet_name, ref):
+        """Yield (ref, dependent) for every indexed range on sheet_name sharing a cell with ref."""
+        min_row, min_col, max_row, max_col = parse_range(ref)
+        tree, by_start, starts = self._tree(sheet_name)
+        # Ranges already open at the first row, then the ones starting further down
+        candidates = list(tree.stab(min_row))
+        candidates += by_start[bisect_right(starts, min_row):bisect_right(starts, max_row)]
+        for _, _, (range_min_col, range_max_col, range_ref, dependent) in candidates:
+            if range_min_col <= max_col and range_max_col >= min_col:
+                yield range_ref, dependent
+
+    def cells_in(self, sheet_name, ref):
+        """Yield (row, col) for every indexed formula cell inside the range, column by column."""
+        min_row, min_col, max_row, max_col = parse_range(ref)
+        rows = self._rows.get(sheet_name, {})
+        columns = self._columns.get(sheet_name, [])
+        for col in columns[bisect_left(columns, min_col):bisect_right(columns, max_col)]:
+            column_rows = rows[col]
+            for row in column_rows[bisect_left(column_rows, min_row):bisect_right(column_rows, max_row)]:
+                yield row, col
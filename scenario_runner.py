@@ -0,0 +1,204 @@
+import argparse
+import csv
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl.utils import get_column_letter
+
+from excel_formulas_parser import CellIndex, DependencyGraph
+from formula_cache import DependencyCache
+from formula_eval import FormulaEngine
+from range_index import parse_range, unquote_sheet
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional; without it results can only be written as CSV
+    pyarrow = None
+
+
+def split_ref(ref):
+    """('Sheet', 'A1') for 'Sheet!A1' or "'My Sheet'!$A$1"."""
+    sheet_part, cell = ref.rsplit('!', 1)
+    return unquote_sheet(sheet_part), cell.replace('$', '').upper()
+
+
+def expand_outputs(refs):
+    """Output cells as 'Sheet!A1' strings, ranges such as Model!J2:J10 expanded cell by cell."""
+    cells = []
+    for ref in refs:
+        sheet_name, target = split_ref(ref)
+        first_row, first_col, last_row, last_col = parse_range(target)
+        cells.extend(f"{sheet_name}!{get_column_letter(col)}{row}"
+                     for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1))
+    return cells
+
+
+def read_scenarios(path):
+    """
+    [(scenario id, {"Sheet!A1": value})] from a CSV whose header names the
+    input cells. An optional 'scenario' column gives the ids (row numbers
+    otherwise); an empty field keeps the workbook's own value.
+    """
+    scenarios = []
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        id_column = next((position for position, name in enumerate(header) if name.lower() == 'scenario'), None)
+        for number, fields in enumerate(reader, 1):
+            overrides = {}
+            for position, (ref, field) in enumerate(zip(header, fields)):
+                if position != id_column and field != '':
+                    overrides[ref] = _parse_field(field)
+            scenarios.append((fields[id_column] if id_column is not None else number, overrides))
+    return scenarios
+
+
+def _parse_field(field):
+    try:
+        return float(field)
+    except ValueError:
+        if field.upper() in ('TRUE', 'FALSE'):
+            return field.upper() == 'TRUE'
+        return field
+
+
+class ScenarioWorker:
+    """
+    Runs scenarios one after another on a detached FormulaEngine.
+
+    Each scenario's overrides go through set_values(), so only the cells
+    that depend on them are re-evaluated. Inputs a previous scenario
+    overrode and this one does not are put back to their workbook values
+    in the same call, which leaves every scenario starting from the
+    workbook itself.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._original = {}  # Input ref -> workbook value, read before its first override
+        self._overridden = set()
+
+    def run(self, scenarios, outputs):
+        """[(scenario id, [output values])] for [(scenario id, {ref: value})]."""
+        engine = self.engine
+        cells = [split_ref(ref) for ref in outputs]
+        results = []
+        for scenario_id, overrides in scenarios:
+            changes = dict(overrides)
+            for ref in overrides:
+                if ref not in self._original:
+                    self._original[ref] = engine.value(*split_ref(ref))
+            for ref in self._overridden - overrides.keys():
+                changes[ref] = self._original[ref]
+            self._overridden = set(overrides)
+            engine.set_values(changes)
+            results.append((scenario_id, [_result_value(engine.value(sheet_name, cell))
+                                          for sheet_name, cell in cells]))
+        return results
+
+
+def _result_value(value):
+    # Errors are NaN in the engine, which does not keep their kind; they are written as empty cells
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+_worker = None  # ScenarioWorker of this worker process
+
+
+def _start_worker(engine):
+    global _worker
+    _worker = ScenarioWorker(engine)
+
+
+def _run_batch(task):
+    scenarios, outputs = task
+    return _worker.run(scenarios, outputs)
+
+
+def run_scenarios(engine, scenarios, outputs, jobs=1, batch_size=None):
+    """
+    Yield (scenario id, [output values]) for every scenario, in order.
+
+    The engine is detached and sent to each worker process once, when the
+    pool starts; workers then receive only batches of overrides and return
+    only the output cells, so no worker parses the workbook.
+    """
+    detached = engine.detach()
+    if batch_size is None:
+        batch_size = max(1, min(500, math.ceil(len(scenarios) / (jobs * 4))))
+    tasks = [(scenarios[start:start + batch_size], outputs) for start in range(0, len(scenarios), batch_size)]
+    if jobs <= 1:
+        worker = ScenarioWorker(detached)
+        for batch, batch_outputs in tasks:
+            yield from worker.run(batch, batch_outputs)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_start_worker, initargs=(detached,)) as executor:
+        for results in executor.map(_run_batch, tasks):
+            yield from results
+
+
+def write_results(path, outputs, results):
+    """Write the results to path as Parquet (.parquet, needs pyarrow) or CSV. Returns the scenario count."""
+    if path.lower().endswith('.parquet'):
+        if pyarrow is None:
+            raise RuntimeError("Writing Parquet needs pyarrow; install it or write a .csv file")
+        ids, columns = [], [[] for _ in outputs]
+        for scenario_id, values in results:
+            ids.append(scenario_id)
+            for column, value in zip(columns, values):
+                column.append(value)
+        table = pyarrow.table({'scenario': ids, **{ref: _arrow_column(column) for ref, column in zip(outputs, columns)}})
+        pyarrow.parquet.write_table(table, path)
+        return len(ids)
+
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['scenario'] + outputs)
+        for scenario_id, values in results:
+            writer.writerow([scenario_id] + ['' if value is None else value for value in values])
+            count += 1
+    return count
+
+
+def _arrow_column(values):
+    # A column mixing numbers and text (an output that is text in some scenarios) is stored as text
+    kinds = {type(value) for value in values if value is not None}
+    if len(kinds) > 1 and str in kinds:
+        values = [None if value is None else str(value) for value in values]
+    return pyarrow.array(values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a workbook once per scenario of input overrides.")
+    parser.add_argument('file', help='Path to the Excel file (.xlsx)')
+    parser.add_argument('scenarios', help='CSV of scenarios: one column per input cell (e.g. Inputs!B2), '
+                                          'optionally a "scenario" id column')
+    parser.add_argument('--outputs', nargs='+', required=True,
+                        help='Cells or ranges to report, e.g. Model!J2 Summary!B3:B5')
+    parser.add_argument('--out', default='scenario_results.csv', help='Result table, .csv or .parquet')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes (default: 1)')
+    parser.add_argument('--batch', type=int, default=None, help='Scenarios sent to a worker at a time')
+    parser.add_argument('--cache', action='store_true', help='Reuse parsed sheets from an on-disk cache')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cache = DependencyCache(args.file) if args.cache else None
+    index = CellIndex.from_workbook(args.file, 1, args.jobs, cache)
+    graph = DependencyGraph(index)
+    if cache is not None:
+        cache.close()
+    engine = FormulaEngine(graph).recalculate()
+    loaded = time.perf_counter()
+    print(f"Loaded and recalculated the workbook in {loaded - start:.2f}s")
+
+    scenarios = read_scenarios(args.scenarios)
+    outputs = expand_outputs(args.outputs)
+    count = write_results(args.out, outputs, run_scenarios(engine, scenarios, outputs, args.jobs, args.batch))
+    elapsed = time.perf_counter() - loaded
+    print(f"Ran {count} scenarios x {len(outputs)} outputs in {elapsed:.2f}s "
+          f"({count / elapsed if elapsed else 0:.0f} scenarios/s) -> {args.out}")
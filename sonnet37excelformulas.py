@@ -1,8 +1,13 @@
-import openpyxl
 from openpyxl.utils import get_column_letter, column_index_from_string
+import io
 import re
 import os
 from collections import defaultdict, deque
+from xlsx_reader import WorkbookSession, XlsxReader
+from formula_cache import DependencyCache
+from range_index import RangeIndex
+from html_output import open_output
+from lazy_viewer import NodeTable, write_viewer
 
 def extract_sheet_range(range_str):
     """Extract sheet name and range from a range string like 'Sheet1!A1:C10'."""
@@ -114,186 +119,273 @@ def parse_formula_dependencies(formula):
     
     return dependencies, vlookup_deps
 
-def load_excel_partial(file_path, sheet_name, header_row, formula_row):
+def cached_formula_dependencies(cache, sheet_name, formula):
     """
-    Load only the specified rows from an Excel sheet.
-    Returns a dictionary with column data.
+    parse_formula_dependencies served from a DependencyCache.
+    Column dependencies are stored as 1-tuples and VLOOKUP/INDEX ones as 4-tuples.
     """
-    wb = openpyxl.load_workbook(file_path, data_only=False, read_only=True)
-    sheet = wb[sheet_name]
-    
-    column_data = {}
-    
-    # Read header row
-    for cell in sheet[header_row]:
-        col_letter = cell.column_letter
-        column_data[col_letter] = {'header': cell.value, 'formula': None, 'value': None}
-    
-    # Read formula row
-    for cell in sheet[formula_row]:
-        col_letter = cell.column_letter
-        if col_letter in column_data:
-            if cell.data_type == 'f':
-                column_data[col_letter]['formula'] = cell.formula
-            else:
-                column_data[col_letter]['formula'] = None
-                column_data[col_letter]['value'] = cell.value
+    def encode(text):
+        dependencies, vlookup_deps = parse_formula_dependencies(text)
+        return [(col,) for col in sorted(dependencies)] + list(vlookup_deps)
     
-    wb.close()
-    return column_data
+    refs = cache.references(sheet_name, formula, encode, kind='columns')
+    dependencies = {ref[0] for ref in refs if len(ref) == 1}
+    vlookup_deps = [ref for ref in refs if len(ref) == 4]
+    return dependencies, vlookup_deps
 
-def load_sheet_for_vlookup(file_path, sheet_name, header_row, formula_row):
+def _read_header_and_formula_rows(reader, sheet_name, header_row, formula_row, columns=None):
     """
-    Load an entire sheet for VLOOKUP reference.
-    Returns a dictionary with column data.
+    Build the column data dictionary from the header and formula rows only.
+    Covers the columns with a header cell unless columns lists the indexes to include.
     """
-    wb = openpyxl.load_workbook(file_path, data_only=False, read_only=True)
-    
-    # Handle case where sheet might not exist
-    if sheet_name not in wb.sheetnames:
-        print(f"Warning: Sheet '{sheet_name}' not found in workbook.")
-        wb.close()
-        return {}
-        
-    sheet = wb[sheet_name]
+    rows = reader.read_rows(sheet_name, [header_row, formula_row])
+    if columns is None:
+        columns = sorted(rows[header_row])
     
     column_data = {}
-    
-    # Read all columns in the sheet
-    for col_idx in range(1, sheet.max_column + 1):
+    for col_idx in columns:
         col_letter = get_column_letter(col_idx)
-        
-        # Get header from header row
-        header_cell = sheet.cell(row=header_row, column=col_idx)
-        header_value = header_cell.value
-        
-        # Get formula from formula row
-        formula_cell = sheet.cell(row=formula_row, column=col_idx)
-        
-        if formula_cell.data_type == 'f':
-            formula_value = formula_cell.formula
-            value = None
-        else:
-            formula_value = None
-            value = formula_cell.value
-        
-        column_data[col_letter] = {'header': header_value, 'formula': formula_value, 'value': value}
-    
-    wb.close()
+        header = rows[header_row].get(col_idx, (None, None))
+        formula, value = rows[formula_row].get(col_idx, (None, None))
+        column_data[col_letter] = {
+            'header': header[0] or header[1],
+            'formula': formula,
+            'value': None if formula else value
+        }
     return column_data
 
-def analyze_excel_dependencies(file_path, sheet_name, start_column, header_row, formula_row):
+def load_excel_partial(file_path, sheet_name, header_row, formula_row, session=None):
+    """
+    Load only the specified rows from an Excel sheet.
+    Pass an open WorkbookSession to reuse its archive and row cache.
+    Returns a dictionary with column data.
+    """
+    if session is not None:
+        return _read_header_and_formula_rows(session, sheet_name, header_row, formula_row)
+    with XlsxReader(file_path) as reader:
+        return _read_header_and_formula_rows(reader, sheet_name, header_row, formula_row)
+
+def load_sheet_for_vlookup(file_path, sheet_name, header_row, formula_row, session=None):
+    """
+    Load an entire sheet for VLOOKUP reference.
+    Pass an open WorkbookSession to reuse its archive and row cache.
+    Returns a dictionary with column data.
+    """
+    if session is not None:
+        # Handle case where sheet might not exist
+        if sheet_name not in session.sheetnames:
+            print(f"Warning: Sheet '{sheet_name}' not found in workbook.")
+            return {}
+        # Every column up to the sheet's last one, with or without a header
+        columns = range(1, session.max_column(sheet_name) + 1)
+        return _read_header_and_formula_rows(session, sheet_name, header_row, formula_row, columns)
+    
+    with WorkbookSession(file_path) as session:
+        return load_sheet_for_vlookup(file_path, sheet_name, header_row, formula_row, session)
+
+def analyze_excel_dependencies(file_path, sheet_name, start_column, header_row, formula_row, cache=None):
     """
     Analyze Excel dependencies starting from a specific column.
+    With a DependencyCache, cached rows and parsed formulas are reused.
     
     Returns:
         A tuple of (dependencies, column_info)
     """
-    # Dictionary to store dependencies for each sheet
-    sheet_dependencies = {}
+    # One open archive for the whole traversal; each sheet is parsed at most once
+    try:
+        session = WorkbookSession(file_path, cache)
+    except Exception as e:
+        print(f"Error loading Excel file: {str(e)}")
+        return {}, {}
     
-    # Dictionary to store column information for each sheet
-    sheet_columns = {}
+    with session:
+        # Dictionary to store dependencies for each sheet
+        sheet_dependencies = {}
     
-    # Set to keep track of processed columns for each sheet
-    processed = defaultdict(set)
+        # Dictionary to store column information for each sheet
+        sheet_columns = {}
     
-    # Set to track sheets that have been loaded
-    loaded_sheets = set()
+        # Set to keep track of processed columns for each sheet
+        processed = defaultdict(set)
     
-    # Queue for BFS traversal
-    queue = deque([(sheet_name, start_column)])
+        # Set to track sheets that have been loaded
+        loaded_sheets = set()
     
-    # Load initial sheet data
-    try:
-        sheet_columns[sheet_name] = load_excel_partial(file_path, sheet_name, header_row, formula_row)
-        loaded_sheets.add(sheet_name)
-    except KeyError:
-        print(f"Error: Sheet '{sheet_name}' not found in the Excel file.")
-        return {}, {}
-    except Exception as e:
-        print(f"Error loading Excel file: {str(e)}")
-        return {}, {}
+        # Queue for BFS traversal
+        queue = deque([(sheet_name, start_column)])
     
-    # Initialize dependencies for the starting sheet
-    sheet_dependencies[sheet_name] = defaultdict(set)
+        # Loaded columns by position, so a range only enqueues the columns that exist
+        column_index = RangeIndex()
     
-    while queue:
-        current_sheet, current_column = queue.popleft()
-        
-        # Skip if already processed
-        if current_column in processed[current_sheet]:
-            continue
-        
-        # Mark as processed
-        processed[current_sheet].add(current_column)
-        
-        # Initialize dependencies for this sheet if not already done
-        if current_sheet not in sheet_dependencies:
-            sheet_dependencies[current_sheet] = defaultdict(set)
+        def index_columns(name):
+            for col in sheet_columns[name]:
+                column_index.add_cell(name, formula_row, column_index_from_string(col))
+    
+        # Load initial sheet data
+        try:
+            sheet_columns[sheet_name] = load_excel_partial(file_path, sheet_name, header_row, formula_row, session)
+            loaded_sheets.add(sheet_name)
+            index_columns(sheet_name)
+        except KeyError:
+            print(f"Error: Sheet '{sheet_name}' not found in the Excel file.")
+            return {}, {}
+        except Exception as e:
+            print(f"Error loading Excel file: {str(e)}")
+            return {}, {}
+    
+        # Initialize dependencies for the starting sheet
+        sheet_dependencies[sheet_name] = defaultdict(set)
+    
+        while queue:
+            current_sheet, current_column = queue.popleft()
         
-        # Get column info
-        if current_sheet not in sheet_columns:
-            # Load sheet data if not already loaded
-            try:
-                sheet_columns[current_sheet] = load_excel_partial(file_path, current_sheet, header_row, formula_row)
-                loaded_sheets.add(current_sheet)
-            except Exception as e:
-                print(f"Error loading sheet '{current_sheet}': {str(e)}")
+            # Skip if already processed
+            if current_column in processed[current_sheet]:
                 continue
         
-        # Skip if column not found in sheet
-        if current_column not in sheet_columns[current_sheet]:
-            continue
+            # Mark as processed
+            processed[current_sheet].add(current_column)
+        
+            # Initialize dependencies for this sheet if not already done
+            if current_sheet not in sheet_dependencies:
+                sheet_dependencies[current_sheet] = defaultdict(set)
+        
+            # Get column info
+            if current_sheet not in sheet_columns:
+                # Load sheet data if not already loaded
+                try:
+                    sheet_columns[current_sheet] = load_excel_partial(file_path, current_sheet, header_row, formula_row, session)
+                    loaded_sheets.add(current_sheet)
+                    index_columns(current_sheet)
+                except Exception as e:
+                    print(f"Error loading sheet '{current_sheet}': {str(e)}")
+                    continue
+        
+            # Skip if column not found in sheet
+            if current_column not in sheet_columns[current_sheet]:
+                continue
         
-        # Get formula for current column
-        formula = sheet_columns[current_sheet][current_column].get('formula', '')
+            # Get formula for current column
+            formula = sheet_columns[current_sheet][current_column].get('formula', '')
         
-        # Process columns with formulas or values
-        if formula or 'value' in sheet_columns[current_sheet][current_column]:
-            if formula:
-                # Parse dependencies
-                dependencies, vlookup_deps = parse_formula_dependencies(formula)
+            # Process columns with formulas or values
+            if formula or 'value' in sheet_columns[current_sheet][current_column]:
+                if formula:
+                    # Parse dependencies
+                    if cache is not None:
+                        dependencies, vlookup_deps = cached_formula_dependencies(cache, current_sheet, formula)
+                    else:
+                        dependencies, vlookup_deps = parse_formula_dependencies(formula)
                 
-                # Add dependencies to current column
-                sheet_dependencies[current_sheet][current_column].update(dependencies)
+                    # Add dependencies to current column
+                    sheet_dependencies[current_sheet][current_column].update(dependencies)
                 
-                # Add dependencies to queue for processing
-                for dep_col in dependencies:
-                    if dep_col not in processed[current_sheet]:
-                        queue.append((current_sheet, dep_col))
+                    # Add dependencies to queue for processing
+                    for dep_col in dependencies:
+                        if dep_col not in processed[current_sheet]:
+                            queue.append((current_sheet, dep_col))
                 
-                # Process VLOOKUP dependencies
-                for ref_sheet, start_col, end_col, col_index in vlookup_deps:
-                    # Load referenced sheet if not already loaded
-                    if ref_sheet not in loaded_sheets:
-                        try:
-                            sheet_columns[ref_sheet] = load_sheet_for_vlookup(file_path, ref_sheet, header_row, formula_row)
-                            loaded_sheets.add(ref_sheet)
-                        except Exception as e:
-                            print(f"Error loading referenced sheet '{ref_sheet}': {str(e)}")
-                            continue
+                    # Process VLOOKUP dependencies
+                    for ref_sheet, start_col, end_col, col_index in vlookup_deps:
+                        # Load referenced sheet if not already loaded
+                        if ref_sheet not in loaded_sheets:
+                            try:
+                                sheet_columns[ref_sheet] = load_sheet_for_vlookup(file_path, ref_sheet, header_row, formula_row, session)
+                                loaded_sheets.add(ref_sheet)
+                                index_columns(ref_sheet)
+                            except Exception as e:
+                                print(f"Error loading referenced sheet '{ref_sheet}': {str(e)}")
+                                continue
                     
-                    # Add VLOOKUP reference to dependencies
-                    if col_index != "INDEX":  # Regular VLOOKUP
-                        try:
-                            lookup_col = get_column_letter(int(col_index))
-                            sheet_dependencies[current_sheet][current_column].add(f"{ref_sheet}!{lookup_col}")
-                        except ValueError:
-                            # Handle cases where col_index is not a valid integer
-                            print(f"Warning: Invalid column index in VLOOKUP: {col_index}")
-                            pass
+                        # Add VLOOKUP reference to dependencies
+                        if col_index != "INDEX":  # Regular VLOOKUP
+                            try:
+                                lookup_col = get_column_letter(int(col_index))
+                                sheet_dependencies[current_sheet][current_column].add(f"{ref_sheet}!{lookup_col}")
+                            except ValueError:
+                                # Handle cases where col_index is not a valid integer
+                                print(f"Warning: Invalid column index in VLOOKUP: {col_index}")
+                                pass
                     
-                    # Add all columns in the range to process
-                    for col in get_column_range(start_col, end_col):
-                        if col not in processed[ref_sheet]:
-                            queue.append((ref_sheet, col))
-    
-    return sheet_dependencies, sheet_columns
+                        # Add the loaded columns that fall inside the range to process
+                        sheet_dependencies.setdefault(ref_sheet, defaultdict(set))
+                        for _, col_idx in column_index.cells_in(ref_sheet, f"{start_col}:{end_col}"):
+                            col = get_column_letter(col_idx)
+                            if col not in processed[ref_sheet]:
+                                queue.append((ref_sheet, col))
+    
+        return sheet_dependencies, sheet_columns
+
+def find_root_columns(dependencies, sheet_name):
+    """Sorted columns of a sheet that no other column of the same sheet depends on."""
+    # Find root columns (columns that aren't dependencies of any other column in the same sheet)
+    all_deps = set()
+    for col_deps in dependencies[sheet_name].values():
+        for dep in col_deps:
+            if "!" not in dep:  # Only consider dependencies within the same sheet
+                all_deps.add(dep)
+    
+    sheet_columns = set(dependencies[sheet_name].keys())
+    root_columns = sheet_columns - all_deps
+    
+    # If no root columns found, just use the first column alphabetically
+    if not root_columns and sheet_columns:
+        root_columns = {min(sheet_columns)}
+    return sorted(root_columns)
+
+def build_node_table(dependencies, column_info):
+    """
+    Node table for the lazy viewer: one row per sheet!column, however many
+    columns depend on it, and one section of root columns per sheet.
+    """
+    table = NodeTable()
+    
+    def add(sheet_name, column):
+        info = column_info.get(sheet_name, {}).get(column, {})
+        text = f"{sheet_name}!{column}"
+        if info.get('header'):
+            text += f" ({info['header']})"
+        if info.get('formula'):
+            detail = info['formula']
+        elif info.get('value') is not None:
+            detail = f"Value: {info['value']}"
+        else:
+            detail = ''
+        return table.add((sheet_name, column), text, detail)
+    
+    sections = []
+    pending = []
+    for sheet_name in sorted(dependencies.keys()):
+        roots = []
+        for column in find_root_columns(dependencies, sheet_name):
+            node_id, created = add(sheet_name, column)
+            roots.append(node_id)
+            if created:
+                pending.append((node_id, sheet_name, column))
+        sections.append((f"Sheet: {sheet_name}", roots))
+    
+    while pending:
+        node_id, sheet_name, column = pending.pop()
+        child_ids = []
+        for dep in sorted(dependencies.get(sheet_name, {}).get(column, ())):
+            ref_sheet, ref_col = dep.split("!") if "!" in dep else (sheet_name, dep)
+            child_id, created = add(ref_sheet, ref_col)
+            child_ids.append(child_id)
+            if created:
+                pending.append((child_id, ref_sheet, ref_col))
+        table.set_children(node_id, child_ids)
+    return table, sections
 
 def generate_html_dependency_tree(dependencies, column_info):
     """Generate an HTML dependency tree from the dependencies."""
-    html = """
+    buffer = io.StringIO()
+    write_html_dependency_tree(dependencies, column_info, buffer)
+    return buffer.getvalue()
+
+def write_html_dependency_tree(dependencies, column_info, out):
+    """Stream the HTML dependency tree into a file-like object, fragment by fragment."""
+    write = out.write
+    write("""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -407,114 +499,100 @@ def generate_html_dependency_tree(dependencies, column_info):
                 <li><span class="circular">Circular references</span> - Detected circular dependencies</li>
             </ul>
         </div>
-    """
+    """)
     
-    def build_tree(sheet_name, column, path=None):
+    def build_tree(sheet_name, column):
         """
-        Recursively build the dependency tree.
+        Write the dependency tree of one column, walking it with an explicit stack.
         
         Args:
             sheet_name: Name of the sheet
             column: Column to process
-            path: Path of visited columns (to detect circular references)
-        
-        Returns:
-            HTML string for this branch of the tree
         """
-        if path is None:
-            path = []
-        
-        # Check for circular references
-        current_path = f"{sheet_name}!{column}"
-        if current_path in path:
-            return f"<div class='circular'>Circular reference: {current_path}</div>"
-        
-        # Add current column to path
-        new_path = path + [current_path]
-        
-        # Get column info
-        header = None
-        formula = None
-        value = None
-        if sheet_name in column_info and column in column_info[sheet_name]:
-            header = column_info[sheet_name][column].get('header', '')
-            formula = column_info[sheet_name][column].get('formula', '')
-            value = column_info[sheet_name][column].get('value', None)
-        
-        # Create HTML for this node
-        result = f"<details><summary>{sheet_name}!{column}"
-        if header:
-            result += f" <span class='column-header'>({header})</span>"
-        result += "</summary>"
-        
-        if formula:
-            result += f"<div class='formula'>{formula}</div>"
-        elif value is not None:
-            result += f"<div class='value'>Value: {value}</div>"
-        
-        # Add dependencies
-        if sheet_name in dependencies and column in dependencies[sheet_name]:
-            deps = dependencies[sheet_name][column]
+        path = set()  # Columns on the current branch (to detect circular references)
+        # Items are (sheet, column) to expand, or (None, closing markup, path entry to leave)
+        stack = [(sheet_name, column)]
+        while stack:
+            item = stack.pop()
+            if item[0] is None:
+                write(item[1])
+                path.discard(item[2])
+                continue
+            sheet_name, column = item
+            
+            # Check for circular references
+            current_path = f"{sheet_name}!{column}"
+            if current_path in path:
+                write(f"<div class='circular'>Circular reference: {current_path}</div>")
+                continue
+            
+            # Add current column to path
+            path.add(current_path)
+            
+            # Get column info
+            header = None
+            formula = None
+            value = None
+            if sheet_name in column_info and column in column_info[sheet_name]:
+                header = column_info[sheet_name][column].get('header', '')
+                formula = column_info[sheet_name][column].get('formula', '')
+                value = column_info[sheet_name][column].get('value', None)
+            
+            # Create HTML for this node
+            result = f"<details><summary>{sheet_name}!{column}"
+            if header:
+                result += f" <span class='column-header'>({header})</span>"
+            result += "</summary>"
+            
+            if formula:
+                result += f"<div class='formula'>{formula}</div>"
+            elif value is not None:
+                result += f"<div class='value'>Value: {value}</div>"
+            write(result)
+            stack.append((None, "</details>", current_path))
+            
+            # Add dependencies, pushed in reverse so they are emitted in sorted order
+            deps = dependencies.get(sheet_name, {}).get(column)
             if deps:
-                for dep in sorted(deps):
+                for dep in sorted(deps, reverse=True):
                     if "!" in dep:
                         # Reference to another sheet
                         ref_sheet, ref_col = dep.split("!")
-                        result += build_tree(ref_sheet, ref_col, new_path)
+                        stack.append((ref_sheet, ref_col))
                     else:
                         # Reference to the same sheet
-                        result += build_tree(sheet_name, dep, new_path)
+                        stack.append((sheet_name, dep))
             else:
-                result += "<div class='no-deps'>No dependencies</div>"
-        else:
-            result += "<div class='no-deps'>No dependencies</div>"
-        
-        result += "</details>"
-        return result
+                write("<div class='no-deps'>No dependencies</div>")
     
     # Build tree for each sheet
     sorted_sheets = sorted(dependencies.keys())
     for sheet_name in sorted_sheets:
-        html += f"""
+        write(f"""
         <div class='sheet'>
             <div class='sheet-title'>
                 <h2 class='sheet-name'>Sheet: {sheet_name}</h2>
             </div>
-        """
-        
-        # Find root columns (columns that aren't dependencies of any other column in the same sheet)
-        all_deps = set()
-        for col_deps in dependencies[sheet_name].values():
-            for dep in col_deps:
-                if "!" not in dep:  # Only consider dependencies within the same sheet
-                    all_deps.add(dep)
-        
-        sheet_columns = set(dependencies[sheet_name].keys())
-        root_columns = sheet_columns - all_deps
+        """)
         
-        # If no root columns found, just use the first column alphabetically or the starting column
+        root_columns = find_root_columns(dependencies, sheet_name)
         if not root_columns:
-            if sheet_columns:
-                root_columns = {min(sheet_columns)}
-            else:
-                html += "<p>No formula columns found in this sheet.</p>"
-                html += "</div>"
-                continue
+            write("<p>No formula columns found in this sheet.</p>")
+            write("</div>")
+            continue
         
         # Build tree for each root column
-        for column in sorted(root_columns):
-            html += build_tree(sheet_name, column)
+        for column in root_columns:
+            build_tree(sheet_name, column)
         
-        html += "</div>"
+        write("</div>")
     
-    html += """
+    write("""
     </body>
     </html>
-    """
-    
-    return html
+    """)
 
-def main(file_path, sheet_name, start_column, header_row, formula_row, output_html_path=None):
+def main(file_path, sheet_name, start_column, header_row, formula_row, output_html_path=None, use_cache=False, lazy=False):
     """
     Main function to analyze Excel dependencies and generate HTML.
     
@@ -524,7 +602,9 @@ def main(file_path, sheet_name, start_column, header_row, formula_row, output_ht
         start_column: Starting column (e.g., 'A')
         header_row: Row number for headers (1-based)
         formula_row: Row number for formulas (1-based)
-        output_html_path: Path to save HTML output, if None will use input file name with .html extension
+        output_html_path: Path to save HTML output (.gz for gzip), if None will use input file name with .html extension
+        use_cache: Reuse extracted rows and parsed formulas from a sidecar cache next to the workbook
+        lazy: Write a JSON node table and a viewer that renders columns only when they are expanded
     
     Returns:
         Path to the generated HTML file
@@ -535,25 +615,32 @@ def main(file_path, sheet_name, start_column, header_row, formula_row, output_ht
     
     try:
         # Analyze dependencies
-        dependencies, column_info = analyze_excel_dependencies(
-            file_path, sheet_name, start_column, header_row, formula_row
-        )
+        if use_cache:
+            with DependencyCache(file_path) as cache:
+                dependencies, column_info = analyze_excel_dependencies(
+                    file_path, sheet_name, start_column, header_row, formula_row, cache
+                )
+        else:
+            dependencies, column_info = analyze_excel_dependencies(
+                file_path, sheet_name, start_column, header_row, formula_row
+            )
         
         if not dependencies or not column_info:
             print("No dependencies found or error occurred during analysis.")
             return None
         
-        # Generate HTML
-        html_content = generate_html_dependency_tree(dependencies, column_info)
-        
         # Determine output path
         if output_html_path is None:
             base_name = os.path.splitext(os.path.basename(file_path))[0]
             output_html_path = f"{base_name}_dependency_tree.html"
         
-        # Save HTML to file
-        with open(output_html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        # Stream the HTML to file (gzip-compressed for .gz paths)
+        with open_output(output_html_path) as f:
+            if lazy:
+                table, sections = build_node_table(dependencies, column_info)
+                write_viewer(f, "Excel Formula Dependency Tree", table, sections)
+            else:
+                write_html_dependency_tree(dependencies, column_info, f)
         
         print(f"Dependency tree saved to: {output_html_path}")
         return output_html_path
@@ -573,8 +660,10 @@ if __name__ == "__main__":
     parser.add_argument('start_column', help='Starting column (e.g., A)')
     parser.add_argument('header_row', type=int, help='Row number for headers (1-based)')
     parser.add_argument('formula_row', type=int, help='Row number for formulas (1-based)')
-    parser.add_argument('--output', help='Path to save HTML output')
+    parser.add_argument('--output', help='Path to save HTML output, gzip-compressed when it ends in .gz')
+    parser.add_argument('--cache', action='store_true', help='Reuse extracted rows and formulas from a sidecar cache next to the workbook')
+    parser.add_argument('--lazy', action='store_true', help='Write a JSON node table with a viewer that renders columns only when expanded')
     
     args = parser.parse_args()
     
-    main(args.file_path, args.sheet_name, args.start_column, args.header_row, args.formula_row, args.output)
\ No newline at end of file
+    main(args.file_path, args.sheet_name, args.start_column, args.header_row, args.formula_row, args.output, args.cache, args.lazy)
\ No newline at end of file
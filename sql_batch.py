@@ -0,0 +1,182 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import sql_lexer
+from identifier_replacer import replacer_for
+from mapping_store import MappingStore
+
+CHUNK_SIZE = 1 << 20  # Characters read at a time; a file is never held in memory whole
+
+# How each interactive script rewrites a query, as (strips -- comments, replacement)
+STYLES = {
+    # Case-sensitive names; literals and comments are left alone
+    'v10': (True, lambda mapping: lambda sql, counts: sql_lexer.replace_names(sql, mapping, counts)),
+    # Whole names in any case; literals and comments are left alone, as v8's placeholders intend
+    'v8': (True, lambda mapping: lambda sql, counts: sql_lexer.replace_names(sql, mapping, counts, ignore_case=True)),
+    # Any occurrence in any case, inside words too
+    'gpt4o_v6_ut': (False, lambda mapping: replacer_for(mapping, ignore_case=True, whole_words=False).replace),
+}
+
+
+def load_mapping(path, query=None):
+    """
+    The identifier map of a saved mapping file: a plain {identifier: name}
+    JSON object (v10, gpt4o_v6_ut), a saved v8 query holding one under
+    'identifier_map', or a .sqlite MappingStore (one saved query's map, or
+    every stored mapping when query is None).
+    """
+    if path.endswith('.sqlite'):
+        with MappingStore(path, readonly=True) as store:
+            return store.mapping(query)
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} is not a mapping file: expected a JSON object, found {type(data).__name__}")
+    if isinstance(data.get('identifier_map'), dict):
+        data = data['identifier_map']
+    return {str(key): str(value) for key, value in data.items()}
+
+
+def collect_files(source, pattern='*.sql'):
+    """
+    [(input path, path relative to the output directory)] for a directory
+    (searched recursively for pattern) or a glob such as 'queries/**/*.hql'.
+    """
+    if os.path.isdir(source):
+        root = source
+        paths = glob.glob(os.path.join(glob.escape(source), '**', pattern), recursive=True)
+    else:
+        paths = glob.glob(source, recursive=True)
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else '.'
+    return sorted((path, os.path.relpath(os.path.abspath(path), os.path.abspath(root)))
+                  for path in paths if os.path.isfile(path))
+
+
+def rewrite_stream(source, target, rewrite, strip_comments=False, chunk_size=CHUNK_SIZE):
+    """
+    Copy source to target through rewrite(text), chunk by chunk. Each chunk
+    is cut at sql_lexer.safe_cut(), so no literal, comment or name is split
+    between two rewrites; text after the cut is carried into the next read,
+    which grows with the carry so a long literal is not re-scanned over and
+    over.
+    """
+    carry = ''
+    while True:
+        chunk = source.read(max(chunk_size, len(carry)))
+        text = carry + chunk
+        cut = sql_lexer.safe_cut(text) if chunk else len(text)
+        if cut:
+            part = text[:cut]
+            target.write(rewrite(sql_lexer.strip_line_comments(part) if strip_comments else part))
+        carry = text[cut:]
+        if not chunk:
+            return
+
+
+_job = None  # (rewrite, strip_comments, chunk_size) of this worker process
+
+
+def _start_worker(mapping, style, keep_comments, chunk_size):
+    global _job
+    strips_comments, make_rewrite = STYLES[style]
+    _job = (make_rewrite(mapping), strips_comments and not keep_comments, chunk_size)
+
+
+def _rewrite_file(task):
+    source_path, target_path = task
+    rewrite, strip_comments, chunk_size = _job
+    counts = Counter()
+    os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+    # surrogateescape lets bytes that are not UTF-8 through unchanged; newline='' keeps line endings
+    with open(source_path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as source, \
+            open(target_path, 'w', encoding='utf-8', errors='surrogateescape', newline='') as target:
+        rewrite_stream(source, target, lambda text: rewrite(text, counts), strip_comments, chunk_size)
+    return source_path, counts
+
+
+def rewrite_files(mapping, files, out_dir, style='v10', reverse=False, jobs=None, keep_comments=False,
+                  chunk_size=CHUNK_SIZE):
+    """
+    Rewrite every (input path, relative path) of files into out_dir with the
+    given script's replacement rules, forward (identifier -> mapped name) or
+    reverse. Yields (input path, Counter of hits per mapping key) as files
+    finish, in order.
+
+    The mapping is sent to each worker process once, when the pool starts;
+    workers then receive only paths and stream the files themselves.
+    """
+    if style not in STYLES:
+        raise ValueError(f"Unknown style {style!r}; expected one of {', '.join(STYLES)}")
+    if reverse:
+        mapping = {name: identifier for identifier, name in mapping.items()}
+    tasks = []
+    for path, relative in files:
+        target = os.path.join(out_dir, relative)
+        if os.path.abspath(target) == os.path.abspath(path):
+            raise ValueError(f"{path} would be overwritten; choose an output directory outside the input")
+        tasks.append((path, target))
+    args = (mapping, style, keep_comments, chunk_size)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(tasks) <= 1:
+        _start_worker(*args)
+        for task in tasks:
+            yield _rewrite_file(task)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_start_worker, initargs=args) as executor:
+        yield from executor.map(_rewrite_file, tasks, chunksize=max(1, min(64, len(tasks) // (jobs * 8))))
+
+
+def write_summary(path, mapping, hits):
+    """Write every mapping key with its replacement and hit count to a CSV, most hits first."""
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['identifier', 'replacement', 'hits'])
+        for key, value in sorted(mapping.items(), key=lambda item: (-hits[item[0]], item[0])):
+            writer.writerow([key, value, hits[key]])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rewrite a directory of SQL files with a saved identifier mapping.")
+    parser.add_argument('mapping', help='Mapping file: a JSON {identifier: name} object, a saved v8 query '
+                                        'or a .sqlite mapping store')
+    parser.add_argument('source', help='Directory of SQL files (searched recursively) or a glob, e.g. "repo/**/*.hql"')
+    parser.add_argument('out_dir', help='Directory the rewritten files are written to, mirroring the input layout')
+    parser.add_argument('--query', help='Saved query whose mapping is used, when mapping is a store')
+    parser.add_argument('--reverse', action='store_true', help='Map names back to the original identifiers')
+    parser.add_argument('--style', choices=sorted(STYLES), default='v10',
+                        help='Replacement rules of the script the mapping was made with (default: v10)')
+    parser.add_argument('--pattern', default='*.sql', help='File pattern when source is a directory (default: *.sql)')
+    parser.add_argument('--keep-comments', action='store_true', help='Do not strip -- comments (v10 and v8 do)')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--summary', help='Also write every identifier with its hit count to this CSV')
+    parser.add_argument('--top', type=int, default=20, help='Identifiers listed in the printed summary (default: 20)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    mapping = load_mapping(args.mapping, args.query)
+    files = collect_files(args.source, args.pattern)
+    hits = Counter()
+    for _, counts in rewrite_files(mapping, files, args.out_dir, args.style, args.reverse, args.jobs,
+                                   args.keep_comments):
+        hits.update(counts)
+    elapsed = time.perf_counter() - start
+
+    # Hits are counted under the keys actually replaced: mapped names when reversing
+    keys = {name: identifier for identifier, name in mapping.items()} if args.reverse else mapping
+    if args.style != 'v10':
+        keys = {key.lower(): value for key, value in reversed(list(keys.items()))}
+    size = sum(os.path.getsize(path) for path, _ in files)
+    print(f"Rewrote {len(files)} files ({size / 1e6:.1f} MB) into {args.out_dir} in {elapsed:.2f}s")
+    print(f"{sum(hits.values())} replacements; {sum(1 for key in keys if hits[key])} of {len(keys)} "
+          f"mapped identifiers found")
+    for key, count in hits.most_common(args.top):
+        print(f"  {key} -> {keys.get(key, '?')}: {count}")
+    if args.summary:
+        write_summary(args.summary, keys, hits)
+        print(f"Summary written to {args.summary}")
@@ -0,0 +1,176 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+from identifier_replacer import trie_pattern
+
+# Reserved words that are never reported as identifiers, in any case
+KEYWORDS = frozenset({
+    'ADD', 'ALL', 'ALTER', 'AND', 'ANY', 'AS', 'ASC', 'AUTHORIZATION', 'BACKUP', 'BEGIN', 'BETWEEN',
+    'BREAK', 'BROWSE', 'BULK', 'BY', 'CASCADE', 'CASE', 'CHECK', 'CHECKPOINT', 'CLOSE', 'CLUSTERED',
+    'COALESCE', 'COLLATE', 'COLUMN', 'COMMIT', 'COMPUTE', 'CONSTRAINT', 'CONTAINS', 'CONTAINSTABLE',
+    'CONTINUE', 'CONVERT', 'CREATE', 'CROSS', 'CURRENT', 'CURRENT_DATE', 'CURRENT_TIME',
+    'CURRENT_TIMESTAMP', 'CURRENT_USER', 'CURSOR', 'DATABASE', 'DBCC', 'DEALLOCATE', 'DECLARE',
+    'DEFAULT', 'DELETE', 'DENY', 'DESC', 'DISK', 'DISTINCT', 'DISTRIBUTED', 'DOUBLE', 'DROP',
+    'DUMP', 'ELSE', 'END', 'ERRLVL', 'ESCAPE', 'EXCEPT', 'EXEC', 'EXECUTE', 'EXISTS', 'EXIT',
+    'EXTERNAL', 'FETCH', 'FILE', 'FILLFACTOR', 'FOR', 'FOREIGN', 'FREETEXT', 'FREETEXTTABLE',
+    'FROM', 'FULL', 'FUNCTION', 'GOTO', 'GRANT', 'GROUP', 'HAVING', 'HOLDLOCK', 'IDENTITY',
+    'IDENTITY_INSERT', 'IDENTITYCOL', 'IF', 'IN', 'INDEX', 'INNER', 'INSERT', 'INTERSECT', 'INTO',
+    'IS', 'JOIN', 'KEY', 'KILL', 'LEFT', 'LIKE', 'LINENO', 'LOAD', 'MERGE', 'NATIONAL', 'NATURAL',
+    'NOCHECK', 'NONCLUSTERED', 'NOT', 'NULL', 'NULLIF', 'OF', 'OFF', 'OFFSETS', 'ON', 'OPEN',
+    'OPENDATASOURCE', 'OPENQUERY', 'OPENROWSET', 'OPENXML', 'OPTION', 'OR', 'ORDER', 'OUTER',
+    'OVER', 'PERCENT', 'PIVOT', 'PLAN', 'PRECISION', 'PRIMARY', 'PRINT', 'PROC', 'PROCEDURE',
+    'PUBLIC', 'RAISERROR', 'READ', 'READTEXT', 'RECONFIGURE', 'REFERENCES', 'REPLICATION',
+    'RESTORE', 'RESTRICT', 'RETURN', 'REVOKE', 'RIGHT', 'ROLLBACK', 'ROWCOUNT', 'ROWGUIDCOL',
+    'RULE', 'SAVE', 'SCHEMA', 'SECURITYAUDIT', 'SELECT', 'SEMANTICKEYPHRASETABLE',
+    'SEMANTICSIMILARITYDETAILSTABLE', 'SEMANTICSIMILARITYTABLE', 'SESSION_USER', 'SET', 'SETUSER',
+    'SHUTDOWN', 'SOME', 'STATISTICS', 'SYSTEM_USER', 'TABLE', 'TABLESAMPLE', 'TEXTSIZE', 'THEN',
+    'TO', 'TOP', 'TRAN', 'TRANSACTION', 'TRIGGER', 'TRUNCATE', 'TRY_CONVERT', 'TSEQUAL', 'UNION',
+    'UNIQUE', 'UNPIVOT', 'UPDATE', 'UPDATETEXT', 'USE', 'USER', 'VALUES', 'VARYING', 'VIEW',
+    'WAITFOR', 'WHEN', 'WHERE', 'WHILE', 'WITH', 'WITHIN', 'WRITETEXT', 'XMLCAST', 'XMLEXISTS',
+    'XMLNAMESPACES', 'XMLPARSE', 'XMLQUERY', 'XPATH', 'XSINIL',
+})
+
+# Token patterns; strings, quoted names and comments left open run to the end of the text
+COMMENT = r"--[^\n]*|/\*.*?(?:\*/|\Z)"
+STRING = r"'(?:[^'\\]|\\(?:.|\Z)|'')*(?:'|\Z)|\"(?:[^\"\\]|\\(?:.|\Z)|\"\")*(?:\"|\Z)"
+QUOTED = r"`(?:[^`]|``)*(?:`|\Z)"
+NUMBER = r"\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b"
+
+# Every alternative starts with its own characters, so the scan never backtracks across tokens
+TOKEN_RE = re.compile(
+    rf"(?P<space>\s+)|(?P<comment>{COMMENT})|(?P<string>{STRING})|(?P<quoted>{QUOTED})"
+    rf"|(?P<number>{NUMBER})|(?P<word>\w+)|(?P<symbol>.)",
+    re.DOTALL)
+
+# identifiers() only needs words and quoted names: comments, literals and numbers are
+# matched so their insides are skipped, spaces and symbols are skipped by the search itself
+IDENTIFIER_RE = re.compile(rf"{COMMENT}|{STRING}|{NUMBER}|(?P<word>\w+)|(?P<quoted>{QUOTED})", re.DOTALL)
+
+# The tokens that can span lines; safe_cut() never cuts inside one
+SPAN_RE = re.compile(rf"{COMMENT}|{STRING}|{QUOTED}", re.DOTALL)
+
+# A -- comment, or text that may contain -- without starting one (kept as group 1)
+LINE_COMMENT_RE = re.compile(rf"({STRING}|{QUOTED}|/\*.*?(?:\*/|\Z))|--[^\n]*", re.DOTALL)
+
+
+class Token(NamedTuple):
+    kind: str  # space, comment, string, quoted, number, keyword, word or symbol
+    text: str
+    start: int
+
+
+def tokenize(sql):
+    """
+    Yield the Tokens of sql in one pass: every character belongs to exactly
+    one token, so ''.join(token.text ...) gives sql back. 'string' covers
+    '...' and "..." literals, 'quoted' `backtick` names, 'keyword' the words
+    in KEYWORDS.
+    """
+    for match in TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'word' and text.upper() in KEYWORDS:
+            kind = 'keyword'
+        yield Token(kind, text, match.start())
+
+
+def quoted_name(text):
+    """The name inside a `backtick` token."""
+    body = text[1:-1] if len(text) > 1 and text.endswith('`') else text[1:]
+    return body.replace('``', '`')
+
+
+def identifiers(sql):
+    """
+    Identifier names in order of appearance, repeats included: words that
+    are not keywords and the names inside backticks. Nothing inside string
+    literals or comments is reported.
+    """
+    found = []
+    for match in IDENTIFIER_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind == 'word':
+            text = match.group()
+            if text.upper() not in KEYWORDS:
+                found.append(text)
+        elif kind == 'quoted' and len(match.group()) > 1:
+            found.append(quoted_name(match.group()))
+    return found
+
+
+def strip_line_comments(sql):
+    """sql without its -- comments; a -- inside a string literal is kept."""
+    if '--' not in sql:
+        return sql
+    return LINE_COMMENT_RE.sub(r'\1', sql)
+
+
+def replace_names(sql, mapping, counts=None, ignore_case=False):
+    """
+    sql with every word or `quoted` name that is a key of mapping replaced by
+    its value, in one pass. String literals and comments are opaque tokens:
+    they are copied through untouched, so nothing has to be swapped out
+    before replacing and restored after. counts, a Counter, gets one hit per
+    replaced name.
+
+    ignore_case: names match keys in any case (the first key wins among keys
+        that differ only in case); hits are counted under the lowercased key.
+    """
+    if not mapping:
+        return sql
+    if ignore_case:
+        mapping = _lowercased(tuple(mapping.items()))
+
+    def replace(match):
+        kept, quoted = match.group(1, 2)
+        if kept is not None:
+            return kept
+        name = quoted_name(quoted) if quoted is not None else match.group()
+        if ignore_case:
+            name = name.lower()
+        if name not in mapping:
+            return match.group()
+        if counts is not None:
+            counts[name] += 1
+        return mapping[name] if quoted is None else f"`{mapping[name].replace('`', '``')}`"
+
+    return _names_pattern(tuple(mapping), ignore_case).sub(replace, sql)
+
+
+@lru_cache(maxsize=32)
+def _lowercased(items):
+    lookup = {}
+    for key, value in items:
+        lookup.setdefault(key.lower(), value)
+    return lookup
+
+
+@lru_cache(maxsize=32)
+def _names_pattern(names, ignore_case=False):
+    # Comments and literals (group 1) are matched whole so nothing inside them is looked at, `quoted`
+    # names (group 2) are looked up by their contents, and the mapped words are one trie between word
+    # boundaries: every other word is skipped by the regex engine without a call back into Python
+    words = [name for name in names if re.fullmatch(r'\w+', name)]
+    pattern = rf"({COMMENT}|{STRING})|({QUOTED})"
+    if words:
+        pattern += rf"|\b(?:{trie_pattern(words)})\b"
+    return re.compile(pattern, re.DOTALL | (re.IGNORECASE if ignore_case else 0))
+
+
+def safe_cut(sql):
+    """
+    Length of the longest prefix of sql that ends with a newline outside
+    every string literal, quoted name and comment, 0 if there is none. No
+    token crosses that point, so the text on each side of it can be lexed
+    on its own, as when a file is rewritten chunk by chunk.
+    """
+    cut = 0
+    end = 0
+    for match in SPAN_RE.finditer(sql):
+        newline = sql.rfind('\n', end, match.start())
+        if newline >= 0:
+            cut = newline + 1
+        end = match.end()
+    newline = sql.rfind('\n', end)
+    return newline + 1 if newline >= 0 else cut
@@ -0,0 +1,54 @@
+class RenderLimits:
+    """
+    State shared by one rendering of a dependency tree.
+
+    dedup: a node whose subtree was already expanded is printed once more as a
+        back-reference ("→ see Sheet2!C2") instead of being expanded again.
+    max_depth: nodes at this depth are printed but not expanded (root is 0).
+    max_nodes: rendering stops after this many nodes, with a single note.
+
+    None (or False) disables each limit, which renders exactly what the
+    printers produced before these options existed.
+    """
+
+    def __init__(self, dedup=False, max_depth=None, max_nodes=None):
+        self.dedup = dedup
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.rendered = 0
+        self._anchors = {}  # Node key -> anchor of its first expansion
+        self._budget_noted = False
+
+    def take(self):
+        """Count one rendered node; False once the node budget is spent."""
+        if self.max_nodes is not None and self.rendered >= self.max_nodes:
+            return False
+        self.rendered += 1
+        return True
+
+    def budget_note(self):
+        """Text to print where the budget ran out, only the first time it is asked for."""
+        if self._budget_noted:
+            return None
+        self._budget_noted = True
+        return f"… node budget of {self.max_nodes} reached, output truncated"
+
+    def anchor(self, key):
+        """Anchor of key's earlier expansion when it should be shown as a back-reference."""
+        return self._anchors.get(key) if self.dedup else None
+
+    def expand(self, key):
+        """Record that key's subtree is expanded here and return its anchor."""
+        anchor = self._anchors[key] = f"node-{len(self._anchors)}"
+        return anchor
+
+    def stops_at(self, depth):
+        return self.max_depth is not None and depth >= self.max_depth
+
+    @staticmethod
+    def see(label):
+        return f"→ see {label}"
+
+    @staticmethod
+    def depth_note(hidden):
+        return f"… {hidden} reference{'s' if hidden != 1 else ''} below the depth limit"
@@ -0,0 +1,156 @@
+import argparse
+import math
+import os
+import sys
+import tempfile
+
+import numpy as np
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+from excel_formulas_parser import CellIndex, DependencyGraph
+from formula_eval import FormulaEngine, _PerCell
+
+ERROR = object()  # Expected value of a formula that evaluates to an error (NaN in the engine)
+
+# (formula, expected value) on the Checks sheet, where A2 holds 5 and A3 the text "7"
+CHECKS = [
+    # Text that reads as a number converts, other text is #VALUE!
+    ('="1"+1', 2.0),
+    ('="1"+A2', 6.0),
+    ('=A3*2', 14.0),
+    ('="2"*"3"', 6.0),
+    ('=ABS("x")', ERROR),
+    ('=ABS("-4")', 4.0),
+    ('=TRUE+1', 2.0),
+    # Comparisons
+    ('=A2>3', True),
+    ('=A2>=5', True),
+    ('=A2<>5', False),
+    ('=A2<5', False),
+    ('="abc"="abc"', True),
+    # IF / IFERROR
+    ('=IF(A2>3,"big","small")', 'big'),
+    ('=IF(A2>30,1,0)', 0.0),
+    ('=IF("1",1,2)', 1.0),
+    ('=IFERROR(1/0,-1)', -1.0),
+    ('=IFERROR(ABS("x"),"bad")', 'bad'),
+    ('=IFERROR(A2*2,0)', 10.0),
+    ('=ROUND(IF(A2>3,A2/3,0),2)', 1.67),
+    # VLOOKUP / MATCH
+    ('=VLOOKUP("c",Table!$A$2:$B$6,2,FALSE)', 30.0),
+    ('=VLOOKUP(25,Table!$D$2:$E$6,2,TRUE)', 'low'),
+    ('=VLOOKUP(A2*10,Table!$D$2:$E$6,2,TRUE)', 'mid'),
+    ('=IFERROR(VLOOKUP("zz",Table!$A$2:$B$6,2,FALSE),"missing")', 'missing'),
+    ('=MATCH("d",Table!$A$2:$A$6,0)', 4.0),
+    ('=MATCH(45,Table!$D$2:$D$6,1)', 2.0),
+    ('=SUM(Table!$B$2:$B$6)+A2', 155.0),
+]
+
+LEDGER_ROWS = 40
+
+# (label, set_values() changes) applied in turn: a few dirty rows are evaluated cell by cell, a whole
+# input column as vectors
+UPDATES = [
+    ('text input', {'Checks!A3': '9', 'Ledger!A5': 0}),
+    ('numeric input', {'Checks!A2': 8}),
+    ('every ledger row', {f'Ledger!A{r}': (r * 3) % 5 for r in range(2, LEDGER_ROWS + 2)}),
+    ('text into a number', {'Checks!A2': '2', 'Ledger!A7': 'x'}),
+]
+
+
+def generate_workbook(path):
+    """The CHECKS formulas, a lookup table and a ledger of row-by-row formulas reading the inputs."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Checks'
+    ws.append(['Input', 'Formula'])
+    ws.append([5])
+    ws.append(['7'])
+    for position, (formula, _) in enumerate(CHECKS, 2):
+        ws.cell(row=position, column=2, value=formula)
+    ws = wb.create_sheet('Table')
+    ws.append(['Code', 'Value', None, 'From', 'Band'])
+    for code, value, start, band in [('a', 10, 0, 'low'), ('b', 20, 40, 'mid'), ('c', 30, 80, 'high'),
+                                     ('d', 40, 120, 'top'), ('e', 50, 160, 'max')]:
+        ws.append([code, value, None, start, band])
+    ws = wb.create_sheet('Ledger')
+    ws.append(['Qty', 'Amount', 'Total', 'Band', 'Flag'])
+    ws.append([1, '=A2*Checks!$A$2', '=B2', '=VLOOKUP(C2,Table!$D$2:$E$6,2,TRUE)', '=IFERROR(C2/A2,"n/a")'])
+    for r in range(3, LEDGER_ROWS + 2):
+        ws.append([r % 7, f'=A{r}*Checks!$A$2', f'=C{r - 1}+B{r}', f'=VLOOKUP(C{r},Table!$D$2:$E$6,2,TRUE)',
+                   f'=IFERROR(C{r}/A{r},"n/a")'])
+    wb.save(path)
+
+
+def _same(value, expected):
+    if expected is ERROR:
+        return isinstance(value, float) and math.isnan(value)
+    if isinstance(value, float) and isinstance(expected, float):
+        return math.isclose(value, expected, abs_tol=1e-9) or (math.isnan(value) and math.isnan(expected))
+    return value == expected and type(value) is type(expected)
+
+
+def _formula_values(engine):
+    return {(sheet_name, ref): engine.value(sheet_name, ref)
+            for sheet_name, refs in [('Checks', [f'B{r}' for r in range(2, len(CHECKS) + 2)]),
+                                     ('Ledger', [f'{col}{r}' for r in range(2, LEDGER_ROWS + 2) for col in 'BCDE'])]
+            for ref in refs}
+
+
+def _interpreted(engine, run):
+    # FormulaEngine.evaluate over a whole run, cell by cell when the run cannot be one vector
+    tree = engine.compiled(run)
+    rows = np.arange(run.first_row, run.last_row + 1)
+    with np.errstate(all='ignore'):
+        try:
+            return list(engine.evaluate(tree, run.sheet, rows, run.col))
+        except _PerCell:
+            return [engine.evaluate(tree, run.sheet, np.array([row]), run.col)[0] for row in rows]
+
+
+def verify(path):
+    """Messages for every check that fails on the workbook at path (generated by generate_workbook)."""
+    engine = FormulaEngine(DependencyGraph(CellIndex.from_workbook(path, 1))).recalculate()
+    failures = [f"{run.sheet} {run.shape}: unsupported ({error})" for run, error in engine.unsupported.items()]
+    for row, (formula, expected) in enumerate(CHECKS, 2):
+        value = engine.value('Checks', f'B{row}')
+        if not _same(value, expected):
+            failures.append(f"{formula}: got {value!r}, expected {'an error' if expected is ERROR else repr(expected)}")
+
+    # The interpreter must agree with the generated functions recalculate() ran
+    for run in engine.runs:
+        if run in engine.unsupported:
+            continue
+        computed = engine.column(run.sheet, run.col)
+        for row, value in zip(range(run.first_row, run.last_row + 1), _interpreted(engine, run)):
+            value, expected = (item.item() if isinstance(item, np.generic) else item for item in (value, computed[row]))
+            if not _same(value, expected):
+                failures.append(f"evaluate {run.sheet}!{get_column_letter(run.col)}{row}: got {value!r}, "
+                                f"the compiled function gives {expected!r}")
+
+    # Incremental recalculation must leave every formula where a full recalculation puts it
+    for label, changes in UPDATES:
+        engine.set_values(changes)
+        incremental = _formula_values(engine)
+        full = _formula_values(engine.recalculate())
+        for cell, value in incremental.items():
+            if not _same(value, full[cell]):
+                failures.append(f"set_values ({label}) {cell[0]}!{cell[1]}: got {value!r}, "
+                                f"a full recalculation gives {full[cell]!r}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check FormulaEngine results on a generated workbook.")
+    parser.add_argument('--keep', help='Also save the generated workbook to this path')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.keep or os.path.join(directory, 'verify_formula_eval.xlsx')
+        generate_workbook(path)
+        failures = verify(path)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"{len(CHECKS)} formulas, the interpreter and {len(UPDATES)} incremental updates checked, {len(failures)} failures")
+    sys.exit(1 if failures else 0)
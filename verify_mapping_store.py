@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import tempfile
+
+from mapping_store import MappingStore
+
+# (query name, identifier map) saved in turn; the latest save of a pair decides what lookups return
+SAVES = [
+    ('first', {'cust': 'A', 'acct': 'N'}),
+    ('second', {'cust': 'B', 'ledger': 'N'}),
+    ('third', {'cust': 'A', 'acct': 'N'}),  # Saves pairs that already exist from 'first' again
+]
+
+# (description, function of the store, expected result)
+CHECKS = [
+    ('merged mapping', lambda store: store.mapping(), {'cust': 'A', 'acct': 'N', 'ledger': 'N'}),
+    ('forward lookup', lambda store: store.lookup(['cust', 'acct', 'missing']), {'cust': 'A', 'acct': 'N'}),
+    ('reverse lookup', lambda store: store.lookup(['A', 'B', 'N'], reverse=True),
+     {'A': 'cust', 'B': 'cust', 'N': 'acct'}),
+    ('saved query', lambda store: store.load_query('second'), ('', {'cust': 'B', 'ledger': 'N'})),
+    ('query names', lambda store: store.query_names(), ['first', 'second', 'third']),
+]
+
+
+def verify(path):
+    """Messages for every check that fails on a new store at path after SAVES."""
+    failures = []
+    with MappingStore(path) as store:
+        for name, identifier_map in SAVES:
+            store.save_query(name, '', identifier_map)
+        for description, check, expected in CHECKS:
+            result = check(store)
+            if result != expected:
+                failures.append(f"{description}: got {result!r}, expected {expected!r}")
+
+        # Saving the older mapping again under an existing name makes it the latest as well
+        store.save_query('second', '', {'cust': 'B'})
+        if store.lookup(['cust']) != {'cust': 'B'}:
+            failures.append(f"re-saved query: got {store.lookup(['cust'])!r}, expected {{'cust': 'B'}}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check MappingStore saves and lookups on a new store.")
+    parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        failures = verify(os.path.join(directory, 'verify_mapping_store.sqlite'))
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"{len(CHECKS) + 1} checks, {len(failures)} failures")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,400 @@
+import posixpath
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from lxml.etree import iterparse
+except ImportError:  # lxml is optional, the standard library parser gives the same events
+    from xml.etree.ElementTree import iterparse
+
+from openpyxl.formula.translate import Translator
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+DOC_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+ROW_TAG = MAIN_NS + 'row'
+CELL_TAG = MAIN_NS + 'c'
+VALUE_TAG = MAIN_NS + 'v'
+FORMULA_TAG = MAIN_NS + 'f'
+INLINE_TAG = MAIN_NS + 'is'
+TEXT_TAG = MAIN_NS + 't'
+RUN_TAG = MAIN_NS + 'r'
+SHARED_ITEM_TAG = MAIN_NS + 'si'
+SHEET_DATA_TAG = MAIN_NS + 'sheetData'
+DIMENSION_TAG = MAIN_NS + 'dimension'
+
+_column_cache = {}
+
+
+def split_coordinate(ref):
+    """Split 'AB12' into (12, 28) without going through openpyxl's regex."""
+    letters = ref.rstrip('0123456789')
+    col = _column_cache.get(letters)
+    if col is None:
+        col = _column_cache[letters] = column_index_from_string(letters)
+    return int(ref[len(letters):]), col
+
+
+def _cast_number(text):
+    """Same casting rule openpyxl applies to numeric <v> text; an empty <v></v> has no value."""
+    text = text.strip()
+    if not text:
+        return None
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+
+class XlsxReader:
+    """
+    Stream cells straight out of the xlsx archive.
+
+    Only the zip entries that are needed are opened and each worksheet XML
+    is parsed with iterparse, so no openpyxl Cell objects are ever built.
+    Rows are cleared as soon as they have been consumed, which keeps memory
+    flat regardless of the sheet size.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.archive = zipfile.ZipFile(file_path)
+        self._shared_strings = None
+        self.sheet_paths = self._read_sheet_paths()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.archive.close()
+
+    @property
+    def sheetnames(self):
+        return list(self.sheet_paths)
+
+    def _parse_tree(self, path):
+        with self.archive.open(path) as fh:
+            root = None
+            for _, elem in iterparse(fh, events=('end',)):
+                root = elem
+        return root
+
+    def _read_relationships(self, rels_path, base_dir):
+        targets = {}
+        if rels_path not in self.archive.namelist():
+            return targets
+        for rel in self._parse_tree(rels_path).iter(PKG_REL_NS + 'Relationship'):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(base_dir, target))
+            targets[rel.get('Id')] = (rel.get('Type'), target)
+        return targets
+
+    def _read_sheet_paths(self):
+        """Map every worksheet name to its XML part, in workbook order."""
+        workbook_path = 'xl/workbook.xml'
+        for rel_type, target in self._read_relationships('_rels/.rels', '').values():
+            if rel_type.endswith('/officeDocument'):
+                workbook_path = target
+        self.workbook_path = workbook_path
+        base_dir, name = posixpath.split(workbook_path)
+        rels = self._read_relationships(posixpath.join(base_dir, '_rels', name + '.rels'), base_dir)
+        self.workbook_rels = rels
+
+        sheet_paths = {}
+        for sheet in self._parse_tree(workbook_path).iter(MAIN_NS + 'sheet'):
+            rel_type, target = rels.get(sheet.get(DOC_REL_NS + 'id'), ('', None))
+            if rel_type.endswith('/worksheet'):  # Chartsheets have no cells
+                sheet_paths[sheet.get('name')] = target
+        return sheet_paths
+
+    @property
+    def shared_strings(self):
+        """Shared string table, loaded on first use."""
+        if self._shared_strings is None:
+            self._shared_strings = []
+            path = next((target for rel_type, target in self.workbook_rels.values()
+                         if rel_type.endswith('/sharedStrings')), None)
+            if path is not None:
+                with self.archive.open(path) as fh:
+                    for _, elem in iterparse(fh, events=('end',)):
+                        if elem.tag == SHARED_ITEM_TAG:
+                            self._shared_strings.append(self._rich_text(elem))
+                            elem.clear()
+        return self._shared_strings
+
+    @staticmethod
+    def _rich_text(elem):
+        # Plain <t> and rich-text runs count, phonetic <rPh> hints do not
+        parts = []
+        for child in elem:
+            if child.tag == TEXT_TAG:
+                parts.append(child.text or '')
+            elif child.tag == RUN_TAG:
+                parts.extend(t.text or '' for t in child.iter(TEXT_TAG))
+        return ''.join(parts)
+
+    def _cell_value(self, cell_type, text, cell):
+        if cell_type == 'inlineStr':
+            inline = cell.find(INLINE_TAG)
+            return self._rich_text(inline) if inline is not None else None
+        if text is None:
+            return None
+        if cell_type == 's':
+            return self.shared_strings[int(text)]
+        if cell_type == 'b':
+            return text == '1'
+        if cell_type in ('str', 'e', 'd'):
+            return text
+        return _cast_number(text)
+
+    def iter_cells(self, sheet_name, rows=None):
+        """
+        Yield (row, column_index, formula, value) for every non-empty cell.
+
+        formula is the formula text with a leading '=' (shared formulas are
+        translated to the cell's own position) or None; value is the literal
+        value, or the cached result for formula cells. When rows is given only
+        those rows are yielded and parsing stops after the last one.
+        """
+        if sheet_name not in self.sheet_paths:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+        wanted = set(rows) if rows is not None else None
+        if wanted is not None and not wanted:
+            return
+        last_row = max(wanted) if wanted is not None else None
+        shared = {}  # Shared formula index -> Translator anchored at the master cell
+
+        with self.archive.open(self.sheet_paths[sheet_name]) as fh:
+            sheet_data = None
+            row_number = 0
+            for event, elem in iterparse(fh, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == SHEET_DATA_TAG:
+                        sheet_data = elem
+                    continue
+                if elem.tag != ROW_TAG:
+                    continue
+
+                row_attr = elem.get('r')
+                row_number = int(row_attr) if row_attr else row_number + 1
+                if last_row is not None and row_number > last_row:
+                    break
+                keep = wanted is None or row_number in wanted
+
+                col = 0
+                for cell in elem:
+                    if cell.tag != CELL_TAG:
+                        continue
+                    ref = cell.get('r')
+                    col = split_coordinate(ref)[1] if ref else col + 1
+                    formula_elem = value_elem = None
+                    for child in cell:
+                        if child.tag == VALUE_TAG:
+                            value_elem = child
+                        elif child.tag == FORMULA_TAG:
+                            formula_elem = child
+                    formula = None
+                    if formula_elem is not None:
+                        coordinate = ref or f"{get_column_letter(col)}{row_number}"
+                        formula = self._formula(formula_elem, coordinate, shared, keep)
+                    if not keep:
+                        continue
+                    value = self._cell_value(cell.get('t'), value_elem.text if value_elem is not None else None, cell)
+                    if formula is None and value is None:
+                        continue
+                    yield row_number, col, formula, value
+
+                # The row is consumed, drop it so memory stays flat
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+    @staticmethod
+    def _formula(elem, coordinate, shared, translate=True):
+        kind = elem.get('t')
+        text = elem.text
+        if kind == 'shared':
+            index = elem.get('si')
+            if text:  # Master cell of the shared block
+                shared[index] = Translator('=' + text, origin=coordinate)
+                return '=' + text
+            if index not in shared or not translate:
+                return None
+            return shared[index].translate_formula(coordinate)
+        if kind == 'dataTable' or text is None:
+            return None
+        return '=' + text
+
+    def max_column(self, sheet_name):
+        """
+        Last column of the sheet's <dimension> range, as openpyxl's
+        max_column reports it. Only the head of the sheet XML is read; a
+        sheet without a dimension is scanned for its last cell instead.
+        """
+        if sheet_name not in self.sheet_paths:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+        with self.archive.open(self.sheet_paths[sheet_name]) as fh:
+            for event, elem in iterparse(fh, events=('start',)):
+                if elem.tag == DIMENSION_TAG and elem.get('ref'):
+                    return column_index_from_string(elem.get('ref').split(':')[-1].rstrip('0123456789'))
+                if elem.tag == SHEET_DATA_TAG:
+                    break
+        return max((col for _, col, _, _ in self.iter_cells(sheet_name)), default=0)
+
+    def read_rows(self, sheet_name, rows):
+        """Return {row: {column_index: (formula, value)}} for the requested rows."""
+        result = {row: {} for row in rows}
+        for row, col, formula, value in self.iter_cells(sheet_name, rows):
+            result[row][col] = (formula, value)
+        return result
+
+
+_worker_readers = {}  # Readers kept open by each pool worker, keyed by file path
+
+
+def _extract_sheet(task):
+    """Pool worker: open the archive (once per process) and parse one sheet."""
+    file_path, sheet_name, rows = task
+    reader = _worker_readers.get(file_path)
+    if reader is None:
+        reader = _worker_readers[file_path] = XlsxReader(file_path)
+    return sheet_name, list(reader.iter_cells(sheet_name, rows))
+
+
+def extract_sheets(file_path, rows=None, jobs=1, sheet_names=None, cache=None):
+    """
+    Return {sheet_name: [(row, column_index, formula, value), ...]} for every sheet.
+
+    rows limits the extraction like XlsxReader.iter_cells. With jobs > 1 the
+    sheets are handed to a process pool; every worker opens the archive
+    itself and sends back plain tuples, so only compact results are pickled.
+    When a DependencyCache is given, cached sheets are not parsed at all and
+    freshly parsed ones are written to it.
+    """
+    if sheet_names is None:
+        if cache is not None:
+            sheet_names = cache.sheetnames
+        else:
+            with XlsxReader(file_path) as reader:
+                sheet_names = reader.sheetnames
+    rows = sorted(rows) if rows is not None else None
+
+    extracted = {}
+    if cache is not None:
+        for name in sheet_names:
+            if rows is None:
+                cells = cache.get_sheet(name)
+            else:
+                found = cache.get_rows(name, rows)
+                cells = None if found is None else [
+                    (row, col, formula, value) for row in rows for col, (formula, value) in found[row].items()
+                ]
+            if cells is not None:
+                extracted[name] = cells
+    pending = [name for name in sheet_names if name not in extracted]
+
+    if pending:
+        if jobs <= 1 or len(pending) <= 1:
+            with XlsxReader(file_path) as reader:
+                parsed = {name: list(reader.iter_cells(name, rows)) for name in pending}
+        else:
+            tasks = [(file_path, name, rows) for name in pending]
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                parsed = dict(executor.map(_extract_sheet, tasks))
+        extracted.update(parsed)
+
+        if cache is not None:
+            for name, cells in parsed.items():
+                if rows is None:
+                    cache.put_sheet(name, cells)
+                else:
+                    by_row = {row: {} for row in rows}
+                    for row, col, formula, value in cells:
+                        by_row[row][col] = (formula, value)
+                    cache.put_rows(name, by_row)
+
+    return {name: extracted[name] for name in sheet_names}
+
+
+class SheetRows:
+    """Row reader for one sheet of a WorkbookSession."""
+
+    def __init__(self, session, sheet_name):
+        self.session = session
+        self.sheet_name = sheet_name
+        self.cache = {}  # Row number -> {column_index: (formula, value)}
+
+    def read_rows(self, rows):
+        """Return {row: {column_index: (formula, value)}}, parsing the sheet only for rows not seen yet."""
+        missing = [row for row in rows if row not in self.cache]
+        if missing:
+            disk_cache = self.session.disk_cache
+            found = disk_cache.get_rows(self.sheet_name, missing) if disk_cache is not None else None
+            if found is None:
+                found = self.session.reader.read_rows(self.sheet_name, missing)
+                if disk_cache is not None:
+                    disk_cache.put_rows(self.sheet_name, found)
+            self.cache.update(found)
+        return {row: self.cache[row] for row in rows}
+
+
+class WorkbookSession:
+    """
+    Keep one archive open for a whole traversal.
+
+    Every sheet gets a SheetRows reader that remembers the rows it has
+    already loaded, so visiting many sheets costs one open of the workbook
+    plus one pass per sheet instead of a reopen per lookup. With a
+    DependencyCache the archive is only opened if some row is not cached.
+    """
+
+    def __init__(self, file_path, disk_cache=None):
+        self.file_path = file_path
+        self.disk_cache = disk_cache
+        self._reader = None
+        self._sheets = {}
+        if disk_cache is None:
+            self._reader = XlsxReader(file_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self._reader = XlsxReader(self.file_path)
+        return self._reader
+
+    @property
+    def sheetnames(self):
+        if self.disk_cache is not None:
+            return self.disk_cache.sheetnames
+        return self.reader.sheetnames
+
+    def sheet(self, sheet_name):
+        if sheet_name not in self._sheets:
+            if sheet_name not in self.sheetnames:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            self._sheets[sheet_name] = SheetRows(self, sheet_name)
+        return self._sheets[sheet_name]
+
+    def read_rows(self, sheet_name, rows):
+        return self.sheet(sheet_name).read_rows(rows)
+
+    def max_column(self, sheet_name):
+        self.sheet(sheet_name)
+        return self.reader.max_column(sheet_name)